@@ -0,0 +1,207 @@
+"""
+Analisi delle serie di forza: tendenza del 1RM, ritmo di crescita
+(kg/settimana), proiezione verso un obiettivo e stallo, per esercizio.
+
+Lo storico di un utente si legge con una sola query (values_list, senza
+istanziare i modelli) e diventa un gruppo di array NumPy paralleli
+ordinati per (esercizio, data), in cui ogni esercizio è un segmento
+contiguo. Medie mobili, rette ai minimi quadrati e stalli si calcolano
+per tutti gli esercizi insieme, con somme per segmento (bincount,
+reduceat) invece di cicli Python sui log: il costo resta lineare e basso
+anche con centinaia di migliaia di log (manage.py benchmark_analytics).
+"""
+import math
+from datetime import date
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.db.models import Q
+
+from .models import ExerciseLog
+
+# Giorni di storico, a ritroso dall'ultimo log dell'esercizio, su cui si
+# calcola la retta della tendenza.
+TREND_DAYS = 84
+# Log e giorni minimi nella finestra perché la pendenza abbia senso.
+TREND_MIN_LOGS = 3
+TREND_MIN_SPAN_DAYS = 14
+
+# Log (dello stesso esercizio) della media mobile del grafico progressi.
+ROLLING_LOGS = 5
+
+# Stallo: nessun nuovo massimo da almeno PLATEAU_DAYS, pur avendo
+# continuato ad allenarsi (almeno PLATEAU_MIN_LOGS log dopo il record).
+PLATEAU_DAYS = 42
+PLATEAU_MIN_LOGS = 3
+
+# Oltre questo orizzonte la proiezione non è credibile.
+PROJECTION_MAX_WEEKS = 104
+
+
+class StrengthSeries:
+    """
+    Log con 1RM di un utente come array paralleli (id, exercise_ids, days,
+    one_rm, reps, weight), ordinati per esercizio, data e id. `days` sono
+    ordinali di date (date.toordinal()).
+
+    `exercises` sono gli id degli esercizi presenti, in ordine; il segmento
+    dell'esercizio i va da starts[i] a ends[i] compreso, e group[j] è
+    l'indice dell'esercizio della riga j.
+    """
+
+    def __init__(self, ids, exercise_ids, days, one_rm, reps, weight):
+        self.ids = ids
+        self.exercise_ids = exercise_ids
+        self.days = days
+        self.one_rm = one_rm
+        self.reps = reps
+        self.weight = weight
+        self.exercises, self.starts, counts = np.unique(exercise_ids, return_index=True, return_counts=True)
+        self.ends = self.starts + counts - 1
+        self.group = np.repeat(np.arange(len(self.exercises)), counts)
+
+    @classmethod
+    def load(cls, user, exercise_ids=None, since=None):
+        """
+        Una query per tutti gli esercizi (o quelli indicati) dell'utente.
+        `since` ({exercise_id: data}) limita la lettura a quegli esercizi e,
+        per ciascuno, ai log da quella data in poi.
+        """
+        logs = ExerciseLog.objects.filter(user=user, one_rm__isnull=False)
+        if exercise_ids is not None:
+            logs = logs.filter(exercise_id__in=exercise_ids)
+        if since is not None:
+            logs = logs.filter(reduce(
+                or_, (Q(exercise_id=exercise_id, date__gte=day) for exercise_id, day in since.items()), Q(pk__in=[]),
+            ))
+        return cls.from_rows(
+            logs
+            .order_by('exercise_id', 'date', 'id')
+            .values_list('id', 'exercise_id', 'date', 'one_rm', 'reps', 'weight')
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Da tuple (id, exercise_id, date, one_rm, reps, weight) già ordinate."""
+        rows = list(rows)
+        count = len(rows)
+
+        def column(position, dtype, convert=None):
+            values = (row[position] for row in rows)
+            return np.fromiter(values if convert is None else map(convert, values), dtype, count)
+
+        return cls(
+            column(0, np.int64),
+            column(1, np.int64),
+            column(2, np.int64, date.toordinal),
+            column(3, np.float64),
+            column(4, np.int64),
+            column(5, np.float64),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def rolling_mean(series, window=ROLLING_LOGS):
+    """
+    Media del 1RM sugli ultimi `window` log dello stesso esercizio, riga per
+    riga: differenze della somma cumulata, con l'inizio della finestra mai
+    prima dell'inizio del segmento.
+    """
+    if not len(series):
+        return np.empty(0)
+    totals = np.concatenate(([0.0], np.cumsum(series.one_rm)))
+    rows = np.arange(len(series))
+    first = np.maximum(rows - window + 1, series.starts[series.group])
+    return (totals[rows + 1] - totals[first]) / (rows + 1 - first)
+
+
+def _last_records(series):
+    """
+    Indice, per esercizio, dell'ultimo log che ha superato tutti i
+    precedenti. Il massimo progressivo si calcola su tutta la serie in un
+    colpo, spostando ogni segmento sopra il precedente così che i valori
+    di un esercizio non contino per il successivo.
+    """
+    shift = series.group * (series.one_rm.max() + 1.0)
+    shifted = series.one_rm + shift
+    running = np.maximum.accumulate(shifted)
+    previous = np.empty_like(running)
+    previous[0] = -np.inf
+    previous[1:] = running[:-1]
+    previous[series.starts] = -np.inf
+    is_record = shifted > previous
+    positions = np.where(is_record, np.arange(len(series)), -1)
+    return np.maximum.reduceat(positions, series.starts)
+
+
+def trends(series):
+    """
+    Tendenza per esercizio, {exercise_id: dict} con:
+
+    - kg_per_week: pendenza della retta ai minimi quadrati del 1RM sugli
+      ultimi TREND_DAYS (None con troppi pochi log o giorni);
+    - current: valore della retta all'ultimo log (l'ultimo 1RM senza retta);
+    - best: miglior 1RM;
+    - plateau, plateau_since: stallo e data dell'ultimo record;
+    - log_count.
+
+    I valori sono float, int e date Python: il risultato va in cache.
+    """
+    k = len(series.exercises)
+    if not k:
+        return {}
+    last_day = series.days[series.ends]
+    # Ascissa in giorni rispetto all'ultimo log: 0 all'ultimo, negativa prima.
+    x = (series.days - last_day[series.group]).astype(np.float64)
+    y = series.one_rm
+    in_window = x >= -TREND_DAYS
+    g, xw, yw = series.group[in_window], x[in_window], y[in_window]
+
+    n = np.bincount(g, minlength=k).astype(np.float64)
+    sx = np.bincount(g, xw, k)
+    sy = np.bincount(g, yw, k)
+    sxx = np.bincount(g, xw * xw, k)
+    sxy = np.bincount(g, xw * yw, k)
+    denominator = n * sxx - sx * sx
+    # La finestra è la coda del segmento: il suo primo log dà l'ampiezza.
+    span = -x[series.ends - n.astype(np.int64) + 1]
+    fitted = (n >= TREND_MIN_LOGS) & (span >= TREND_MIN_SPAN_DAYS) & (denominator > 0)
+    slope = np.divide(n * sxy - sx * sy, denominator, out=np.zeros(k), where=fitted)
+    current = np.where(fitted, (sy - slope * sx) / n, y[series.ends])
+
+    last_record = _last_records(series)
+    best = y[last_record]
+    days_since_record = last_day - series.days[last_record]
+    plateau = (days_since_record >= PLATEAU_DAYS) & (series.ends - last_record >= PLATEAU_MIN_LOGS)
+
+    return {
+        int(exercise_id): {
+            'kg_per_week': round(float(slope[i]) * 7, 2) if fitted[i] else None,
+            'current': round(float(current[i]), 2),
+            'best': round(float(best[i]), 2),
+            'plateau': bool(plateau[i]),
+            'plateau_since': date.fromordinal(int(series.days[last_record[i]])) if plateau[i] else None,
+            'log_count': int(series.ends[i] - series.starts[i] + 1),
+        }
+        for i, exercise_id in enumerate(series.exercises)
+    }
+
+
+def weeks_to_goal(trend, goal):
+    """
+    Settimane stimate per portare il 1RM a `goal` kg al ritmo attuale: 0 se
+    è già raggiunto, None se la tendenza non sale o l'obiettivo è oltre
+    PROJECTION_MAX_WEEKS.
+    """
+    if trend is None:
+        return None
+    if goal <= trend['current']:
+        return 0
+    rate = trend['kg_per_week']
+    if not rate or rate <= 0:
+        return None
+    weeks = math.ceil((goal - trend['current']) / rate)
+    return weeks if weeks <= PROJECTION_MAX_WEEKS else None
@@ -0,0 +1,171 @@
+"""
+Misure di latenza e query delle view più usate, attraverso il client di
+test di Django: la richiesta passa da URL, middleware, view e template
+come in produzione, senza rete né server.
+
+Ogni scenario si ripete più volte, a cache vuota ("fredda": la pagina si
+ricalcola) e a cache piena ("calda": come per chi la riapre), e riporta
+mediana e 95° percentile dei tempi e il numero di query. Gli import girano
+in una transazione annullata: i dati dell'utente misurato non cambiano.
+
+Il risultato è un dizionario serializzabile in JSON, da salvare a ogni
+rilascio (manage.py benchmark_views --output) e confrontare col precedente.
+"""
+import math
+import platform
+import statistics
+import time
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .caching import release_id
+from .models import ExerciseLog, WorkoutPlan
+
+# Righe del CSV degli scenari di import: sotto la soglia oltre cui l'import
+# finisce in coda, così si misura l'elaborazione dentro la richiesta.
+IMPORT_ROWS = 1000
+
+
+def percentile(values, pct):
+    """Percentile col metodo nearest-rank: sempre uno dei valori misurati."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _host():
+    """Un host accettato da ALLOWED_HOSTS, per le richieste del client."""
+    for host in settings.ALLOWED_HOSTS:
+        if host and host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+def _session_csv(user):
+    today = timezone.localdate()
+    names = list(WorkoutPlan.objects.filter(user=user).values_list('name', flat=True)[:3]) or ['Full Body']
+    lines = ['data,scheda'] + [
+        f'{(today - timedelta(days=n)).isoformat()},{names[n % len(names)]}' for n in range(IMPORT_ROWS)
+    ]
+    return '\n'.join(lines).encode()
+
+
+def _plan_csv(user):
+    names = list(
+        ExerciseLog.objects.filter(user=user)
+        .values_list('exercise__name', flat=True).order_by('exercise__name').distinct()[:8]
+    )
+    rows = ['piano,Benchmark,', 'esercizio,gruppo,serie,ripetizioni'] + [f'{name},,3,10' for name in names]
+    return '\n'.join(rows).encode()
+
+
+def scenarios(user):
+    """
+    (nome, metodo, url, dati) delle pagine da misurare per `user`: usano
+    la sua scheda e il suo esercizio più registrato, così le pagine di
+    dettaglio hanno lo storico più lungo.
+    """
+    plan = WorkoutPlan.objects.filter(user=user).order_by('order').first()
+    top = (
+        ExerciseLog.objects.filter(user=user)
+        .values('exercise_id').annotate(n=Count('id')).order_by('-n').first()
+    )
+    today = timezone.localdate()
+    result = [
+        ('dashboard', 'get', reverse('dashboard'), None),
+        ('plan_list', 'get', reverse('plan_list'), None),
+        ('progress_overview', 'get', reverse('progress_overview'), None),
+        ('workout_calendar', 'get', reverse('workout_calendar'), None),
+        ('calendar_heatmap', 'get',
+         reverse('calendar_heatmap') + f'?start={today - timedelta(days=364)}&end={today}', None),
+    ]
+    if plan is not None:
+        result.append(('plan_detail', 'get', reverse('plan_detail', args=[plan.pk]), None))
+    if top is not None:
+        url = reverse('exercise_progress', args=[top['exercise_id']])
+        result += [
+            ('exercise_progress', 'get', url, None),
+            ('exercise_progress_3m', 'get', url + '?period=3m', None),
+        ]
+    result += [
+        ('session_import', 'post', reverse('session_import'), lambda: {
+            'csv_file': SimpleUploadedFile('allenamenti.csv', _session_csv(user), 'text/csv'),
+        }),
+        ('plan_import', 'post', reverse('plan_import'), lambda: {
+            'csv_file': SimpleUploadedFile('scheda.csv', _plan_csv(user), 'text/csv'),
+        }),
+    ]
+    return result
+
+
+def _measure(client, method, url, data):
+    """(millisecondi, query, status) di una richiesta; le scritture si annullano."""
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        if method == 'get':
+            response = client.get(url)
+        else:
+            with transaction.atomic():
+                response = client.post(url, data())
+                transaction.set_rollback(True)
+        elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, len(queries), response.status_code
+
+
+def run(user, repeat=20, names=None):
+    """Esegue gli scenari (tutti, o quelli in `names`) per `user`."""
+    client = Client(SERVER_NAME=_host())
+    client.force_login(user)
+    results = []
+    for name, method, url, data in scenarios(user):
+        if names and name not in names:
+            continue
+        # Le scritture annullate non cambiano i dati: per loro la cache
+        # non conta e basta un giro.
+        modes = ['cold', 'warm'] if method == 'get' else ['cold']
+        for mode in modes:
+            timings, query_counts, statuses = [], [], set()
+            if mode == 'warm':
+                _measure(client, method, url, data)
+            for _ in range(repeat):
+                if mode == 'cold':
+                    cache.clear()
+                elapsed, query_count, status = _measure(client, method, url, data)
+                timings.append(elapsed)
+                query_counts.append(query_count)
+                statuses.add(status)
+            results.append({
+                'name': name,
+                'method': method.upper(),
+                'url': url,
+                'cache': mode,
+                'runs': repeat,
+                'p50_ms': round(statistics.median(timings), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'max_ms': round(max(timings), 2),
+                'queries': max(query_counts),
+                'status': sorted(statuses),
+            })
+    return {
+        'created_at': timezone.now().isoformat(),
+        'release': release_id(),
+        'django': django.get_version(),
+        'python': platform.python_version(),
+        'database': connection.vendor,
+        'user': {
+            'username': user.username,
+            'logs': ExerciseLog.objects.filter(user=user).count(),
+            'sessions': user.workout_sessions.count(),
+        },
+        'results': results,
+    }
@@ -0,0 +1,203 @@
+"""
+Cache per utente delle pagine calcolate (dashboard, progressi).
+
+Le chiavi contengono la versione dei dati dell'utente (DataVersion): ogni
+scrittura la incrementa, quindi non serve invalidare nulla a mano e una
+pagina rimasta uguale costa una lettura della versione e un accesso alla
+cache. Il backend è quello configurato in settings.CACHES (LocMemCache,
+con eviction LRU).
+
+La stessa versione, con l'istante dell'ultima modifica, fornisce ETag e
+Last-Modified alle view servite con django.views.decorators.http.condition:
+una rivalidazione senza modifiche costa una query e risponde 304 senza
+eseguire la view.
+"""
+import hashlib
+from functools import cache as memoize, wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import CatalogVersion, DataVersion
+
+
+def data_version(user_id):
+    return (
+        DataVersion.objects
+        .filter(user_id=user_id)
+        .values_list('version', flat=True)
+        .first()
+    ) or 0
+
+
+def data_stamp(user_id):
+    """(versione, ultima modifica) dei dati di un utente, con una sola query."""
+    return (
+        DataVersion.objects
+        .filter(user_id=user_id)
+        .values_list('version', 'updated_at')
+        .first()
+    ) or (0, None)
+
+
+def bump_data_version(user_id):
+    """Segna come cambiati i dati di un utente."""
+    now = timezone.now()
+    if DataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1, updated_at=now):
+        return
+    _, created = DataVersion.objects.get_or_create(
+        user_id=user_id, defaults={'version': 1, 'updated_at': now}
+    )
+    if not created:
+        # Creata da una richiesta concorrente tra update e get_or_create.
+        DataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1, updated_at=now)
+
+
+def bump_all_data_versions():
+    """Per le modifiche che toccano le pagine di tutti (es. il catalogo esercizi)."""
+    DataVersion.objects.update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def catalog_version():
+    return CatalogVersion.objects.values_list('version', flat=True).first() or 0
+
+
+def bump_catalog_version():
+    """
+    Segna come cambiato il catalogo esercizi. Nome e tipo di un esercizio
+    compaiono nelle pagine di chiunque lo usi: cambiano anche le versioni
+    dati di tutti.
+    """
+    now = timezone.now()
+    if not CatalogVersion.objects.update(version=F('version') + 1, updated_at=now):
+        _, created = CatalogVersion.objects.get_or_create(pk=1, defaults={'version': 1, 'updated_at': now})
+        if not created:
+            CatalogVersion.objects.update(version=F('version') + 1, updated_at=now)
+    bump_all_data_versions()
+
+
+def _identity(user):
+    # date_joined distingue utenti diversi che riusano lo stesso id (DB
+    # ripristinato o ricreato), che altrimenti leggerebbero le pagine
+    # dell'utente precedente.
+    return f'{user.pk}.{user.date_joined.timestamp():.6f}'
+
+
+def user_cache_key(user, name, *parts):
+    suffix = ':'.join(str(part) for part in parts)
+    return f'gym:{name}:{_identity(user)}:v{data_version(user.pk)}:{suffix}'
+
+
+def cached_for_user(user, name, build, *parts, timeout=None):
+    """
+    Restituisce il valore in cache per (utente, versione dati, name, parts)
+    oppure lo calcola con build() e lo salva. `parts` deve contenere tutto
+    ciò da cui dipende il risultato oltre ai dati dell'utente (parametri
+    della richiesta, data odierna, ...).
+    """
+    key = user_cache_key(user, name, *parts)
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
+
+
+# ─── Validatori HTTP ──────────────────────────────────────────────────────────
+
+def request_data_stamp(request):
+    """
+    data_stamp() dell'utente della richiesta, letto una volta per richiesta:
+    condition() chiede sia l'ETag sia il Last-Modified.
+    """
+    stamp = getattr(request, '_gym_data_stamp', None)
+    if stamp is None:
+        stamp = request._gym_data_stamp = data_stamp(request.user.pk)
+    return stamp
+
+
+def user_etag(request, name, *parts):
+    """
+    ETag di una risposta che dipende solo dai dati dell'utente e da `parts`
+    (parametri della richiesta, data odierna, ...). Va citato senza
+    virgolette: le aggiunge condition().
+    """
+    version, _ = request_data_stamp(request)
+    raw = ':'.join(str(part) for part in (_identity(request.user), *parts))
+    digest = hashlib.sha1(raw.encode()).hexdigest()[:20]
+    return f'{name}-v{version}-{digest}'
+
+
+def user_last_modified(request):
+    """Ultima modifica ai dati dell'utente; chi non ha mai scritto nulla ha solo la registrazione."""
+    _, updated_at = request_data_stamp(request)
+    return updated_at or request.user.date_joined
+
+
+@memoize
+def release_id():
+    """Identifica il deploy corrente (vedi settings.GYM_RELEASE)."""
+    if settings.GYM_RELEASE:
+        return settings.GYM_RELEASE
+    return getattr(staticfiles_storage, 'manifest_hash', '')
+
+
+def _revalidable(request):
+    # Un messaggio in coda va mostrato: la copia in cache del browser non
+    # lo contiene, quindi la pagina si rigenera. len() non li consuma.
+    return not len(get_messages(request))
+
+
+def user_conditional_page(name, window=None):
+    """
+    Rende condizionale una pagina HTML per utente: ETag e Last-Modified
+    dalla versione dati, e se il browser ha già la versione corrente
+    risponde 304 senza eseguire la view.
+
+    L'ETag comprende anche URL completo (argomenti e query string), deploy
+    e cookie CSRF, perché la pagina contiene il token dei form. `window`
+    è per le pagine che cambiano col tempo anche senza scritture (la data
+    di oggi, il saluto in dashboard): restituisce l'inizio della finestra
+    corrente, che entra nell'ETag e fa da limite inferiore al Last-Modified.
+    """
+    def etag_func(request, *args, **kwargs):
+        if not _revalidable(request):
+            return None
+        since = window() if window else None
+        return user_etag(
+            request, name,
+            release_id(),
+            request.META.get('CSRF_COOKIE', ''),
+            request.get_full_path(),
+            since.isoformat() if since else '',
+        )
+
+    def last_modified_func(request, *args, **kwargs):
+        if not _revalidable(request):
+            return None
+        modified = user_last_modified(request)
+        return max(modified, window()) if window else modified
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.has_header('ETag'):
+                # Sempre rivalidata, e mai in cache condivise.
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def today_window():
+    """Inizio della giornata locale: per le pagine che dipendono da oggi."""
+    return timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
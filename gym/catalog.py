@@ -0,0 +1,104 @@
+"""
+Istantanea in memoria del catalogo esercizi.
+
+Il catalogo è piccolo (centinaia di voci), uguale per tutti e cambia di
+rado, mentre form, autocompletamento e pagine lo leggono di continuo:
+ogni processo ne tiene una copia già pronta — dizionari per id, il JSON
+servito a /exercises/catalog/<hash>.json e l'indice di ricerca
+(gym/search.py) — e la ricalcola solo quando il catalogo cambia.
+
+L'istantanea porta la versione del catalogo (CatalogVersion) da cui è
+stata costruita. La versione nel DB si rilegge al più ogni
+RECHECK_SECONDS: una modifica fatta da un altro worker arriva entro quel
+tempo, una fatta in questo processo subito (catalog_changed()).
+"""
+import hashlib
+import json
+import threading
+import time
+from functools import cached_property
+
+from django.db import transaction
+
+from .caching import catalog_version
+from .models import Exercise, MuscleGroup
+
+RECHECK_SECONDS = 5
+MUSCLE_LABELS = dict(MuscleGroup.choices)
+
+
+class CatalogSnapshot:
+    def __init__(self, version, rows):
+        self.version = version
+        self.exercises = [
+            {
+                'id': ex_id,
+                'name': name,
+                'muscle_group': muscle_group,
+                'muscle_label': MUSCLE_LABELS.get(muscle_group, muscle_group),
+                'is_bodyweight': is_bodyweight,
+            }
+            for ex_id, name, muscle_group, is_bodyweight in rows
+        ]
+        self.by_id = {ex['id']: ex for ex in self.exercises}
+
+    @classmethod
+    def build(cls, version):
+        return cls(version, Exercise.objects.values_list('id', 'name', 'muscle_group', 'is_bodyweight'))
+
+    @cached_property
+    def json(self):
+        """Il documento servito al browser, in byte."""
+        return json.dumps(
+            {'version': self.version, 'exercises': self.exercises},
+            ensure_ascii=False, separators=(',', ':'),
+        ).encode('utf-8')
+
+    @cached_property
+    def digest(self):
+        """Hash del contenuto: entra nell'URL, che così resta in cache per sempre."""
+        return hashlib.sha1(self.json).hexdigest()[:16]
+
+    @cached_property
+    def index(self):
+        from .search import ExerciseIndex
+        return ExerciseIndex(self.exercises)
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = float('-inf')
+
+
+def snapshot():
+    """L'istantanea corrente, ricostruita se il catalogo è cambiato."""
+    global _snapshot, _checked_at
+    current = _snapshot
+    if current is not None and time.monotonic() - _checked_at < RECHECK_SECONDS:
+        return current
+    with _lock:
+        # La versione si legge prima degli esercizi: se il catalogo cambia
+        # nel mezzo, l'istantanea ha la versione vecchia e si ricostruisce.
+        version = catalog_version()
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = CatalogSnapshot.build(version)
+        _checked_at = time.monotonic()
+        return _snapshot
+
+
+def forget():
+    """Scarta l'istantanea: la prossima lettura la ricostruisce."""
+    global _snapshot
+    _snapshot = None
+
+
+def catalog_changed():
+    """
+    Da chiamare dopo aver incrementato la versione del catalogo.
+    L'istantanea si scarta subito, per le letture nella stessa
+    transazione, e di nuovo dopo il commit, perché una richiesta
+    concorrente potrebbe averla ricostruita nel frattempo con i dati
+    vecchi.
+    """
+    forget()
+    transaction.on_commit(forget)
@@ -0,0 +1,95 @@
+"""
+Riduzione lato server delle serie dei grafici.
+
+Con anni di storico una serie può contenere migliaia di punti: pesano
+nell'HTML e rallentano Chart.js sui telefoni, senza che a schermo si veda
+alcuna differenza. Prima della serializzazione in JSON le serie vengono
+ridotte con Largest-Triangle-Three-Buckets (LTTB), che conserva la forma
+della curva, e i punti record (ogni nuovo massimo) restano sempre visibili.
+
+Il numero massimo di punti è configurabile per superficie in
+settings.GYM_CHART_MAX_POINTS.
+"""
+from django.conf import settings
+
+DEFAULT_MAX_POINTS = {
+    'sparkline': 30,
+    'progress': 300,
+}
+
+
+def max_points(surface):
+    configured = getattr(settings, 'GYM_CHART_MAX_POINTS', {})
+    return configured.get(surface, DEFAULT_MAX_POINTS[surface])
+
+
+def _record_indices(values):
+    """Indici dei punti che migliorano tutti i precedenti (i PR)."""
+    records, best = [], None
+    for i, value in enumerate(values):
+        if value is not None and (best is None or value > best):
+            records.append(i)
+            best = value
+    return records
+
+
+def _lttb_indices(values, threshold):
+    """
+    Indici selezionati da LTTB. L'ascissa è la posizione nella serie, la
+    stessa usata dal grafico (le etichette sono categorie, non un asse
+    temporale). I valori None valgono 0 ai fini della selezione.
+    """
+    n = len(values)
+    if threshold >= n:
+        return list(range(n))
+    if threshold <= 2:
+        return [0, n - 1][:max(threshold, 0)]
+
+    ys = [float(v) if v is not None else 0.0 for v in values]
+    bucket_size = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Media del bucket successivo: terzo vertice del triangolo.
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = (next_start + next_end - 1) / 2
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        best_area, best_index = -1.0, start
+        for j in range(start, end):
+            area = abs((a - avg_x) * (ys[j] - ys[a]) - (a - j) * (avg_y - ys[a]))
+            if area > best_area:
+                best_area, best_index = area, j
+        selected.append(best_index)
+        a = best_index
+    selected.append(n - 1)
+    return selected
+
+
+def downsample(points, surface, value_key='one_rm'):
+    """
+    Riduce `points` (lista di dizionari in ordine cronologico) al massimo
+    previsto per `surface`, conservando primo e ultimo punto e i record
+    su `value_key`.
+
+    Se i record da soli superano il limite (progressione sempre in
+    crescita) vengono ridotti anch'essi con LTTB: il limite vale sempre, e
+    il massimo assoluto, che è l'ultimo record, resta comunque.
+    """
+    threshold = max_points(surface)
+    if len(points) <= threshold:
+        return points
+
+    values = [p[value_key] for p in points]
+    records = _record_indices(values)
+
+    if len(records) >= threshold:
+        kept = _lttb_indices([values[r] for r in records], threshold)
+        return [points[records[i]] for i in kept]
+
+    keep = set(records)
+    keep.update(_lttb_indices(values, threshold - len(records)))
+    return [points[i] for i in sorted(keep)]
@@ -0,0 +1,178 @@
+"""
+Esportazione completa dell'account: log, allenamenti, cartelle e schede.
+
+Due formati, entrambi generati a flusso per StreamingHttpResponse o per
+un file (manage.py export_account):
+
+- zip: un CSV per tabella, leggibile da Excel (BOM, virgola);
+- ndjson: un oggetto JSON per riga con il campo "tipo" della tabella.
+
+Le righe arrivano dal DB con .iterator(chunk_size=EXPORT_CHUNK) come
+tuple (values_list), senza istanziare i modelli, e si scrivono a blocchi:
+la memoria resta costante anche con centinaia di migliaia di log.
+"""
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ExerciseLog, PlanFolder, PlannedExercise, WorkoutPlan, WorkoutSession
+
+EXPORT_CHUNK = 2000
+
+# Formato -> content type; il formato è anche l'estensione del file.
+FORMATS = {
+    'zip': 'application/zip',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _planned_rows(user):
+    """Esercizi in scheda con la posizione nella scheda, non la chiave interna."""
+    rows = (
+        PlannedExercise.objects
+        .filter(plan__user=user)
+        .order_by('plan_id', 'order', 'pk')
+        .values_list(
+            'plan_id', 'exercise__name', 'exercise__muscle_group',
+            'target_sets', 'target_reps', 'notes', 'exercise__is_bodyweight',
+        )
+        .iterator(chunk_size=EXPORT_CHUNK)
+    )
+    plan_id, position = None, 0
+    for row in rows:
+        position = position + 1 if row[0] == plan_id else 1
+        plan_id = row[0]
+        yield (*row[:5], position, *row[5:])
+
+
+def tables(user):
+    """
+    Le tabelle esportate: (nome, intestazioni, righe). Le righe sono
+    generatori, le query partono solo quando si leggono.
+    """
+    return [
+        (
+            'log',
+            ['data', 'esercizio', 'gruppo_muscolare', 'serie', 'ripetizioni', 'peso', 'massimale_stimato', 'note'],
+            ExerciseLog.objects
+            .filter(user=user)
+            .order_by('date', 'pk')
+            .values_list(
+                'date', 'exercise__name', 'exercise__muscle_group',
+                'sets', 'reps', 'weight', 'one_rm', 'notes',
+            )
+            .iterator(chunk_size=EXPORT_CHUNK),
+        ),
+        (
+            # Stesse colonne dell'import degli allenamenti passati.
+            'allenamenti',
+            ['data', 'scheda', 'libero'],
+            WorkoutSession.objects
+            .filter(user=user)
+            .order_by('date')
+            .values_list('date', 'plan_name', 'is_free')
+            .iterator(chunk_size=EXPORT_CHUNK),
+        ),
+        (
+            'cartelle',
+            ['id', 'nome', 'creata_il'],
+            PlanFolder.objects
+            .filter(user=user)
+            .order_by('order', '-created_at')
+            .values_list('pk', 'name', 'created_at')
+            .iterator(chunk_size=EXPORT_CHUNK),
+        ),
+        (
+            'schede',
+            ['id', 'nome', 'descrizione', 'attiva', 'cartella_id', 'creata_il'],
+            WorkoutPlan.objects
+            .filter(user=user)
+            .order_by('pk')
+            .values_list('pk', 'name', 'description', 'is_active', 'folder_id', 'created_at')
+            .iterator(chunk_size=EXPORT_CHUNK),
+        ),
+        (
+            'esercizi_scheda',
+            ['scheda_id', 'esercizio', 'gruppo_muscolare', 'serie', 'ripetizioni', 'ordine', 'note', 'corpo_libero'],
+            _planned_rows(user),
+        ),
+    ]
+
+
+def _csv_cell(value):
+    if isinstance(value, bool):
+        return 'si' if value else 'no'
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def iter_ndjson(user):
+    """Una riga JSON per record, a blocchi di EXPORT_CHUNK righe."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for name, header, rows in tables(user):
+        lines = []
+        for row in rows:
+            lines.append(encoder.encode({'tipo': name, **dict(zip(header, row))}))
+            if len(lines) == EXPORT_CHUNK:
+                yield ('\n'.join(lines) + '\n').encode('utf-8')
+                lines.clear()
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class _Pipe:
+    """
+    Destinazione di sola scrittura per ZipFile: tiene i byte finché il
+    generatore non li passa alla risposta. Senza seek/tell lo zip usa i
+    data descriptor e non torna mai indietro a riscrivere le intestazioni.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(user):
+    """Zip con un CSV per tabella, prodotto e consegnato a blocchi."""
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, header, rows in tables(user):
+            with archive.open(f'{name}.csv', 'w') as member:
+                buffer = io.StringIO()
+                buffer.write('\ufeff')  # BOM per compatibilità Excel
+                writer = csv.writer(buffer)
+                writer.writerow(header)
+                for count, row in enumerate(rows, start=1):
+                    writer.writerow([_csv_cell(value) for value in row])
+                    if count % EXPORT_CHUNK == 0:
+                        member.write(buffer.getvalue().encode('utf-8'))
+                        buffer.seek(0)
+                        buffer.truncate()
+                        data = pipe.take()
+                        if data:
+                            yield data
+                member.write(buffer.getvalue().encode('utf-8'))
+    yield pipe.take()
+
+
+def iter_export(user, fmt):
+    return iter_zip(user) if fmt == 'zip' else iter_ndjson(user)
+
+
+def export_filename(user, fmt, today):
+    return f'gymit_{user.username}_{today.isoformat()}.{fmt}'
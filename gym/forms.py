@@ -1,7 +1,44 @@
 from django import forms
+from django.urls import reverse
+from django.utils import timezone
+
+from . import catalog
 from .models import WorkoutPlan, PlannedExercise, ExerciseLog, Exercise, PlanFolder
 
 
+class ExerciseSelect(forms.Select):
+    """
+    <select> dell'esercizio per i form con autocompletamento: contiene solo
+    l'opzione scelta, presa dall'istantanea del catalogo (gym/catalog.py),
+    invece di tutto il catalogo letto dal DB a ogni render. Le altre le
+    aggiunge autocomplete.js; l'URL del catalogo completo (con l'hash,
+    in cache nel browser) è in data-catalog-url.
+    """
+
+    def get_context(self, name, value, attrs):
+        digest = catalog.snapshot().digest
+        attrs = {**(attrs or {}), 'data-catalog-url': reverse('exercise_catalog', args=[digest])}
+        return super().get_context(name, value, attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        snapshot = catalog.snapshot()
+        options = [self.create_option(name, '', '---------', not any(value), 0)]
+        for selected in filter(str.isdigit, value):
+            exercise = snapshot.by_id.get(int(selected))
+            if exercise is None:
+                # Appena creato da un altro worker, non ancora nell'istantanea.
+                exercise = (
+                    Exercise.objects.filter(pk=selected)
+                    .values('id', 'name', 'is_bodyweight')
+                    .first()
+                )
+            if exercise is not None:
+                option = self.create_option(name, exercise['id'], exercise['name'], True, len(options))
+                option['attrs']['data-bodyweight'] = 'true' if exercise['is_bodyweight'] else 'false'
+                options.append(option)
+        return [(None, options, 0)]
+
+
 class WorkoutPlanForm(forms.ModelForm):
     class Meta:
         model = WorkoutPlan
@@ -38,7 +75,7 @@ class PlannedExerciseForm(forms.ModelForm):
         # 'order' escluso: viene assegnato automaticamente e gestito via drag & drop
         fields = ['exercise', 'target_sets', 'target_reps', 'notes']
         widgets = {
-            'exercise': forms.Select(attrs={'class': 'form-select'}),
+            'exercise': ExerciseSelect(attrs={'class': 'form-select'}),
             'target_sets': forms.NumberInput(attrs={
                 'class': 'form-control',
                 'min': 1, 'max': 20
@@ -63,7 +100,7 @@ class ExerciseLogForm(forms.ModelForm):
         model = ExerciseLog
         fields = ['exercise', 'date', 'sets', 'reps', 'weight', 'notes']
         widgets = {
-            'exercise': forms.Select(attrs={'class': 'form-select'}),
+            'exercise': ExerciseSelect(attrs={'class': 'form-select'}),
             'date': forms.DateInput(format='%Y-%m-%d', attrs={
                 'class': 'form-control',
                 'type': 'date'
@@ -106,6 +143,65 @@ class ExerciseLogForm(forms.ModelForm):
         return cleaned_data
 
 
+class WorkoutLogForm(forms.Form):
+    """Data dell'allenamento registrato in blocco (vedi plan_log_workout)."""
+    date = forms.DateField(
+        label='Data',
+        widget=forms.DateInput(format='%Y-%m-%d', attrs={'class': 'form-control', 'type': 'date'}),
+    )
+
+    def clean_date(self):
+        value = self.cleaned_data['date']
+        if value > timezone.localdate():
+            raise forms.ValidationError('Non puoi registrare un allenamento nel futuro.')
+        return value
+
+
+class WorkoutLogEntryForm(forms.Form):
+    """
+    Un esercizio dell'allenamento registrato in blocco. Le righe non
+    eseguite (done falso) si ignorano; `exercises` sono gli esercizi
+    ammessi, {id: Exercise}, già letti da chi crea il formset.
+    """
+    exercise = forms.IntegerField(widget=forms.HiddenInput)
+    done = forms.BooleanField(required=False)
+    sets = forms.IntegerField(required=False, min_value=1, widget=forms.NumberInput(attrs={
+        'class': 'form-control', 'min': 1, 'max': 20,
+    }))
+    reps = forms.IntegerField(required=False, min_value=1, widget=forms.NumberInput(attrs={
+        'class': 'form-control', 'min': 1, 'max': 100,
+    }))
+    weight = forms.DecimalField(
+        required=False, min_value=0, max_digits=6, decimal_places=2,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'min': 0, 'step': '0.5', 'placeholder': 'kg'}),
+    )
+    notes = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def __init__(self, *args, exercises, **kwargs):
+        self.exercises = exercises
+        super().__init__(*args, **kwargs)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('done'):
+            return cleaned_data
+        exercise = self.exercises.get(cleaned_data.get('exercise'))
+        if exercise is None:
+            raise forms.ValidationError('Esercizio non presente nella scheda.')
+        cleaned_data['exercise_obj'] = exercise
+        for field in ('sets', 'reps'):
+            if cleaned_data.get(field) is None and field not in self.errors:
+                self.add_error(field, 'Campo obbligatorio.')
+        if exercise.is_bodyweight:
+            cleaned_data['weight'] = None
+        elif cleaned_data.get('weight') is None and 'weight' not in self.errors:
+            self.add_error('weight', 'Il carico è obbligatorio per gli esercizi con pesi.')
+        return cleaned_data
+
+
+WorkoutLogFormSet = forms.formset_factory(WorkoutLogEntryForm, extra=0)
+
+
 class ExerciseForm(forms.ModelForm):
     """Permette all'utente di aggiungere esercizi personalizzati."""
     class Meta:
@@ -0,0 +1,488 @@
+"""
+Import da CSV di schede e allenamenti passati.
+
+Le funzioni ricevono un file (upload della richiesta o file salvato per un
+ImportJob) e ritornano un esito serializzabile in JSON:
+
+    {'ok': bool, 'messages': [[livello, testo], ...], ...}
+
+con livello tra 'success', 'info', 'warning' ed 'error'. La view lo
+trasforma in messaggi Django, il worker (manage.py run_jobs) lo salva
+sul job: la logica è la stessa in entrambi i casi.
+"""
+import codecs
+import csv
+import io
+import itertools
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import catalog, ordering
+from .caching import bump_catalog_version, bump_data_version
+from .models import (
+    Exercise, MuscleGroup, PlannedExercise, TrainingSummary, WorkoutPlan, WorkoutSession,
+)
+
+
+def _result(ok, messages, **extra):
+    return {'ok': ok, 'messages': messages, **extra}
+
+
+def _failure(text, *warnings):
+    return _result(False, [['error', text], *(['warning', w] for w in warnings)])
+
+
+# ─── Schede ───────────────────────────────────────────────────────────────────
+
+PLAN_IMPORT_TRUE = {'si', 'sì', 'yes', 'true', '1'}
+PLAN_IMPORT_MAX_ERRORS = 10
+
+
+def _parse_plan_rows(rows):
+    """
+    Valida le righe esercizio di un CSV scheda (dalla terza in poi) senza
+    toccare il DB. Ritorna (voci valide, errori): gli errori di tutte le
+    righe si raccolgono insieme, così si correggono in un solo giro.
+    """
+    entries, errors, seen = [], [], {}
+    for line, row in enumerate(rows[2:], start=3):
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(row) < 4:
+            errors.append(f'Riga {line} non valida: dati insufficienti.')
+            continue
+
+        name = row[0].strip()
+        muscle = row[1].strip() or MuscleGroup.FULL_BODY
+        notes = row[5].strip() if len(row) > 5 else ''
+        if not name:
+            errors.append(f'Riga {line}: nome esercizio mancante.')
+            continue
+        if len(name) > 100:
+            errors.append(f'Riga {line}: nome esercizio troppo lungo (max 100 caratteri).')
+            continue
+        if name in seen:
+            errors.append(f'Riga {line}: "{name}" è già alla riga {seen[name]}.')
+            continue
+        if muscle not in MuscleGroup.values:
+            errors.append(f'Riga {line}: gruppo muscolare "{muscle}" sconosciuto.')
+            continue
+        try:
+            target_sets = int(row[2])
+            target_reps = int(row[3])
+        except ValueError:
+            errors.append(f'Riga {line}: serie e ripetizioni devono essere numeri interi.')
+            continue
+        if target_sets < 1 or target_reps < 1:
+            errors.append(f'Riga {line}: serie e ripetizioni devono essere almeno 1.')
+            continue
+        if len(notes) > 200:
+            errors.append(f'Riga {line}: note troppo lunghe (max 200 caratteri).')
+            continue
+
+        seen[name] = line
+        entries.append({
+            'name': name,
+            'muscle_group': muscle,
+            'target_sets': target_sets,
+            'target_reps': target_reps,
+            'order': int(row[4]) if len(row) > 4 and row[4].strip().isdigit() else line - 2,
+            'line': line,
+            'notes': notes,
+            # Colonna opzionale (assente nei CSV esportati prima di questa
+            # funzionalità): esercizi senza questa colonna sono considerati
+            # "con pesi", coerente col default del modello.
+            'is_bodyweight': len(row) > 6 and row[6].strip().lower() in PLAN_IMPORT_TRUE,
+        })
+    return entries, errors
+
+
+def import_plan(user, upload, progress=None):
+    """
+    Importa una scheda, tutta o niente: prima si leggono e validano tutte
+    le righe, poi gli esercizi si cercano per nome con una sola query e
+    scheda, esercizi mancanti ed esercizi in scheda si scrivono in blocco
+    in un'unica transazione. Se riesce, l'esito contiene `plan_id`.
+    """
+    try:
+        content = upload.read().decode('utf-8-sig')  # utf-8-sig gestisce il BOM
+        rows = list(csv.reader(io.StringIO(content)))
+    except (UnicodeDecodeError, csv.Error):
+        return _failure('Impossibile leggere il file: usa un CSV esportato da GymIt.')
+
+    if len(rows) < 2:
+        return _failure('Il file CSV è vuoto o non valido.')
+
+    # Prima riga: piano, nome, descrizione. Seconda: intestazioni.
+    first_row = rows[0]
+    if len(first_row) < 2 or first_row[0] != 'piano':
+        return _failure('Formato CSV non valido. Usa un file esportato da GymIt.')
+
+    plan_name = first_row[1].strip()
+    plan_description = first_row[2].strip() if len(first_row) > 2 else ''
+    if not plan_name or len(plan_name) > 100:
+        return _failure('Nome scheda mancante o troppo lungo (max 100 caratteri).')
+
+    entries, errors = _parse_plan_rows(rows)
+    if errors:
+        shown = errors[:PLAN_IMPORT_MAX_ERRORS]
+        if len(errors) > PLAN_IMPORT_MAX_ERRORS:
+            shown.append(f'… e altre {len(errors) - PLAN_IMPORT_MAX_ERRORS}.')
+        return _failure(f'Scheda non importata: {len(errors)} righe da correggere.', *shown)
+    if not entries:
+        return _failure('La scheda non contiene esercizi.')
+
+    names = [entry['name'] for entry in entries]
+    exercises = {ex.name: ex for ex in Exercise.objects.filter(name__in=names)}
+    missing = [
+        Exercise(
+            name=entry['name'],
+            muscle_group=entry['muscle_group'],
+            is_bodyweight=entry['is_bodyweight'],
+        )
+        for entry in entries if entry['name'] not in exercises
+    ]
+
+    # La colonna "ordine" è una posizione: diventa una chiave per ogni
+    # esercizio, nell'ordine indicato (a parità, quello delle righe).
+    entries.sort(key=lambda entry: (entry['order'], entry['line']))
+
+    with transaction.atomic():
+        # In fondo alla lista: la chiave la assegna save(), che incrementa
+        # anche la versione dati dell'utente per tutta la transazione.
+        plan = WorkoutPlan.objects.create(
+            user=user,
+            name=plan_name,
+            description=plan_description,
+        )
+        if missing:
+            # Con ignore_conflicts le pk non vengono restituite, e un nome può
+            # essere appena stato creato da un'altra richiesta: si rilegge.
+            Exercise.objects.bulk_create(missing, ignore_conflicts=True)
+            exercises = {ex.name: ex for ex in Exercise.objects.filter(name__in=names)}
+            # bulk_create non emette segnali: il catalogo è cambiato per tutti.
+            bump_catalog_version()
+            catalog.catalog_changed()
+        PlannedExercise.objects.bulk_create([
+            PlannedExercise(
+                plan=plan,
+                exercise=exercises[entry['name']],
+                target_sets=entry['target_sets'],
+                target_reps=entry['target_reps'],
+                notes=entry['notes'],
+                order=key,
+            )
+            for key, entry in zip(ordering.spread_keys(len(entries)), entries)
+        ], batch_size=500)
+
+    msg = f'Scheda "{plan_name}" importata con successo.'
+    if missing:
+        msg += f' Esercizi creati automaticamente: {", ".join(ex.name for ex in missing)}.'
+    return _result(True, [['success', msg]], plan_id=plan.pk)
+
+
+# ─── Allenamenti ──────────────────────────────────────────────────────────────
+
+# Etichette che identificano una riga di intestazione nel CSV importato.
+HEADER_LABELS = {'data', 'date', 'giorno', 'data allenamento'}
+
+# Formati accettati per le date importate, nell'ordine in cui provarli.
+SESSION_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y')
+
+
+def session_date_parser():
+    """
+    Parser delle date di un file: ricorda il formato dell'ultima data
+    riuscita e lo prova per primo, perché in un file le date hanno quasi
+    sempre tutte lo stesso formato e così ogni riga costa un solo tentativo.
+    """
+    formats = list(SESSION_DATE_FORMATS)
+
+    def parse(raw):
+        raw = (raw or '').strip()
+        if not raw:
+            return None
+        for i, fmt in enumerate(formats):
+            try:
+                parsed = datetime.strptime(raw, fmt).date()
+            except ValueError:
+                continue
+            if i:
+                formats.insert(0, formats.pop(i))
+            return parsed
+        return None
+
+    return parse
+
+
+def parse_session_date(raw):
+    """
+    Accetta sia il formato ISO (AAAA-MM-GG) sia quello italiano (GG/MM/AAAA),
+    perché i CSV esportati da Excel in locale italiana usano il secondo.
+    """
+    return session_date_parser()(raw)
+
+
+# Separatori accettati nei CSV importati: la virgola è lo standard, ma
+# Excel in locale italiana esporta col punto e virgola, e capita di ricevere
+# file separati da tabulazione o pipe.
+CSV_DELIMITERS = [',', ';', '\t', '|']
+
+
+# Come mostrare i separatori nei messaggi d'errore.
+DELIMITER_LABELS = {',': 'virgola', ';': 'punto e virgola', '\t': 'tabulazione', '|': 'barra verticale'}
+
+# Il separatore si sceglie sulle prime righe del file: bastano a capire il
+# formato e il costo resta lo stesso qualunque sia la dimensione dell'upload.
+DELIMITER_SAMPLE_CHARS = 64 * 1024
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+# Righe scritte per transazione: ogni blocco blocca il DB per un attimo, e
+# 500 date restano sotto il limite di variabili di SQLite.
+SESSION_IMPORT_CHUNK = 500
+SESSION_IMPORT_SHOWN_ERRORS = 5
+
+
+def _detect_delimiter(sample):
+    """
+    Sceglie il separatore provando davvero a interpretare il campione con
+    ciascun candidato e premiando quello che produce più righe valide
+    (almeno due colonne e una data riconoscibile nella prima).
+
+    Contare le occorrenze non basterebbe: in un file separato da punto e
+    virgola un nome scheda come "Push, Pull, Legs" contiene più virgole che
+    punti e virgola e farebbe scegliere il separatore sbagliato. csv.Sniffer
+    a sua volta è inaffidabile su file di due sole colonne.
+    """
+    parse = session_date_parser()
+    best_delimiter, best_score = ',', -1
+    # Se nessun candidato produce righe valide (es. solo intestazione, o date
+    # tutte malformate) vince il primo che almeno spezza ogni riga in due
+    # colonne, così l'utente riceve errori di data invece di "manca una colonna".
+    fallback = None
+    for delimiter in CSV_DELIMITERS:
+        rows = [
+            row for row in csv.reader(io.StringIO(sample), delimiter=delimiter)
+            if any(cell.strip() for cell in row)
+        ]
+        # Una riga vale se ha due colonne e una data leggibile: è esattamente
+        # lo schema che l'import si aspetta.
+        score = sum(1 for row in rows if len(row) >= 2 and parse(row[0]) is not None)
+        # A parità di righe valide vince il primo candidato (la virgola),
+        # che è il formato canonico del template scaricabile.
+        if score > best_score:
+            best_delimiter, best_score = delimiter, score
+        if fallback is None and rows and all(len(row) >= 2 for row in rows):
+            fallback = delimiter
+
+    if best_score > 0:
+        return best_delimiter
+    return fallback or ','
+
+
+def _iter_upload_lines(upload):
+    """
+    Righe di testo di un file caricato, decodificate (UTF-8, con o senza
+    BOM) un blocco alla volta: il file non viene mai letto tutto in memoria.
+    UnicodeDecodeError se il file non è UTF-8.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    for chunk in upload.chunks(UPLOAD_CHUNK_BYTES):
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def _session_csv_rows(upload):
+    """
+    Lettore CSV in streaming per l'import sessioni. Il separatore si
+    sceglie su un campione iniziale, che poi viene riletto dal lettore
+    insieme al resto del file: ogni riga si decodifica e interpreta una
+    volta sola. Ritorna (righe, separatore).
+    """
+    lines = _iter_upload_lines(upload)
+    sample, size = [], 0
+    for line in lines:
+        sample.append(line)
+        size += len(line)
+        if size >= DELIMITER_SAMPLE_CHARS:
+            break
+    delimiter = _detect_delimiter(''.join(sample))
+    return csv.reader(itertools.chain(sample, lines), delimiter=delimiter), delimiter
+
+
+def _import_session_chunk(user, chunk):
+    """
+    Scrive un blocco di sessioni (senza duplicati interni) in una sua
+    transazione e ritorna quante erano davvero nuove.
+
+    Le sessioni già presenti si cercano con una query sull'intervallo di
+    date del blocco invece che con un IN sulla lista, e si inseriscono solo
+    le altre: così il conteggio è esatto senza affidarsi a ignore_conflicts,
+    che resta solo come protezione da import concorrenti.
+    """
+    dates = [s.date for s in chunk]
+    with transaction.atomic():
+        existing = set(
+            WorkoutSession.objects
+            .filter(user=user, date__range=(min(dates), max(dates)))
+            .values_list('date', 'plan_name')
+        )
+        new = [s for s in chunk if (s.date, s.plan_name) not in existing]
+        WorkoutSession.objects.bulk_create(new, batch_size=SESSION_IMPORT_CHUNK, ignore_conflicts=True)
+        # bulk_create non passa da save() né emette segnali.
+        TrainingSummary.refresh(user.pk, [s.date for s in new])
+    return len(new)
+
+
+def import_sessions(user, upload, progress=None):
+    """
+    Importa allenamenti passati (colonne: data, nome scheda).
+
+    Le schede sconosciute non vengono create: la sessione conserva solo il
+    nome, così lo storico è completo senza riempire la lista schede di voci
+    fantasma provenienti dal passato.
+
+    Il file si legge in streaming e si scrive a blocchi di
+    SESSION_IMPORT_CHUNK righe, ognuno nella sua transazione: la memoria
+    non cresce con il file. `progress(righe)` viene chiamata dopo ogni
+    blocco scritto.
+    """
+    today = timezone.localdate()
+    # Le schede esistenti vengono ricollegate per nome, così il calendario
+    # può linkare alla scheda quando questa esiste ancora.
+    plans_by_name = {p.name: p for p in WorkoutPlan.objects.filter(user=user)}
+    parse_date = session_date_parser()
+
+    chunk = []
+    seen = set()
+    errors = []
+    error_count = 0
+    skipped_future = 0
+    valid = 0
+    inserted = 0
+    non_empty = 0
+    i = 0
+
+    def add_error(message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < SESSION_IMPORT_SHOWN_ERRORS:
+            errors.append(message)
+
+    def flush():
+        nonlocal inserted
+        if chunk:
+            inserted += _import_session_chunk(user, chunk)
+            chunk.clear()
+            seen.clear()
+            if progress is not None:
+                progress(i)
+
+    try:
+        reader, delimiter = _session_csv_rows(upload)
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            non_empty += 1
+            # Intestazione opzionale: la riconosco dall'etichetta, non dal
+            # fatto che la prima cella non sia una data — altrimenti una riga
+            # con data scritta male verrebbe scartata in silenzio invece di
+            # essere segnalata.
+            if non_empty == 1 and row[0].strip().lower() in HEADER_LABELS:
+                continue
+            i += 1
+
+            if len(row) < 2:
+                add_error(
+                    f'Riga {i}: servono due colonne (data e nome scheda) '
+                    f'separate da {DELIMITER_LABELS.get(delimiter, delimiter)}.'
+                )
+                continue
+
+            raw_date = row[0].strip()
+            plan_name = row[1].strip()
+
+            if not plan_name:
+                add_error(f'Riga {i}: nome scheda mancante.')
+                continue
+            if len(plan_name) > 100:
+                add_error(f'Riga {i}: nome scheda troppo lungo (max 100 caratteri).')
+                continue
+
+            parsed = parse_date(raw_date)
+            if parsed is None:
+                add_error(
+                    f'Riga {i}: data non valida (usa AAAA-MM-GG oppure GG/MM/AAAA).'
+                )
+                continue
+            if parsed > today:
+                skipped_future += 1
+                continue
+
+            # Le righe valide ripetute nello stesso blocco non si scrivono ma
+            # contano tra i duplicati come quelle già nel DB o in un blocco
+            # precedente: il totale non dipende da dove cadono i blocchi.
+            valid += 1
+            key = (parsed, plan_name)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            chunk.append(WorkoutSession(
+                user=user,
+                date=parsed,
+                plan_name=plan_name,
+                plan=plans_by_name.get(plan_name),
+            ))
+            if len(chunk) >= SESSION_IMPORT_CHUNK:
+                flush()
+        flush()
+    except (UnicodeDecodeError, csv.Error) as exc:
+        if isinstance(exc, UnicodeDecodeError):
+            message = 'Impossibile leggere il file: salvalo con codifica UTF-8.'
+        else:
+            message = 'Il file CSV non è leggibile.'
+        if not inserted:
+            return _failure(message)
+        # I blocchi precedenti sono già salvati: reimportare il file
+        # corretto non li duplica.
+        bump_data_version(user.pk)
+        return _failure(
+            message,
+            f'{inserted} allenamenti importati prima dell\'errore: '
+            'reimportando il file corretto non verranno duplicati.',
+        )
+
+    if not non_empty:
+        return _failure('Il file CSV è vuoto.')
+
+    if not i:
+        return _failure('Il file CSV non contiene righe di dati.')
+
+    if not valid:
+        return _failure('Nessuna riga valida da importare.', *errors)
+
+    if inserted:
+        bump_data_version(user.pk)
+
+    duplicates = valid - inserted
+    msg = f'{inserted} allenamenti importati.'
+    if duplicates:
+        msg += f' {duplicates} già presenti sono stati ignorati.'
+    report = [['success', msg]]
+
+    if skipped_future:
+        report.append(['info', f'{skipped_future} righe con data futura ignorate.'])
+    report.extend(['warning', err] for err in errors)
+    if error_count > len(errors):
+        report.append(['warning', f'... e altri {error_count - len(errors)} errori.'])
+
+    return _result(True, report, inserted=inserted)
@@ -0,0 +1,121 @@
+"""
+Coda degli import in background, appoggiata alla tabella ImportJob.
+
+Un upload troppo grande per essere elaborato dentro la richiesta viene
+salvato su disco e accodato (enqueue); il worker `manage.py run_jobs` lo
+prende (claim_next), esegue lo stesso import della view (gym/imports.py)
+e ne salva l'esito sul job. La coda è solo il DB: nessun broker da
+installare, funziona uguale con SQLite in locale e con PostgreSQL.
+
+Il file caricato sta nello storage di default (MEDIA_ROOT): web e worker
+devono vedere lo stesso disco, oppure lo storage va configurato su un
+servizio condiviso.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+
+from . import imports
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+RUNNERS = {
+    ImportJob.Kind.SESSIONS: imports.import_sessions,
+    ImportJob.Kind.PLAN: imports.import_plan,
+}
+
+# Un job RUNNING da più di così appartiene a un worker morto (deploy,
+# crash, OOM): torna in coda. Gli import sono rieseguibili — quello delle
+# schede è tutto-o-niente, quello degli allenamenti salta i duplicati.
+STALE_AFTER = timedelta(minutes=30)
+MAX_ATTEMPTS = 3
+
+
+def enqueue(user, kind, upload):
+    """Salva l'upload su disco e crea il job in coda."""
+    job = ImportJob(user=user, kind=kind, filename=upload.name[:255], size=upload.size)
+    job.upload.save(upload.name, upload, save=False)
+    job.save()
+    return job
+
+
+def claim_next():
+    """
+    Prende il job in coda più vecchio e lo segna RUNNING; None se la coda
+    è vuota. L'UPDATE è condizionato allo stato QUEUED: se due worker
+    puntano lo stesso job solo uno lo ottiene, l'altro passa al successivo.
+    """
+    while True:
+        pk = (
+            ImportJob.objects
+            .filter(status=ImportJob.Status.QUEUED)
+            .order_by('created_at', 'pk')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if pk is None:
+            return None
+        claimed = ImportJob.objects.filter(pk=pk, status=ImportJob.Status.QUEUED).update(
+            status=ImportJob.Status.RUNNING,
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return ImportJob.objects.select_related('user').get(pk=pk)
+
+
+def requeue_stale(now=None):
+    """Rimette in coda i job rimasti RUNNING oltre STALE_AFTER (o li chiude dopo MAX_ATTEMPTS)."""
+    cutoff = (now or timezone.now()) - STALE_AFTER
+    stale = ImportJob.objects.filter(status=ImportJob.Status.RUNNING, started_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=ImportJob.Status.FAILED,
+        finished_at=timezone.now(),
+        result={'ok': False, 'messages': [['error', 'Import interrotto più volte: riprova.']]},
+    )
+    requeued = stale.update(status=ImportJob.Status.QUEUED, progress=0, rows=0)
+    return requeued, failed
+
+
+def run_job(job):
+    """Esegue un job già preso con claim_next() e ne salva l'esito."""
+    upload = job.upload
+
+    def report(rows):
+        done = upload.tell() if not upload.closed else job.size
+        ImportJob.objects.filter(pk=job.pk).update(
+            rows=rows,
+            progress=min(99, done * 100 // max(job.size, 1)),
+        )
+
+    try:
+        upload.open('rb')
+        try:
+            result = RUNNERS[job.kind](job.user, upload, progress=report)
+        finally:
+            upload.close()
+    except Exception:
+        logger.exception('Import %s fallito', job.pk)
+        result = {'ok': False, 'messages': [['error', "Errore imprevisto durante l'importazione."]]}
+
+    # Il file serve solo all'import: l'esito resta sul job.
+    upload.delete(save=False)
+    ImportJob.objects.filter(pk=job.pk).update(
+        status=ImportJob.Status.DONE if result['ok'] else ImportJob.Status.FAILED,
+        result=result,
+        progress=100,
+        upload='',
+        finished_at=timezone.now(),
+    )
+
+
+def run_claimed(job):
+    """run_job per i thread del worker: ognuno usa e poi chiude la sua connessione."""
+    try:
+        run_job(job)
+    finally:
+        connections.close_all()
@@ -0,0 +1,80 @@
+"""
+Misura i tempi di gym/analytics.py su storici sintetici di dimensione
+crescente (di default 1k, 10k e 100k log per utente), per verificare che
+il costo cresca in modo lineare. Con --user misura anche la lettura dal DB
+dello storico reale di un utente.
+Uso: python manage.py benchmark_analytics [--logs N ...] [--exercises N] [--user USERNAME]
+"""
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from gym import analytics
+
+
+def synthetic_rows(count, exercises, seed=0):
+    """
+    Tuple come quelle di StrengthSeries.load(): un log ogni due o tre
+    giorni per esercizio, 1RM in crescita lenta con rumore.
+    """
+    rng = np.random.default_rng(seed)
+    per_exercise = -(-count // exercises)
+    start = date(2015, 1, 1)
+    rows = []
+    for exercise_id in range(1, exercises + 1):
+        gaps = rng.integers(2, 4, per_exercise).cumsum()
+        one_rm = 60 + gaps * 0.05 + rng.normal(0, 3, per_exercise)
+        for gap, value in zip(gaps.tolist(), one_rm.round(2).tolist()):
+            if len(rows) == count:
+                break
+            rows.append((
+                len(rows) + 1, exercise_id, start + timedelta(days=gap),
+                Decimal(str(value)), 5, Decimal(str(round(value / 1.1667, 2))),
+            ))
+    return rows
+
+
+def _best_of(repeat, func):
+    """Miglior tempo in millisecondi su `repeat` esecuzioni, e l'ultimo risultato."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+class Command(BaseCommand):
+    help = 'Misura i tempi delle analisi vettoriali (tendenze, medie mobili) al crescere dello storico'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logs', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                            help='Numero di log sintetici per utente (uno o più)')
+        parser.add_argument('--exercises', type=int, default=40, help='Esercizi distinti nello storico')
+        parser.add_argument('--repeat', type=int, default=5, help='Ripetizioni per misura (vale la migliore)')
+        parser.add_argument('--user', help='Misura anche lo storico reale di un utente (username)')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(f'{"log":>9} {"array":>10} {"tendenze":>10} {"media mob.":>10}  (ms)')
+        for count in options['logs']:
+            rows = synthetic_rows(count, options['exercises'])
+            convert_ms, series = _best_of(repeat, lambda: analytics.StrengthSeries.from_rows(rows))
+            trends_ms, _ = _best_of(repeat, lambda: analytics.trends(series))
+            rolling_ms, _ = _best_of(repeat, lambda: analytics.rolling_mean(series))
+            self.stdout.write(f'{count:>9} {convert_ms:>10.1f} {trends_ms:>10.1f} {rolling_ms:>10.1f}')
+
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'Utente "{options["user"]}" inesistente.')
+            load_ms, series = _best_of(repeat, lambda: analytics.StrengthSeries.load(user))
+            trends_ms, _ = _best_of(repeat, lambda: analytics.trends(series))
+            self.stdout.write(
+                f'{user.username}: {len(series)} log, lettura dal DB {load_ms:.1f} ms, tendenze {trends_ms:.1f} ms'
+            )
@@ -0,0 +1,41 @@
+"""
+Misura latenza (mediana e 95° percentile) e query delle view più usate per
+un utente, di solito uno generato con generate_load_data, e scrive il
+risultato in JSON per confrontarlo tra un rilascio e l'altro (vedi
+gym/benchmarks.py).
+Uso: python manage.py benchmark_views USERNAME [--repeat N] [--only NOME ...] [--output FILE]
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from gym import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Misura latenza e numero di query delle view principali per un utente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--repeat', type=int, default=20, help='Richieste per scenario')
+        parser.add_argument('--only', nargs='+', help='Solo gli scenari indicati (es. dashboard plan_list)')
+        parser.add_argument('--output', help='File JSON da scrivere (altrimenti solo la tabella)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Utente "{options["username"]}" inesistente.')
+
+        report = benchmarks.run(user, repeat=options['repeat'], names=options['only'])
+
+        self.stdout.write(f'{"scenario":<22} {"cache":<5} {"p50 ms":>8} {"p95 ms":>8} {"query":>6}')
+        for row in report['results']:
+            self.stdout.write(
+                f'{row["name"]:<22} {row["cache"]:<5} {row["p50_ms"]:>8.1f} {row["p95_ms"]:>8.1f} {row["queries"]:>6}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as out:
+                json.dump(report, out, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Completato: {options["output"]}.'))
@@ -0,0 +1,33 @@
+"""
+Esporta tutti i dati di un utente in un file, come il download
+"Esporta dati" (vedi gym/exports.py). Il file si scrive a blocchi: la
+memoria resta costante anche per storici molto lunghi.
+Uso: python manage.py export_account USERNAME --output FILE [--format zip|ndjson]
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from gym import exports
+
+
+class Command(BaseCommand):
+    help = 'Esporta i dati di un utente (log, allenamenti, cartelle e schede)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--output', required=True, help='File da scrivere')
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='zip')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Utente "{options["username"]}" inesistente.')
+
+        size = 0
+        with open(options['output'], 'wb') as out:
+            for chunk in exports.iter_export(user, options['format']):
+                out.write(chunk)
+                size += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Completato: {options["output"]} ({size} byte).'))
@@ -0,0 +1,205 @@
+"""
+Genera dati sintetici realistici per le misure di prestazioni (vedi
+manage.py benchmark_views): utenti con cartelle, schede, anni di
+allenamenti e log con progressione dei carichi. Tutto si crea in blocco e
+con un seme fisso, quindi gli stessi argomenti producono gli stessi dati.
+
+Gli utenti si chiamano PREFISSO0001, PREFISSO0002, ... e hanno tutti la
+stessa password. Il catalogo esercizi deve esistere (seed_exercises).
+Uso: python manage.py generate_load_data [--users N] [--years N] [--seed N]
+     [--prefix load] [--password PASSWORD] [--replace]
+"""
+import math
+import random
+import re
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from gym.caching import bump_data_version
+from gym.models import (
+    Exercise, ExerciseLog, MuscleGroup, PlanFolder, PlannedExercise, TrainingSummary,
+    WorkoutPlan, WorkoutSession,
+)
+from gym.ordering import spread_keys
+
+# Schede tipo: nome e gruppi muscolari degli esercizi, in ordine.
+PLAN_TEMPLATES = {
+    'Push': [MuscleGroup.CHEST, MuscleGroup.CHEST, MuscleGroup.SHOULDERS, MuscleGroup.SHOULDERS, MuscleGroup.TRICEPS],
+    'Pull': [MuscleGroup.BACK, MuscleGroup.BACK, MuscleGroup.BACK, MuscleGroup.BICEPS, MuscleGroup.FOREARMS],
+    'Legs': [MuscleGroup.LEGS, MuscleGroup.LEGS, MuscleGroup.LEGS, MuscleGroup.GLUTES, MuscleGroup.CALVES],
+    'Upper': [MuscleGroup.CHEST, MuscleGroup.BACK, MuscleGroup.SHOULDERS, MuscleGroup.BICEPS, MuscleGroup.TRICEPS],
+    'Lower': [MuscleGroup.LEGS, MuscleGroup.LEGS, MuscleGroup.GLUTES, MuscleGroup.CALVES, MuscleGroup.ABS],
+    'Full Body': [MuscleGroup.LEGS, MuscleGroup.CHEST, MuscleGroup.BACK, MuscleGroup.SHOULDERS, MuscleGroup.ABS],
+}
+
+# Programmi: una cartella ciascuno, con le sue schede. Ogni utente ne
+# segue due, alternandoli ogni anno.
+PROGRAMS = {
+    'Push Pull Legs': ['Push', 'Pull', 'Legs'],
+    'Upper Lower': ['Upper', 'Lower'],
+    'Full Body': ['Full Body'],
+}
+
+REP_TARGETS = [5, 6, 8, 10, 12]
+
+
+def _round_to_plate(weight):
+    """Carichi realistici: multipli di 2,5 kg, mai sotto i 2,5."""
+    return max(2.5, round(weight / 2.5) * 2.5)
+
+
+class UserHistory:
+    """Cartelle, schede e storico di un utente sintetico, ancora da salvare."""
+
+    def __init__(self, user, catalogue, years, rng, today):
+        self.user = user
+        self.rng = rng
+        self.folders, self.plans, self.planned = [], [], []
+        self.sessions, self.logs = [], []
+
+        programs = rng.sample(sorted(PROGRAMS), 2)
+        root_keys = spread_keys(len(programs) + 1)
+        self.program_plans = []
+        for key, program in zip(root_keys, programs):
+            folder = PlanFolder(user=user, name=program, order=key)
+            self.folders.append(folder)
+            plans = [
+                self._plan(name, catalogue, folder=folder, order=order)
+                for name, order in zip(PROGRAMS[program], spread_keys(len(PROGRAMS[program])))
+            ]
+            self.program_plans.append(plans)
+        # Una scheda sciolta e non attiva, come quelle lasciate a metà.
+        self._plan('Scarico', catalogue, order=root_keys[-1], template='Full Body', is_active=False)
+
+        self._history(years, today)
+
+    def _plan(self, name, catalogue, folder=None, order='', template=None, is_active=True):
+        plan = WorkoutPlan(user=self.user, name=name, folder=folder, order=order, is_active=is_active)
+        self.plans.append(plan)
+        used = set()
+        muscles = PLAN_TEMPLATES[template or name]
+        for key, muscle in zip(spread_keys(len(muscles)), muscles):
+            choices = [ex for ex in catalogue.get(muscle, []) if ex.pk not in used]
+            if not choices:
+                continue
+            exercise = self.rng.choice(choices)
+            used.add(exercise.pk)
+            self.planned.append(PlannedExercise(
+                plan=plan, exercise=exercise, order=key,
+                target_sets=self.rng.randint(3, 5), target_reps=self.rng.choice(REP_TARGETS),
+            ))
+        return plan
+
+    def _history(self, years, today):
+        """
+        Da 2 a 5 allenamenti a settimana, con qualche settimana di pausa;
+        le schede del programma si alternano in ordine.
+        """
+        rng = self.rng
+        start = today - timedelta(days=365 * years)
+        planned_by_plan = {}
+        for pe in self.planned:
+            planned_by_plan.setdefault(id(pe.plan), []).append(pe)
+        strength = {}
+        turn = 0
+        for week in range(0, (today - start).days // 7 + 1):
+            if rng.random() < 0.08:
+                continue
+            week_start = start + timedelta(weeks=week)
+            for offset in sorted(rng.sample(range(7), rng.randint(2, 5))):
+                day = week_start + timedelta(days=offset)
+                if day > today:
+                    break
+                plans = self.program_plans[(day - start).days // 365 % len(self.program_plans)]
+                plan = plans[turn % len(plans)]
+                turn += 1
+                self.sessions.append(WorkoutSession(user=self.user, date=day, plan=plan, plan_name=plan.name))
+                for pe in planned_by_plan.get(id(plan), []):
+                    self.logs.append(self._log(pe, day, (day - start).days, strength))
+
+    def _log(self, pe, day, elapsed, strength):
+        rng = self.rng
+        exercise = pe.exercise
+        reps = max(1, pe.target_reps + rng.randint(-2, 1))
+        log = ExerciseLog(user=self.user, exercise=exercise, date=day, sets=pe.target_sets, reps=reps)
+        if exercise.is_bodyweight:
+            log.reps = rng.randint(6, 20)
+            return log
+        if exercise.pk not in strength:
+            strength[exercise.pk] = (rng.uniform(20, 100), rng.uniform(0.3, 0.8))
+        base, potential = strength[exercise.pk]
+        # Il 1RM sale in fretta i primi mesi e poi si avvicina piano al
+        # massimo, base × (1 + potential), come per chi si allena davvero.
+        one_rm = base * (1 + potential * (1 - math.exp(-elapsed / 400)))
+        log.weight = _round_to_plate(one_rm / (1 + reps / 30) * rng.uniform(0.92, 1.02))
+        return log
+
+
+class Command(BaseCommand):
+    help = 'Genera utenti, schede, allenamenti e log sintetici per le misure di prestazioni'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Utenti da generare')
+        parser.add_argument('--years', type=int, default=1, help='Anni di storico per utente')
+        parser.add_argument('--seed', type=int, default=1, help='Seme dei dati casuali')
+        parser.add_argument('--prefix', default='load', help='Prefisso degli username')
+        parser.add_argument('--password', default='loadtest', help='Password di tutti gli utenti generati')
+        parser.add_argument('--replace', action='store_true',
+                            help='Elimina prima gli utenti con lo stesso prefisso')
+
+    def handle(self, *args, **options):
+        catalogue = {}
+        for exercise in Exercise.objects.filter(created_by__isnull=True).order_by('pk'):
+            catalogue.setdefault(exercise.muscle_group, []).append(exercise)
+        if not catalogue:
+            raise CommandError('Catalogo esercizi vuoto: esegui prima "manage.py seed_exercises".')
+
+        prefix = options['prefix']
+        existing = User.objects.filter(username__regex=rf'^{re.escape(prefix)}\d{{4}}$')
+        if options['replace']:
+            existing.delete()
+        elif existing.exists():
+            raise CommandError(f'Esistono già utenti "{prefix}NNNN": usa --replace per rigenerarli.')
+
+        # Una sola derivazione della password per tutti: con migliaia di
+        # utenti l'hash dominerebbe il tempo del comando.
+        password = make_password(options['password'])
+        today = timezone.localdate()
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}{n:04d}', password=password)
+            for n in range(1, options['users'] + 1)
+        ])
+
+        total_logs = total_sessions = 0
+        for index, user in enumerate(users, start=1):
+            rng = random.Random(f'{options["seed"]}:{index}')
+            history = UserHistory(user, catalogue, options['years'], rng, today)
+            with transaction.atomic():
+                PlanFolder.objects.bulk_create(history.folders)
+                for plan in history.plans:
+                    plan.folder_id = plan.folder.pk if plan.folder else None
+                WorkoutPlan.objects.bulk_create(history.plans)
+                for pe in history.planned:
+                    pe.plan_id = pe.plan.pk
+                PlannedExercise.objects.bulk_create(history.planned)
+                for session in history.sessions:
+                    session.plan_id = session.plan.pk
+                WorkoutSession.objects.bulk_create(history.sessions, batch_size=500)
+                TrainingSummary.refresh(user.pk, [s.date for s in history.sessions])
+                # Statistiche e record come per un allenamento registrato in blocco.
+                ExerciseLog.bulk_log(history.logs)
+                bump_data_version(user.pk)
+            total_logs += len(history.logs)
+            total_sessions += len(history.sessions)
+            if index % 50 == 0:
+                self.stdout.write(f'{index}/{len(users)} utenti...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Completato: {len(users)} utenti, {total_sessions} allenamenti, {total_logs} log '
+            f'(password "{options["password"]}").'
+        ))
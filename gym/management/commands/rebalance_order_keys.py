@@ -0,0 +1,46 @@
+"""
+Ridistribuisce le chiavi d'ordine troppo lunghe (vedi gym/ordering.py).
+
+Il drag & drop ridistribuisce da solo un gruppo quando una chiave supera
+la soglia; questo comando fa lo stesso su tutto il DB ed è pensato per
+girare periodicamente (cron) o dopo interventi manuali sui dati.
+Uso: python manage.py rebalance_order_keys [--all]
+"""
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Length
+
+from gym.models import PlanFolder, PlannedExercise, WorkoutPlan, plan_tree_group
+from gym.ordering import REBALANCE_LENGTH, rebalance
+
+
+class Command(BaseCommand):
+    help = "Ridistribuisce le chiavi d'ordine di schede, cartelle ed esercizi in scheda"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Ridistribuisce tutti i gruppi, non solo quelli con chiavi lunghe',
+        )
+
+    def handle(self, *args, **options):
+        def needing(model):
+            qs = model.objects.order_by()
+            if not options['all']:
+                qs = qs.annotate(key_length=Length('order')).filter(key_length__gt=REBALANCE_LENGTH)
+            return qs
+
+        groups = {}
+        for plan_id in needing(PlannedExercise).values_list('plan_id', flat=True).distinct():
+            groups[('plan', plan_id)] = [PlannedExercise.objects.filter(plan_id=plan_id)]
+        for user_id, folder_id in needing(WorkoutPlan).values_list('user_id', 'folder_id').distinct():
+            if folder_id is None:
+                groups[('root', user_id)] = plan_tree_group(user_id)
+            else:
+                groups[('folder', folder_id)] = [WorkoutPlan.objects.filter(folder_id=folder_id)]
+        for user_id in needing(PlanFolder).values_list('user_id', flat=True).distinct():
+            groups[('root', user_id)] = plan_tree_group(user_id)
+
+        for group in groups.values():
+            rebalance(group)
+
+        self.stdout.write(self.style.SUCCESS(f'Completato: {len(groups)} gruppi ridistribuiti.'))
@@ -0,0 +1,45 @@
+"""
+Ricostruisce da zero le statistiche per esercizio (ExerciseStats) e i record
+personali (PersonalRecord) a partire dai log. Normalmente sono mantenuti in
+automatico a ogni salvataggio: serve dopo import massivi, modifiche fatte a
+mano sul DB o per verificarli.
+Uso: python manage.py rebuild_exercise_stats [--user USERNAME]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from gym.models import ExerciseLog, ExerciseStats, PersonalRecord
+
+
+class Command(BaseCommand):
+    help = 'Ricostruisce statistiche e record personali per esercizio a partire dai log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Limita la ricostruzione a un solo utente (username)')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f'Utente "{options["user"]}" inesistente.')
+
+        rebuilt = 0
+        # Le statistiche si ricostruiscono per utente a query costanti; i
+        # record richiedono una query per rep-max di ogni esercizio.
+        for user_id in users.order_by('id').values_list('id', flat=True).iterator():
+            rebuilt += ExerciseStats.rebuild_for_user(user_id)
+
+            PersonalRecord.objects.filter(user_id=user_id).delete()
+            exercise_ids = (
+                ExerciseLog.objects
+                .filter(user_id=user_id, weight__isnull=False)
+                .order_by('exercise_id')
+                .values_list('exercise_id', flat=True)
+                .distinct()
+            )
+            for exercise_id in exercise_ids:
+                PersonalRecord.rebuild_for(user_id, exercise_id)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Completato: statistiche ricostruite per {rebuilt} esercizi.')
+        )
@@ -0,0 +1,65 @@
+"""
+Worker degli import in background (ImportJob, vedi gym/jobs.py).
+
+Prende i job in coda dal DB e li esegue su un pool di thread; gira finché
+non riceve SIGTERM/SIGINT, poi smette di prendere job e aspetta quelli in
+corso. Va avviato come processo separato accanto al server web (vedi
+Procfile). Con --once svuota la coda ed esce, utile da cron o in locale.
+Uso: python manage.py run_jobs [--workers N] [--poll SECONDI] [--once]
+"""
+import signal
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gym import jobs
+
+
+class Command(BaseCommand):
+    help = 'Esegue gli import CSV in coda'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Import eseguiti in parallelo (default 2)')
+        parser.add_argument('--poll', type=float, default=2.0, help='Secondi tra un controllo della coda e il successivo')
+        parser.add_argument('--once', action='store_true', help='Esegue i job in coda ed esce')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers deve essere almeno 1.')
+
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, lambda *_: stop.set())
+
+        requeued, failed = jobs.requeue_stale()
+        if requeued or failed:
+            self.stdout.write(f'Job interrotti: {requeued} rimessi in coda, {failed} chiusi.')
+
+        done_count = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gym-job') as pool:
+            running = set()
+            while not stop.is_set():
+                while len(running) < workers:
+                    job = jobs.claim_next()
+                    if job is None:
+                        break
+                    self.stdout.write(f'Import {job.pk} ({job.kind}, {job.filename}) avviato.')
+                    running.add(pool.submit(jobs.run_claimed, job))
+
+                if not running:
+                    if options['once']:
+                        break
+                    stop.wait(options['poll'])
+                    continue
+                finished, running = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if future.exception() is not None:
+                        self.stderr.write(f'Import terminato con errore: {future.exception()!r}')
+                done_count += len(finished)
+            # All'uscita il pool aspetta i job ancora in corso.
+            done_count += len(running)
+
+        self.stdout.write(self.style.SUCCESS(f'Completato: {done_count} import eseguiti.'))
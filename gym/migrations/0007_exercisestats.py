@@ -0,0 +1,66 @@
+# Generated by Django 6.0.7 on 2026-10-18 09:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def populate_exercise_stats(apps, schema_editor):
+    """Popola le statistiche per i log già esistenti."""
+    ExerciseLog = apps.get_model('gym', 'ExerciseLog')
+    ExerciseStats = apps.get_model('gym', 'ExerciseStats')
+
+    pairs = (
+        ExerciseLog.objects
+        .order_by('user_id', 'exercise_id')
+        .values('user_id', 'exercise_id')
+        .annotate(log_count=Count('id'), best_one_rm=Max('one_rm'), best_reps=Max('reps'))
+    )
+    to_create = []
+    for pair in pairs:
+        logs = ExerciseLog.objects.filter(user_id=pair['user_id'], exercise_id=pair['exercise_id'])
+        first = logs.order_by('date', 'id').first()
+        last = logs.order_by('-date', '-id').first()
+        to_create.append(ExerciseStats(
+            **pair,
+            first_log_date=first.date,
+            first_one_rm=first.one_rm,
+            last_log_date=last.date,
+            last_one_rm=last.one_rm,
+            last_log=last,
+        ))
+    ExerciseStats.objects.bulk_create(to_create, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0006_workoutsession_is_free'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('log_count', models.PositiveIntegerField(default=0, verbose_name='Numero di log')),
+                ('first_log_date', models.DateField(null=True, verbose_name='Data primo log')),
+                ('last_log_date', models.DateField(null=True, verbose_name='Data ultimo log')),
+                ('first_one_rm', models.DecimalField(decimal_places=2, max_digits=6, null=True, verbose_name='Primo 1RM (kg)')),
+                ('last_one_rm', models.DecimalField(decimal_places=2, max_digits=6, null=True, verbose_name='Ultimo 1RM (kg)')),
+                ('best_one_rm', models.DecimalField(decimal_places=2, max_digits=6, null=True, verbose_name='Miglior 1RM (kg)')),
+                ('best_reps', models.PositiveSmallIntegerField(null=True, verbose_name='Massimo ripetizioni')),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='gym.exercise')),
+                ('last_log', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gym.exerciselog')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exercise_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Statistiche esercizio',
+                'verbose_name_plural': 'Statistiche esercizi',
+                'unique_together': {('user', 'exercise')},
+            },
+        ),
+        migrations.RunPython(populate_exercise_stats, migrations.RunPython.noop),
+    ]
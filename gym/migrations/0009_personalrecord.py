@@ -0,0 +1,63 @@
+# Generated by Django 6.0.7 on 2026-10-18 11:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+ESTIMATED_ONE_RM = 0
+REP_MAXES = (1, 3, 5, 8, 10)
+
+
+def populate_personal_records(apps, schema_editor):
+    """Calcola i record per i log già esistenti."""
+    ExerciseLog = apps.get_model('gym', 'ExerciseLog')
+    PersonalRecord = apps.get_model('gym', 'PersonalRecord')
+
+    weighted = ExerciseLog.objects.filter(weight__isnull=False, one_rm__isnull=False)
+    pairs = weighted.order_by('user_id', 'exercise_id').values_list('user_id', 'exercise_id').distinct()
+    to_create = []
+    for user_id, exercise_id in pairs:
+        logs = weighted.filter(user_id=user_id, exercise_id=exercise_id)
+        best = logs.order_by('-one_rm', 'date', 'id').first()
+        to_create.append(PersonalRecord(
+            user_id=user_id, exercise_id=exercise_id, reps=ESTIMATED_ONE_RM,
+            value=best.one_rm, date=best.date, log=best,
+        ))
+        for reps in REP_MAXES:
+            best = logs.filter(reps__gte=reps).order_by('-weight', 'date', 'id').first()
+            if best is not None:
+                to_create.append(PersonalRecord(
+                    user_id=user_id, exercise_id=exercise_id, reps=reps,
+                    value=best.weight, date=best.date, log=best,
+                ))
+    PersonalRecord.objects.bulk_create(to_create, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0008_dataversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonalRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reps', models.PositiveSmallIntegerField(verbose_name='Ripetizioni')),
+                ('value', models.DecimalField(decimal_places=2, max_digits=6, verbose_name='Valore (kg)')),
+                ('date', models.DateField(verbose_name='Data')),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to='gym.exercise')),
+                ('log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to='gym.exerciselog')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Record personale',
+                'verbose_name_plural': 'Record personali',
+                'ordering': ['reps'],
+                'unique_together': {('user', 'exercise', 'reps')},
+            },
+        ),
+        migrations.RunPython(populate_personal_records, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 6.0.7 on 2026-10-18 11:48
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_training_summary(apps, schema_editor):
+    """Calcola settimane e riepiloghi dalle sessioni già esistenti."""
+    WorkoutSession = apps.get_model('gym', 'WorkoutSession')
+    TrainingWeek = apps.get_model('gym', 'TrainingWeek')
+    TrainingSummary = apps.get_model('gym', 'TrainingSummary')
+
+    days_by_user = defaultdict(set)
+    for user_id, day in WorkoutSession.objects.values_list('user_id', 'date').distinct():
+        days_by_user[user_id].add(day)
+
+    weeks, summaries = [], []
+    for user_id, days in days_by_user.items():
+        counts = Counter(d - timedelta(days=d.weekday()) for d in days)
+        current = longest = 0
+        previous = None
+        for week in sorted(counts):
+            weeks.append(TrainingWeek(user_id=user_id, week_start=week, days=counts[week]))
+            current = current + 1 if previous and week - previous == timedelta(weeks=1) else 1
+            longest = max(longest, current)
+            previous = week
+        summaries.append(TrainingSummary(
+            user_id=user_id,
+            total_days=len(days),
+            first_date=min(days),
+            streak_end=previous,
+            streak_weeks=current,
+            longest_streak=longest,
+        ))
+    TrainingWeek.objects.bulk_create(weeks, batch_size=500)
+    TrainingSummary.objects.bulk_create(summaries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('gym', '0009_personalrecord'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='training_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_days', models.PositiveIntegerField(default=0, verbose_name='Giorni allenati')),
+                ('first_date', models.DateField(null=True, verbose_name='Primo allenamento')),
+                ('streak_end', models.DateField(null=True, verbose_name='Ultima settimana allenata')),
+                ('streak_weeks', models.PositiveIntegerField(default=0, verbose_name='Serie attuale (settimane)')),
+                ('longest_streak', models.PositiveIntegerField(default=0, verbose_name='Serie più lunga (settimane)')),
+            ],
+            options={
+                'verbose_name': 'Riepilogo allenamenti',
+                'verbose_name_plural': 'Riepiloghi allenamenti',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrainingWeek',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField(verbose_name='Inizio settimana')),
+                ('days', models.PositiveSmallIntegerField(default=0, verbose_name='Giorni allenati')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='training_weeks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Settimana di allenamento',
+                'verbose_name_plural': 'Settimane di allenamento',
+                'ordering': ['week_start'],
+                'unique_together': {('user', 'week_start')},
+            },
+        ),
+        migrations.RunPython(populate_training_summary, migrations.RunPython.noop),
+    ]
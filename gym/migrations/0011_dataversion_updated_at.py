@@ -0,0 +1,18 @@
+# Generated by Django 6.0.7 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0010_trainingsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataversion',
+            name='updated_at',
+            field=models.DateTimeField(null=True, verbose_name='Ultima modifica'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 6.0.7 on 2026-10-18 13:02
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def spread_keys(count):
+    # Copia di gym.ordering.spread_keys: le migrazioni non dipendono dal
+    # codice dell'app, che può cambiare.
+    base = len(DIGITS)
+    width = 1
+    while base ** width < (count + 1) * base:
+        width += 1
+    step = base ** width // (count + 1)
+    keys = []
+    for i in range(1, count + 1):
+        value, digits = i * step, []
+        for _ in range(width):
+            value, digit = divmod(value, base)
+            digits.append(DIGITS[digit])
+        keys.append(''.join(reversed(digits)).rstrip('0'))
+    return keys
+
+
+def convert_orders(apps, schema_editor):
+    """Converte le posizioni intere in chiavi, gruppo per gruppo, mantenendo l'ordine."""
+    PlanFolder = apps.get_model('gym', 'PlanFolder')
+    WorkoutPlan = apps.get_model('gym', 'WorkoutPlan')
+    PlannedExercise = apps.get_model('gym', 'PlannedExercise')
+
+    groups = defaultdict(list)
+    # A parità di posizione valeva l'ordinamento del modello (-created_at).
+    for folder in PlanFolder.objects.all():
+        groups[('root', folder.user_id)].append((folder.order, -folder.created_at.timestamp(), folder))
+    for plan in WorkoutPlan.objects.all():
+        group = ('folder', plan.folder_id) if plan.folder_id else ('root', plan.user_id)
+        groups[group].append((plan.order, -plan.created_at.timestamp(), plan))
+    for pe in PlannedExercise.objects.all():
+        groups[('plan', pe.plan_id)].append((pe.order, pe.pk, pe))
+
+    to_update = defaultdict(list)
+    for members in groups.values():
+        members.sort(key=lambda m: m[:2])
+        for key, (_, _, obj) in zip(spread_keys(len(members)), members):
+            obj.order_key = key
+            to_update[type(obj)].append(obj)
+    for model, objs in to_update.items():
+        model.objects.bulk_update(objs, ['order_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0011_dataversion_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planfolder',
+            name='order_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='workoutplan',
+            name='order_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='plannedexercise',
+            name='order_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(convert_orders, migrations.RunPython.noop),
+        migrations.RemoveField(model_name='planfolder', name='order'),
+        migrations.RemoveField(model_name='workoutplan', name='order'),
+        migrations.RemoveField(model_name='plannedexercise', name='order'),
+        migrations.RenameField(model_name='planfolder', old_name='order_key', new_name='order'),
+        migrations.RenameField(model_name='workoutplan', old_name='order_key', new_name='order'),
+        migrations.RenameField(model_name='plannedexercise', old_name='order_key', new_name='order'),
+        migrations.AlterField(
+            model_name='planfolder',
+            name='order',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Ordine'),
+        ),
+        migrations.AlterField(
+            model_name='workoutplan',
+            name='order',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Ordine'),
+        ),
+        migrations.AlterField(
+            model_name='plannedexercise',
+            name='order',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Ordine'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.7 on 2026-10-18 14:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0012_sparse_order_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sessions', 'Allenamenti'), ('plan', 'Scheda')], max_length=20)),
+                ('status', models.CharField(choices=[('queued', 'In coda'), ('running', 'In corso'), ('done', 'Completato'), ('failed', 'Non riuscito')], default='queued', max_length=20)),
+                ('upload', models.FileField(blank=True, upload_to='imports/%Y/%m/')),
+                ('filename', models.CharField(blank=True, max_length=255, verbose_name='Nome file')),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Import in background',
+                'verbose_name_plural': 'Import in background',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='gym_importj_status_ede9ec_idx')],
+            },
+        ),
+    ]
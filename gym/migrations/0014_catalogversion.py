@@ -0,0 +1,25 @@
+# Generated by Django 6.0.7 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0013_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(null=True, verbose_name='Ultima modifica')),
+            ],
+            options={
+                'verbose_name': 'Versione catalogo',
+                'verbose_name_plural': 'Versioni catalogo',
+            },
+        ),
+    ]
@@ -1,7 +1,14 @@
-from django.db import models
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, Max, OuterRef, Subquery
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 
+from .ordering import KEY_MAX_LENGTH, append_key
+
 
 class MuscleGroup(models.TextChoices):
     CHEST = 'chest', 'Petto'
@@ -50,7 +57,9 @@ class PlanFolder(models.Model):
     """
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='plan_folders')
     name = models.CharField(max_length=100, verbose_name='Nome cartella')
-    order = models.PositiveIntegerField(default=0, verbose_name='Ordine')
+    # Chiave di ordinamento sparsa (vedi gym/ordering.py), condivisa con le
+    # schede fuori dalle cartelle: alla radice si ordinano insieme.
+    order = models.CharField(max_length=KEY_MAX_LENGTH, blank=True, default='', verbose_name='Ordine')
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -58,6 +67,15 @@ class PlanFolder(models.Model):
         verbose_name = 'Cartella'
         verbose_name_plural = 'Cartelle'
 
+    def order_group(self):
+        return plan_tree_group(self.user_id)
+
+    def save(self, *args, **kwargs):
+        # Senza chiave esplicita una nuova cartella va in fondo.
+        if not self.order:
+            self.order = append_key(self.order_group())
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.name} ({self.user.username})"
 
@@ -69,7 +87,7 @@ class WorkoutPlan(models.Model):
     description = models.TextField(blank=True, verbose_name='Note')
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True, verbose_name='Attiva')
-    order = models.PositiveIntegerField(default=0, verbose_name='Ordine')
+    order = models.CharField(max_length=KEY_MAX_LENGTH, blank=True, default='', verbose_name='Ordine')
     folder = models.ForeignKey(
         PlanFolder,
         on_delete=models.SET_NULL,
@@ -83,10 +101,29 @@ class WorkoutPlan(models.Model):
         verbose_name = 'Scheda'
         verbose_name_plural = 'Schede'
 
+    def order_group(self):
+        """Le schede si ordinano dentro la loro cartella, o alla radice."""
+        if self.folder_id:
+            return [WorkoutPlan.objects.filter(user_id=self.user_id, folder_id=self.folder_id)]
+        return plan_tree_group(self.user_id)
+
+    def save(self, *args, **kwargs):
+        if not self.order:
+            self.order = append_key(self.order_group())
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.name} ({self.user.username})"
 
 
+def plan_tree_group(user_id):
+    """Radice della lista schede: cartelle e schede sciolte, ordinate insieme."""
+    return [
+        PlanFolder.objects.filter(user_id=user_id),
+        WorkoutPlan.objects.filter(user_id=user_id, folder__isnull=True),
+    ]
+
+
 class PlannedExercise(models.Model):
     """
     Esercizio pianificato all'interno di una scheda.
@@ -106,7 +143,7 @@ class PlannedExercise(models.Model):
         verbose_name='Ripetizioni obiettivo',
         validators=[MinValueValidator(1)]
     )
-    order = models.PositiveSmallIntegerField(default=0, verbose_name='Ordine')
+    order = models.CharField(max_length=KEY_MAX_LENGTH, blank=True, default='', verbose_name='Ordine')
     notes = models.CharField(max_length=200, blank=True, verbose_name='Note')
 
     class Meta:
@@ -115,6 +152,14 @@ class PlannedExercise(models.Model):
         verbose_name = 'Esercizio in scheda'
         verbose_name_plural = 'Esercizi in scheda'
 
+    def order_group(self):
+        return [PlannedExercise.objects.filter(plan_id=self.plan_id)]
+
+    def save(self, *args, **kwargs):
+        if not self.order:
+            self.order = append_key(self.order_group())
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.exercise.name} — {self.target_sets}x{self.target_reps}"
 
@@ -182,13 +227,75 @@ class ExerciseLog(models.Model):
             return round(float(weight), 2)
         return round(float(weight) * (1 + reps / 30), 2)
 
-    def save(self, *args, **kwargs):
+    def _compute_one_rm(self):
+        # self.exercise va già caricato da chi salva più log insieme.
         if self.exercise.is_bodyweight:
             self.weight = None
             self.one_rm = None
         else:
             self.one_rm = self.epley(self.weight, self.reps)
-        super().save(*args, **kwargs)
+
+    def save(self, *args, **kwargs):
+        self._compute_one_rm()
+
+        adding = self._state.adding
+        with transaction.atomic():
+            # In modifica il log può cambiare esercizio: le statistiche del
+            # vecchio esercizio vanno ricalcolate oltre a quelle del nuovo.
+            previous_exercise_id = None if adding else (
+                ExerciseLog.objects
+                .filter(pk=self.pk)
+                .values_list('exercise_id', flat=True)
+                .first()
+            )
+            # Record detenuti da questo log prima della modifica: potrebbe
+            # non meritarli più, quindi vanno ricalcolati.
+            held_records = [] if adding else list(
+                PersonalRecord.objects.filter(log_id=self.pk).values_list('exercise_id', 'reps')
+            )
+            super().save(*args, **kwargs)
+            if adding:
+                ExerciseStats.record_log(self)
+            else:
+                ExerciseStats.rebuild_for(self.user_id, self.exercise_id)
+                if previous_exercise_id not in (None, self.exercise_id):
+                    ExerciseStats.rebuild_for(self.user_id, previous_exercise_id)
+                PersonalRecord.rebuild_keys(self.user_id, held_records)
+            # Record migliorati da questo salvataggio, per il messaggio
+            # "nuovo record" senza ulteriori query.
+            self.new_records = PersonalRecord.record_log(self)
+
+    @classmethod
+    def bulk_log(cls, logs):
+        """
+        Salva insieme più log nuovi di un utente (un allenamento intero):
+        1RM calcolati in un passaggio, un solo INSERT e statistiche e
+        record aggiornati con una lettura e poche scritture in blocco,
+        invece di save() log per log. Ogni log deve avere `exercise` già
+        caricato. Restituisce i record migliorati, come save() in
+        new_records.
+
+        bulk_create non emette segnali: la versione dati dell'utente va
+        incrementata da chi chiama.
+        """
+        if not logs:
+            return []
+        for log in logs:
+            log._compute_one_rm()
+        with transaction.atomic():
+            cls.objects.bulk_create(logs)
+            ExerciseStats.record_logs(logs)
+            return PersonalRecord.record_logs(logs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            held_records = list(
+                PersonalRecord.objects.filter(log_id=self.pk).values_list('exercise_id', 'reps')
+            )
+            result = super().delete(*args, **kwargs)
+            ExerciseStats.rebuild_for(self.user_id, self.exercise_id)
+            PersonalRecord.rebuild_keys(self.user_id, held_records)
+        return result
 
     def __str__(self):
         if self.exercise.is_bodyweight:
@@ -200,6 +307,192 @@ class ExerciseLog(models.Model):
         )
 
 
+class ExerciseStats(models.Model):
+    """
+    Riepilogo denormalizzato dei log di un utente per un esercizio.
+
+    Dashboard e panoramica progressi leggono una riga per esercizio invece di
+    scorrere tutto lo storico. La riga è mantenuta da ExerciseLog.save() e
+    ExerciseLog.delete(): un nuovo log la aggiorna in modo incrementale,
+    modifiche e cancellazioni la ricalcolano (il log modificato potrebbe
+    essere proprio quello che deteneva il primo, l'ultimo o il migliore).
+    In caso di dubbi si ricostruisce tutto con `manage.py rebuild_exercise_stats`.
+
+    "Primo" e "ultimo" seguono l'ordine cronologico (data, id), lo stesso
+    dello storico.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='exercise_stats'
+    )
+    exercise = models.ForeignKey(
+        Exercise,
+        on_delete=models.CASCADE,
+        related_name='stats'
+    )
+    log_count = models.PositiveIntegerField(default=0, verbose_name='Numero di log')
+    first_log_date = models.DateField(null=True, verbose_name='Data primo log')
+    last_log_date = models.DateField(null=True, verbose_name='Data ultimo log')
+    first_one_rm = models.DecimalField(
+        max_digits=6, decimal_places=2, null=True, verbose_name='Primo 1RM (kg)'
+    )
+    last_one_rm = models.DecimalField(
+        max_digits=6, decimal_places=2, null=True, verbose_name='Ultimo 1RM (kg)'
+    )
+    best_one_rm = models.DecimalField(
+        max_digits=6, decimal_places=2, null=True, verbose_name='Miglior 1RM (kg)'
+    )
+    best_reps = models.PositiveSmallIntegerField(null=True, verbose_name='Massimo ripetizioni')
+    # Serve alla panoramica per mostrare carico e ripetizioni dell'ultima
+    # sessione senza una query per esercizio.
+    last_log = models.ForeignKey(
+        ExerciseLog,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+    )
+
+    class Meta:
+        unique_together = ('user', 'exercise')
+        verbose_name = 'Statistiche esercizio'
+        verbose_name_plural = 'Statistiche esercizi'
+
+    @staticmethod
+    def _as_decimal(value):
+        # ExerciseLog.save() lascia in one_rm il float di epley(): va
+        # riportato a Decimal prima di confrontarlo con i valori del DB.
+        return None if value is None else Decimal(str(value))
+
+    UPDATE_FIELDS = [
+        'log_count', 'first_log_date', 'last_log_date', 'first_one_rm',
+        'last_one_rm', 'best_one_rm', 'best_reps', 'last_log',
+    ]
+
+    def _add(self, log):
+        one_rm = self._as_decimal(log.one_rm)
+        is_empty = self.log_count == 0
+
+        # Un log nuovo ha l'id più alto: è il primo solo se ha una data
+        # strettamente precedente, è l'ultimo anche a parità di data.
+        if is_empty or log.date < self.first_log_date:
+            self.first_log_date = log.date
+            self.first_one_rm = one_rm
+        if is_empty or log.date >= self.last_log_date:
+            self.last_log_date = log.date
+            self.last_one_rm = one_rm
+            self.last_log = log
+        if one_rm is not None and (self.best_one_rm is None or one_rm > self.best_one_rm):
+            self.best_one_rm = one_rm
+        if self.best_reps is None or log.reps > self.best_reps:
+            self.best_reps = log.reps
+        self.log_count += 1
+
+    @classmethod
+    def record_log(cls, log):
+        """Aggiorna in modo incrementale la riga con un log appena creato."""
+        stats, _ = cls.objects.select_for_update().get_or_create(
+            user_id=log.user_id, exercise_id=log.exercise_id
+        )
+        stats._add(log)
+        stats.save()
+        return stats
+
+    @classmethod
+    def record_logs(cls, logs):
+        """record_log() per più log nuovi di un utente, con una lettura e due scritture."""
+        user_id = logs[0].user_id
+        rows = {
+            stats.exercise_id: stats
+            for stats in cls.objects.select_for_update().filter(
+                user_id=user_id, exercise_id__in={log.exercise_id for log in logs}
+            )
+        }
+        existing = list(rows.values())
+        for log in logs:
+            stats = rows.get(log.exercise_id)
+            if stats is None:
+                stats = rows[log.exercise_id] = cls(user_id=user_id, exercise_id=log.exercise_id)
+            stats._add(log)
+        cls.objects.bulk_update(existing, cls.UPDATE_FIELDS)
+        cls.objects.bulk_create([stats for stats in rows.values() if stats._state.adding])
+
+    @staticmethod
+    def summarize(logs):
+        """
+        Statistiche per esercizio di un queryset di log, in un numero
+        costante di query qualunque sia il numero di esercizi: un'unica
+        aggregazione raggruppata per esercizio, con il primo e l'ultimo log
+        trovati da subquery correlate, più una query per leggerli.
+
+        Restituisce un dizionario exercise_id → campi di ExerciseStats.
+        """
+        chronological = logs.filter(exercise_id=OuterRef('exercise_id'))
+        rows = list(
+            logs.order_by()
+            .values('exercise_id')
+            .annotate(
+                log_count=Count('id'),
+                best_one_rm=Max('one_rm'),
+                best_reps=Max('reps'),
+                first_log_id=Subquery(chronological.order_by('date', 'id').values('id')[:1]),
+                last_log_id=Subquery(chronological.order_by('-date', '-id').values('id')[:1]),
+            )
+        )
+        edge_logs = ExerciseLog.objects.in_bulk(
+            {row['first_log_id'] for row in rows} | {row['last_log_id'] for row in rows}
+        )
+
+        summaries = {}
+        for row in rows:
+            first = edge_logs[row['first_log_id']]
+            last = edge_logs[row['last_log_id']]
+            summaries[row['exercise_id']] = {
+                'log_count': row['log_count'],
+                'best_one_rm': row['best_one_rm'],
+                'best_reps': row['best_reps'],
+                'first_log_date': first.date,
+                'first_one_rm': first.one_rm,
+                'last_log_date': last.date,
+                'last_one_rm': last.one_rm,
+                'last_log': last,
+            }
+        return summaries
+
+    @classmethod
+    def rebuild_for(cls, user_id, exercise_id):
+        """
+        Ricalcola la riga dai log. Costo limitato ai log di un solo
+        esercizio, grazie all'indice (user, exercise, -date).
+        """
+        summary = cls.summarize(
+            ExerciseLog.objects.filter(user_id=user_id, exercise_id=exercise_id)
+        ).get(exercise_id)
+        if summary is None:
+            cls.objects.filter(user_id=user_id, exercise_id=exercise_id).delete()
+            return None
+
+        stats, _ = cls.objects.update_or_create(
+            user_id=user_id, exercise_id=exercise_id, defaults=summary
+        )
+        return stats
+
+    @classmethod
+    def rebuild_for_user(cls, user_id):
+        """Ricostruisce tutte le righe di un utente in un numero costante di query."""
+        summaries = cls.summarize(ExerciseLog.objects.filter(user_id=user_id))
+        with transaction.atomic():
+            cls.objects.filter(user_id=user_id).delete()
+            cls.objects.bulk_create([
+                cls(user_id=user_id, exercise_id=exercise_id, **summary)
+                for exercise_id, summary in summaries.items()
+            ])
+        return len(summaries)
+
+    def __str__(self):
+        return f"{self.exercise.name} — {self.log_count} log ({self.user.username})"
+
+
 class WorkoutSession(models.Model):
     """
     Giornata di allenamento effettuata dall'utente.
@@ -253,7 +546,462 @@ class WorkoutSession(models.Model):
         # plan_name segue sempre la scheda collegata, se c'è.
         if self.plan and not self.plan_name:
             self.plan_name = self.plan.name
-        super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            # Se la data cambia, il giorno lasciato va tolto dal riepilogo.
+            previous_date = None if self._state.adding else (
+                WorkoutSession.objects
+                .filter(pk=self.pk)
+                .values_list('date', flat=True)
+                .first()
+            )
+            super().save(*args, **kwargs)
+            if previous_date != self.date:
+                TrainingSummary.refresh(
+                    self.user_id, [d for d in (previous_date, self.date) if d]
+                )
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            TrainingSummary.refresh(self.user_id, [self.date])
+        return result
 
     def __str__(self):
         return f"{self.date} — {self.plan_name} ({self.user.username})"
+
+
+class TrainingWeek(models.Model):
+    """
+    Giorni distinti di allenamento di un utente in una settimana (lun–dom).
+
+    Più sessioni nello stesso giorno contano una volta sola, come nelle
+    statistiche del calendario. Le righe sono mantenute da
+    TrainingSummary.refresh(): una settimana senza allenamenti non ha riga.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='training_weeks'
+    )
+    week_start = models.DateField(verbose_name='Inizio settimana')
+    days = models.PositiveSmallIntegerField(default=0, verbose_name='Giorni allenati')
+
+    class Meta:
+        ordering = ['week_start']
+        unique_together = ('user', 'week_start')
+        verbose_name = 'Settimana di allenamento'
+        verbose_name_plural = 'Settimane di allenamento'
+
+    @staticmethod
+    def start_of(day):
+        """Lunedì della settimana di `day`, coerente con la griglia del calendario."""
+        return day - timedelta(days=day.weekday())
+
+    def __str__(self):
+        return f"{self.week_start} — {self.days} giorni ({self.user.username})"
+
+
+class TrainingSummary(models.Model):
+    """
+    Riepilogo dei giorni di allenamento di un utente, per le statistiche
+    del calendario.
+
+    Con TrainingWeek sostituisce la scansione di tutte le date dello storico
+    a ogni apertura del calendario: la pagina legge questa riga e quella
+    della settimana corrente. È aggiornato da WorkoutSession.save() e
+    WorkoutSession.delete(), e in modo esplicito dall'import CSV, che usa
+    bulk_create.
+
+    Le serie sono in settimane consecutive con almeno un allenamento:
+    `streak_weeks` è la lunghezza di quella che termina nella settimana
+    `streak_end`, l'ultima allenata. Se sia ancora in corso dipende dalla
+    data di oggi, quindi lo decide current_streak() in lettura.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='training_summary'
+    )
+    total_days = models.PositiveIntegerField(default=0, verbose_name='Giorni allenati')
+    first_date = models.DateField(null=True, verbose_name='Primo allenamento')
+    streak_end = models.DateField(null=True, verbose_name='Ultima settimana allenata')
+    streak_weeks = models.PositiveIntegerField(default=0, verbose_name='Serie attuale (settimane)')
+    longest_streak = models.PositiveIntegerField(default=0, verbose_name='Serie più lunga (settimane)')
+
+    class Meta:
+        verbose_name = 'Riepilogo allenamenti'
+        verbose_name_plural = 'Riepiloghi allenamenti'
+
+    def current_streak(self, today):
+        """
+        Settimane consecutive di allenamento fino a oggi. La settimana in
+        corso non interrompe la serie finché non è finita: vale quella
+        chiusa la settimana scorsa.
+        """
+        if self.streak_end is None:
+            return 0
+        if self.streak_end >= TrainingWeek.start_of(today) - timedelta(weeks=1):
+            return self.streak_weeks
+        return 0
+
+    @staticmethod
+    def _streaks(week_starts):
+        """(inizio ultima serie, lunghezza ultima serie, serie più lunga)."""
+        current = longest = 0
+        previous = None
+        for week in week_starts:
+            if previous is not None and week - previous == timedelta(weeks=1):
+                current += 1
+            else:
+                current = 1
+            longest = max(longest, current)
+            previous = week
+        return previous, current, longest
+
+    @classmethod
+    def refresh(cls, user_id, dates):
+        """
+        Riallinea settimane e riepilogo dopo scritture sulle sessioni nei
+        giorni `dates`.
+
+        Si ricontano solo le settimane toccate (al più 7 date ciascuna); le
+        serie si ricalcolano dalle righe settimanali soltanto quando una
+        settimana passa da vuota ad allenata o viceversa.
+        """
+        weeks = sorted({TrainingWeek.start_of(d) for d in dates})
+        if not weeks:
+            return
+
+        with transaction.atomic():
+            summary, _ = cls.objects.select_for_update().get_or_create(user_id=user_id)
+
+            trained = set(
+                WorkoutSession.objects
+                .filter(
+                    user_id=user_id,
+                    date__gte=weeks[0],
+                    date__lt=weeks[-1] + timedelta(weeks=1),
+                )
+                .order_by()
+                .values_list('date', flat=True)
+                .distinct()
+            )
+            counts = Counter(TrainingWeek.start_of(d) for d in trained)
+            existing = {
+                w.week_start: w
+                for w in TrainingWeek.objects.filter(user_id=user_id, week_start__in=weeks)
+            }
+
+            delta = 0
+            weeks_changed = False
+            to_create, to_update, to_delete = [], [], []
+            for week in weeks:
+                row = existing.get(week)
+                old, new = (row.days if row else 0), counts.get(week, 0)
+                if old == new:
+                    continue
+                delta += new - old
+                if not new:
+                    to_delete.append(week)
+                    weeks_changed = True
+                elif row is None:
+                    to_create.append(TrainingWeek(user_id=user_id, week_start=week, days=new))
+                    weeks_changed = True
+                else:
+                    row.days = new
+                    to_update.append(row)
+
+            if not (to_create or to_update or to_delete):
+                return
+
+            if to_delete:
+                TrainingWeek.objects.filter(user_id=user_id, week_start__in=to_delete).delete()
+            TrainingWeek.objects.bulk_create(to_create, batch_size=500)
+            TrainingWeek.objects.bulk_update(to_update, ['days'], batch_size=500)
+
+            summary.total_days += delta
+            # Il primo giorno cambia solo se la scrittura lo precede o lo tocca.
+            if summary.first_date is None or min(dates) <= summary.first_date:
+                summary.first_date = (
+                    WorkoutSession.objects
+                    .filter(user_id=user_id)
+                    .order_by('date')
+                    .values_list('date', flat=True)
+                    .first()
+                )
+            if weeks_changed:
+                summary.streak_end, summary.streak_weeks, summary.longest_streak = cls._streaks(
+                    TrainingWeek.objects
+                    .filter(user_id=user_id)
+                    .order_by('week_start')
+                    .values_list('week_start', flat=True)
+                )
+            summary.save()
+
+    def __str__(self):
+        return f"{self.user.username} — {self.total_days} giorni"
+
+
+class PersonalRecord(models.Model):
+    """
+    Record personale di un utente su un esercizio, uno per numero di
+    ripetizioni: il massimale teorico (reps = ESTIMATED_ONE_RM) e i
+    rep-max più comuni (REP_MAXES), cioè il carico più alto sollevato per
+    almeno N ripetizioni.
+
+    Come ExerciseStats è mantenuto da ExerciseLog.save()/delete(): un
+    nuovo log confronta i suoi valori con i record correnti, mentre
+    modificare o cancellare il log che detiene un record lo fa ricalcolare
+    dallo storico. A parità di valore il record resta al log più vecchio.
+    Gli esercizi a corpo libero non hanno carico e quindi nessun record.
+    """
+    ESTIMATED_ONE_RM = 0
+    REP_MAXES = (1, 3, 5, 8, 10)
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='personal_records'
+    )
+    exercise = models.ForeignKey(
+        Exercise,
+        on_delete=models.CASCADE,
+        related_name='personal_records'
+    )
+    reps = models.PositiveSmallIntegerField(verbose_name='Ripetizioni')
+    value = models.DecimalField(max_digits=6, decimal_places=2, verbose_name='Valore (kg)')
+    date = models.DateField(verbose_name='Data')
+    log = models.ForeignKey(
+        ExerciseLog,
+        on_delete=models.CASCADE,
+        related_name='personal_records'
+    )
+
+    class Meta:
+        ordering = ['reps']
+        unique_together = ('user', 'exercise', 'reps')
+        verbose_name = 'Record personale'
+        verbose_name_plural = 'Record personali'
+
+    @property
+    def label(self):
+        if self.reps == self.ESTIMATED_ONE_RM:
+            return '1RM teorico'
+        return f'{self.reps}RM'
+
+    @classmethod
+    def candidates(cls, log):
+        """Coppie (reps, valore) per cui il log può valere come record."""
+        if log.weight is None or log.one_rm is None:
+            return []
+        weight = Decimal(str(log.weight))
+        return [(cls.ESTIMATED_ONE_RM, Decimal(str(log.one_rm)))] + [
+            (reps, weight) for reps in cls.REP_MAXES if log.reps >= reps
+        ]
+
+    @classmethod
+    def record_log(cls, log):
+        """
+        Aggiorna i record con un log appena salvato. Restituisce quelli che
+        il log ha migliorato rispetto a un record già esistente: il primo
+        log di un esercizio non è un "nuovo record".
+        """
+        candidates = cls.candidates(log)
+        if not candidates:
+            return []
+        current = {
+            (record.exercise_id, record.reps): record
+            for record in cls.objects.select_for_update().filter(
+                user_id=log.user_id, exercise_id=log.exercise_id
+            )
+        }
+        improved, changed = cls._apply(current, [log])
+        for record in changed:
+            record.save()
+        return improved
+
+    @classmethod
+    def record_logs(cls, logs):
+        """
+        record_log() per più log nuovi di un utente, nell'ordine in cui sono
+        stati creati: una lettura dei record correnti e due scritture.
+        """
+        logs = [log for log in logs if cls.candidates(log)]
+        if not logs:
+            return []
+        current = {
+            (record.exercise_id, record.reps): record
+            for record in cls.objects.select_for_update().filter(
+                user_id=logs[0].user_id, exercise_id__in={log.exercise_id for log in logs}
+            )
+        }
+        improved, changed = cls._apply(current, logs)
+        cls.objects.bulk_update([r for r in changed if not r._state.adding], ['value', 'date', 'log'])
+        cls.objects.bulk_create([r for r in changed if r._state.adding])
+        return improved
+
+    @classmethod
+    def _apply(cls, current, logs):
+        """
+        Confronta i log con i record correnti, {(exercise_id, reps): record},
+        e li aggiorna in memoria. Restituisce (migliorati, da salvare).
+        """
+        improved, changed = {}, {}
+        for log in logs:
+            for reps, value in cls.candidates(log):
+                key = (log.exercise_id, reps)
+                record = current.get(key)
+                if record is None:
+                    record = current[key] = cls(user_id=log.user_id, exercise_id=log.exercise_id, reps=reps)
+                elif value > record.value:
+                    improved[key] = record
+                elif value < record.value or (record.date, record.log_id) <= (log.date, log.pk):
+                    continue
+                record.value, record.date, record.log = value, log.date, log
+                changed[key] = record
+        return list(improved.values()), list(changed.values())
+
+    @classmethod
+    def _best_log(cls, logs, reps):
+        if reps == cls.ESTIMATED_ONE_RM:
+            return logs.order_by('-one_rm', 'date', 'id').first()
+        return logs.filter(reps__gte=reps).order_by('-weight', 'date', 'id').first()
+
+    @classmethod
+    def rebuild_keys(cls, user_id, keys):
+        """Ricalcola dallo storico i record indicati come coppie (exercise_id, reps)."""
+        for exercise_id, reps in keys:
+            logs = ExerciseLog.objects.filter(
+                user_id=user_id, exercise_id=exercise_id, weight__isnull=False, one_rm__isnull=False
+            )
+            best = cls._best_log(logs, reps)
+            if best is None:
+                cls.objects.filter(user_id=user_id, exercise_id=exercise_id, reps=reps).delete()
+                continue
+            cls.objects.update_or_create(
+                user_id=user_id,
+                exercise_id=exercise_id,
+                reps=reps,
+                defaults={
+                    'value': best.one_rm if reps == cls.ESTIMATED_ONE_RM else best.weight,
+                    'date': best.date,
+                    'log': best,
+                },
+            )
+
+    @classmethod
+    def rebuild_for(cls, user_id, exercise_id):
+        """Ricalcola tutti i record di un esercizio."""
+        cls.rebuild_keys(
+            user_id,
+            [(exercise_id, reps) for reps in (cls.ESTIMATED_ONE_RM, *cls.REP_MAXES)],
+        )
+
+    def __str__(self):
+        return f"{self.exercise.name} — {self.label}: {self.value}kg ({self.user.username})"
+
+
+class DataVersion(models.Model):
+    """
+    Contatore delle modifiche ai dati di un utente.
+
+    Viene incrementato a ogni scrittura su log, sessioni, schede, cartelle
+    ed esercizi in scheda (vedi gym/signals.py) ed entra nelle chiavi di
+    cache delle pagine calcolate: finché non cambia nulla la pagina si
+    serve dalla cache, alla prima modifica le chiavi vecchie smettono di
+    essere usate e vengono eliminate dall'LRU.
+
+    Sta nel DB e non in cache perché deve valere per tutti i worker.
+
+    `updated_at` è il momento dell'ultimo incremento: fa da Last-Modified
+    per le risposte con validatori HTTP (vedi gym/caching.py).
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='data_version'
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(null=True, verbose_name='Ultima modifica')
+
+    class Meta:
+        verbose_name = 'Versione dati'
+        verbose_name_plural = 'Versioni dati'
+
+    def __str__(self):
+        return f"{self.user.username} — v{self.version}"
+
+
+class CatalogVersion(models.Model):
+    """
+    Contatore delle modifiche al catalogo esercizi, in una sola riga.
+
+    Come DataVersion sta nel DB perché valga per tutti i worker: ognuno
+    tiene in memoria l'indice di ricerca degli esercizi (gym/search.py) e
+    lo ricostruisce quando il contatore cambia.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(null=True, verbose_name='Ultima modifica')
+
+    class Meta:
+        verbose_name = 'Versione catalogo'
+        verbose_name_plural = 'Versioni catalogo'
+
+    def __str__(self):
+        return f"Catalogo v{self.version}"
+
+
+class ImportJob(models.Model):
+    """
+    Import CSV eseguito fuori dalla richiesta dal worker (manage.py
+    run_jobs, vedi gym/jobs.py).
+
+    La tabella fa da coda: un job nasce QUEUED con il file salvato su
+    disco, il worker lo prende con un UPDATE condizionato sullo stato e lo
+    porta a DONE o FAILED salvando in `result` l'esito dell'import (vedi
+    gym/imports.py). La pagina del job interroga lo stato finché non
+    termina.
+    """
+    class Kind(models.TextChoices):
+        SESSIONS = 'sessions', 'Allenamenti'
+        PLAN = 'plan', 'Scheda'
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'In coda'
+        RUNNING = 'running', 'In corso'
+        DONE = 'done', 'Completato'
+        FAILED = 'failed', 'Non riuscito'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_jobs')
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    upload = models.FileField(upload_to='imports/%Y/%m/', blank=True)
+    filename = models.CharField(max_length=255, blank=True, verbose_name='Nome file')
+    size = models.PositiveBigIntegerField(default=0)
+    # Percentuale del file già letta e righe elaborate, aggiornate a ogni
+    # blocco scritto.
+    progress = models.PositiveSmallIntegerField(default=0)
+    rows = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        verbose_name = 'Import in background'
+        verbose_name_plural = 'Import in background'
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.DONE, self.Status.FAILED)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} — {self.filename} ({self.get_status_display()})"
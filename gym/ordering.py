@@ -0,0 +1,224 @@
+"""
+Chiavi di ordinamento sparse per il drag & drop (esercizi in scheda,
+schede, cartelle).
+
+Ogni elemento ha una chiave stringa e l'ordine è quello lessicografico
+delle chiavi: spostare un elemento tra A e B vuol dire dargli una chiave
+compresa tra quelle di A e B, quindi si scrive una sola riga invece di
+rinumerare tutto il gruppo.
+
+Le chiavi sono frazioni in base 36 scritte senza "0.": "i" sta a metà
+dell'intervallo, "9" a un quarto. Tra due chiavi ne esiste sempre
+un'altra, al costo di allungarsi di un carattere ogni qualche inserimento
+nello stesso punto. In fondo al gruppo invece si incrementa una cifra
+dell'ultima chiave ("i" -> "j", "z" -> "z1" -> "z2"), così le aggiunte in
+coda la allungano solo una volta ogni 35. Oltre REBALANCE_LENGTH caratteri
+il gruppo viene ridistribuito con chiavi corte ed equidistanti
+(rebalance). Una chiave non
+finisce mai con "0", così ogni valore ha una sola scrittura e confronto
+tra stringhe e confronto tra numeri coincidono. Cifre e minuscole si
+ordinano allo stesso modo in ogni collation, non solo in quella binaria.
+
+Un gruppo è la lista dei queryset i cui elementi si ordinano insieme:
+gli esercizi di una scheda, le schede di una cartella, oppure cartelle e
+schede sciolte della radice, che condividono lo stesso spazio di chiavi.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Max
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+
+KEY_MAX_LENGTH = 64
+REBALANCE_LENGTH = 12
+
+
+def _midpoint(a, b):
+    # a < b, entrambe senza zeri finali; b None = estremo superiore (1).
+    if b is not None:
+        if not b:
+            raise ValueError('Chiavi non ordinate.')
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else '0') == b[n]:
+            n += 1
+        if n:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    low = DIGITS.index(a[0]) if a else 0
+    high = DIGITS.index(b[0]) if b is not None else BASE
+    if high - low > 1:
+        return DIGITS[(low + high) // 2]
+    # Cifre consecutive: se b continua, la sua prima cifra da sola è già
+    # compresa tra a e b; altrimenti si scende di una posizione.
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[low] + _midpoint(a[1:], None)
+
+
+def _key_after(a):
+    # La chiave più corta maggiore di `a`: la prima cifra diversa da "z"
+    # incrementata, oppure "1" in coda se sono tutte "z".
+    for n, ch in enumerate(a):
+        if ch != 'z':
+            return a[:n] + DIGITS[DIGITS.index(ch) + 1]
+    return a + '1'
+
+
+def key_between(a, b):
+    """
+    Chiave strettamente compresa tra `a` e `b`; None indica l'estremo
+    aperto (inizio o fine del gruppo). ValueError se a >= b.
+    """
+    if a is not None and b is not None and a >= b:
+        raise ValueError('Chiavi non ordinate.')
+    if any(ch not in DIGITS for ch in (a or '') + (b or '')):
+        raise ValueError('Chiave non valida.')
+    if a and b is None:
+        return _key_after(a)
+    return _midpoint(a or '', b)
+
+
+def spread_keys(count):
+    """`count` chiavi corte, crescenti ed equidistanti, con ampio spazio tra l'una e l'altra."""
+    width = 1
+    while BASE ** width < (count + 1) * BASE:
+        width += 1
+    step = BASE ** width // (count + 1)
+    keys = []
+    for i in range(1, count + 1):
+        value, digits = i * step, []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        keys.append(''.join(reversed(digits)).rstrip('0'))
+    return keys
+
+
+def _rows(group, lock=False):
+    """(chiave, modello, pk) di tutti gli elementi del gruppo."""
+    rows = []
+    for queryset in group:
+        if lock:
+            queryset = queryset.select_for_update()
+        rows.extend(
+            (key, queryset.model, pk)
+            for key, pk in queryset.order_by().values_list('order', 'pk')
+        )
+    return rows
+
+
+def append_key(group):
+    """
+    Chiave per aggiungere un elemento in fondo al gruppo. Se sarebbe più
+    lunga di REBALANCE_LENGTH il gruppo viene prima ridistribuito: la riga
+    nuova non esiste ancora, quindi non si può rimandare al commit come in
+    move().
+    """
+    keys = [
+        key for key in (qs.aggregate(last=Max('order'))['last'] for qs in group)
+        if key
+    ]
+    try:
+        key = key_between(max(keys) if keys else None, None)
+    except ValueError:
+        # Chiavi di un formato inatteso (es. inserite a mano): si
+        # ridistribuisce il gruppo e si riprova.
+        key = None
+    if key is None or len(key) > REBALANCE_LENGTH:
+        rebalance(group)
+        return append_key(group)
+    return key
+
+
+def rebalance(group):
+    """
+    Riassegna a tutto il gruppo chiavi corte ed equidistanti, mantenendo
+    l'ordine attuale (a parità di chiave decide la pk). Non cambia nulla
+    di visibile, quindi non incrementa la versione dati.
+    """
+    with transaction.atomic():
+        rows = sorted(
+            _rows(group, lock=True),
+            key=lambda row: (row[0], row[1]._meta.label, row[2]),
+        )
+        by_model = {}
+        for key, (_, model, pk) in zip(spread_keys(len(rows)), rows):
+            by_model.setdefault(model, []).append(model(pk=pk, order=key))
+        for model, objs in by_model.items():
+            model.objects.bulk_update(objs, ['order'], batch_size=500)
+
+
+def _needs_rebalance(key, others):
+    return len(key) > REBALANCE_LENGTH or len(set(others)) != len(others)
+
+
+def move(item, group, after=None, before=None, **fields):
+    """
+    Sposta `item` nel gruppo `group` tra `after` e `before` (coppie
+    (modello, pk) di elementi del gruppo, o None per l'inizio/la fine) e
+    salva insieme gli eventuali `fields` (es. la cartella di destinazione).
+
+    Le righe del gruppo restano bloccate fino al commit, così due
+    trascinamenti concorrenti si serializzano. Se il client ha una vista
+    non aggiornata e `after`/`before` non sono più adiacenti vale `after`:
+    l'elemento finisce subito dopo di esso. Scrive una sola riga; se le
+    chiavi si sono allungate troppo il gruppo viene ridistribuito dopo il
+    commit. ValueError se un riferimento non appartiene al gruppo.
+    """
+    own = (type(item), item.pk)
+    if own in (after, before):
+        raise ValueError('Un elemento non può essere spostato rispetto a se stesso.')
+
+    with transaction.atomic():
+        rows = _rows(group, lock=True)
+        keys = {(model, pk): key for key, model, pk in rows}
+        for ref in (after, before):
+            if ref is not None and ref not in keys:
+                raise ValueError('Riferimento fuori dal gruppo.')
+        others = sorted(key for ref, key in keys.items() if ref != own)
+
+        if after is not None:
+            low = keys[after]
+            high = next((key for key in others if key > low), None)
+        elif before is not None:
+            high = keys[before]
+            low = next((key for key in reversed(others) if key < high), None)
+        else:
+            low, high = (others[-1] if others else None), None
+
+        try:
+            new_key = key_between(low, high)
+        except ValueError:
+            # Chiavi di formato inatteso: si ridistribuisce e si riprova.
+            rebalance(group)
+            return move(item, group, after, before, **fields)
+
+        item.order = new_key
+        for name, value in fields.items():
+            setattr(item, name, value)
+        item.save(update_fields=['order', *fields])
+
+        if _needs_rebalance(new_key, others):
+            transaction.on_commit(partial(rebalance, group))
+    return new_key
+
+
+def reorder(group, items, **fields):
+    """
+    Assegna agli elementi `items` (istanze, nell'ordine voluto) chiavi
+    equidistanti con un UPDATE per modello, dentro una transazione. Serve
+    alle sincronizzazioni complete dell'ordine; per il drag & drop si usa
+    move(). Gli elementi del gruppo non elencati mantengono la loro chiave.
+    """
+    with transaction.atomic():
+        _rows(group, lock=True)
+        by_model = {}
+        for key, item in zip(spread_keys(len(items)), items):
+            item.order = key
+            for name, value in fields.items():
+                setattr(item, name, value)
+            by_model.setdefault(type(item), []).append(item)
+        for model, objs in by_model.items():
+            model.objects.bulk_update(objs, ['order', *fields], batch_size=500)
@@ -0,0 +1,91 @@
+"""
+Ricerca nel catalogo esercizi per l'autocompletamento.
+
+L'autocompletamento interroga il catalogo a ogni tasto: l'indice sta
+nell'istantanea in memoria del catalogo (gym/catalog.py), costruito una
+volta per versione, e risponde senza query. I nomi sono indicizzati per
+n-grammi (2 e 3 caratteri) delle parole normalizzate — minuscole, senza
+accenti né punteggiatura.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+
+from . import catalog
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def fold(text):
+    """'Panca – Inclinata (Manubri)' -> 'panca inclinata manubri'."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(' ', stripped.casefold()).strip()
+
+
+def _grams(text):
+    """Bigrammi e trigrammi di una parola."""
+    return {text[i:i + n] for n in (2, 3) for i in range(len(text) - n + 1)}
+
+
+class ExerciseIndex:
+    def __init__(self, exercises):
+        # (nome normalizzato, risultato già pronto per il JSON)
+        self.entries = []
+        self.postings = defaultdict(set)
+        for ex in exercises:
+            folded = fold(ex['name'])
+            position = len(self.entries)
+            self.entries.append((folded, {
+                'id': ex['id'],
+                'name': ex['name'],
+                'muscle_group': ex['muscle_label'],
+                'is_bodyweight': ex['is_bodyweight'],
+            }))
+            for word in folded.split():
+                for gram in _grams(word):
+                    self.postings[gram].add(position)
+
+    def _candidates(self, words):
+        """Posizioni che contengono tutti gli n-grammi delle parole cercate."""
+        grams = set()
+        for word in words:
+            # Le parole di un carattere non hanno n-grammi: conta solo la verifica.
+            if len(word) == 2:
+                grams.add(word)
+            else:
+                grams.update(word[i:i + 3] for i in range(len(word) - 2))
+        if not grams:
+            return range(len(self.entries))
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        return set.intersection(*postings)
+
+    def search(self, query, limit=10):
+        """
+        Esercizi il cui nome contiene tutte le parole di `query`, ordinati per
+        pertinenza: prima i nomi che iniziano con la ricerca, poi quelli in
+        cui ogni parola cercata inizia una parola del nome, poi il resto.
+        """
+        folded_query = fold(query)
+        words = folded_query.split()
+        if not words:
+            return []
+        ranked = []
+        for position in self._candidates(words):
+            folded, result = self.entries[position]
+            if not all(word in folded for word in words):
+                continue
+            padded = f' {folded}'
+            if folded.startswith(folded_query):
+                rank = 0
+            elif all(f' {word}' in padded for word in words):
+                rank = 1
+            else:
+                rank = 2
+            ranked.append((rank, folded, result))
+        ranked.sort(key=lambda item: item[:2])
+        return [result for _, _, result in ranked[:limit]]
+
+
+def search_exercises(query, limit=10):
+    return catalog.snapshot().index.search(query, limit)
@@ -0,0 +1,71 @@
+"""
+Incremento della versione dati (vedi gym/caching.py) a ogni scrittura sui
+modelli che alimentano le pagine in cache.
+
+Le operazioni in blocco che non passano da save()/delete() — bulk_create e
+update() sui queryset — non emettono segnali: le view che le usano
+chiamano bump_data_version() esplicitamente.
+"""
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import catalog
+from .caching import bump_catalog_version, bump_data_version
+from .models import (
+    Exercise, ExerciseLog, PlanFolder, PlannedExercise, WorkoutPlan, WorkoutSession,
+)
+
+
+def _cascade_from(origin, *models):
+    """True se la cancellazione è partita da un'istanza o queryset di `models`."""
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, models)
+
+
+@receiver(post_save, sender=ExerciseLog)
+@receiver(post_delete, sender=ExerciseLog)
+@receiver(post_save, sender=WorkoutSession)
+@receiver(post_delete, sender=WorkoutSession)
+@receiver(post_save, sender=WorkoutPlan)
+@receiver(post_delete, sender=WorkoutPlan)
+@receiver(post_save, sender=PlanFolder)
+@receiver(post_delete, sender=PlanFolder)
+def bump_owner_version(sender, instance, origin=None, **kwargs):
+    # Nelle cascate da utente o esercizio basta un solo incremento (o
+    # nessuno, se l'utente non esiste più), non uno per riga cancellata.
+    if _cascade_from(origin, User, Exercise):
+        return
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender=PlannedExercise)
+@receiver(post_delete, sender=PlannedExercise)
+def bump_plan_owner_version(sender, instance, origin=None, **kwargs):
+    # Eliminando una scheda i suoi esercizi vengono cancellati a cascata:
+    # la scheda incrementa già la versione, non serve una query per ognuno.
+    if _cascade_from(origin, WorkoutPlan, User, Exercise):
+        return
+    if PlannedExercise._meta.get_field('plan').is_cached(instance):
+        user_id = instance.plan.user_id
+    else:
+        user_id = (
+            WorkoutPlan.objects
+            .filter(pk=instance.plan_id)
+            .values_list('user_id', flat=True)
+            .first()
+        )
+    if user_id is not None:
+        bump_data_version(user_id)
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def exercise_changed(sender, instance, **kwargs):
+    # Nome e tipo dell'esercizio compaiono nelle pagine di chiunque lo usi
+    # e nell'indice dell'autocompletamento.
+    bump_catalog_version()
+    catalog.catalog_changed()
@@ -5,6 +5,11 @@
  * Sostituisce visivamente il <select> nativo con un campo testuale +
  * dropdown, mantenendo il select originale hidden per la submission
  * del form Django (la validazione lato server rimane invariata).
+ *
+ * Il select contiene solo l'opzione scelta (vedi ExerciseSelect in
+ * gym/forms.py): le altre si aggiungono quando l'utente ne sceglie una.
+ * Se la ricerca sul server fallisce (offline) si cerca nel catalogo
+ * completo di data-catalog-url, che ha l'hash nell'URL ed è in cache.
  */
 
 function initExerciseAutocomplete({ selectId, endpointUrl }) {
@@ -94,6 +99,12 @@ function initExerciseAutocomplete({ selectId, endpointUrl }) {
 
     function selectExercise(ex) {
         input.value = ex.name;
+        let option = Array.from(select.options).find((opt) => opt.value === String(ex.id));
+        if (!option) {
+            option = new Option(ex.name, ex.id);
+            select.add(option);
+        }
+        option.dataset.bodyweight = ex.is_bodyweight ? 'true' : 'false';
         select.value = ex.id;
         // select.value non scatena 'change' da solo (non è un'interazione
         // utente nativa) — chi usa il widget può ascoltarlo per reagire
@@ -116,14 +127,46 @@ function initExerciseAutocomplete({ selectId, endpointUrl }) {
         return text.replace(regex, '<mark class="bg-warning text-dark px-0">$1</mark>');
     }
 
+    let catalogPromise = null;
+
+    function fold(text) {
+        return text.normalize('NFKD').replace(/[\u0300-\u036f]/g, '').toLowerCase();
+    }
+
+    async function searchCatalog(query) {
+        const catalogUrl = select.dataset.catalogUrl;
+        if (!catalogUrl) throw new Error('catalogo non disponibile');
+        catalogPromise = catalogPromise || fetch(catalogUrl).then((res) => {
+            if (!res.ok) throw new Error(res.status);
+            return res.json();
+        });
+        let catalog;
+        try {
+            catalog = await catalogPromise;
+        } catch (err) {
+            catalogPromise = null;
+            throw err;
+        }
+        const words = fold(query).split(/\s+/).filter(Boolean);
+        return catalog.exercises
+            .filter((ex) => words.every((word) => fold(ex.name).includes(word)))
+            .slice(0, 10)
+            .map((ex) => ({ ...ex, muscle_group: ex.muscle_label }));
+    }
+
     async function search(query) {
         spinner.style.display = 'inline-block';
         try {
             const res = await fetch(`${endpointUrl}?q=${encodeURIComponent(query)}`);
+            if (!res.ok) throw new Error(res.status);
             const data = await res.json();
             showDropdown(data.results);
         } catch {
-            hideDropdown();
+            try {
+                showDropdown(await searchCatalog(query));
+            } catch {
+                hideDropdown();
+            }
         } finally {
             spinner.style.display = 'none';
         }
@@ -1,9 +1,11 @@
 /**
  * GymIt — Calendario allenamenti
  *
- * Toccando una cella carica via fetch il dettaglio della giornata e lo
- * mostra in un modale: schede allenate quel giorno, con link alla scheda
- * (se esiste ancora) e possibilità di eliminare la registrazione.
+ * Toccando una cella mostra in un modale il dettaglio della giornata:
+ * schede allenate quel giorno, con link alla scheda (se esiste ancora) e
+ * possibilità di eliminare la registrazione. Il dettaglio di tutto il mese
+ * arriva già con la pagina (`days`), quindi il modale si apre senza rete;
+ * il fetch verso session_day_detail resta solo come ripiego.
  *
  * Se la giornata è vuota (e non è nel futuro) compare "Registra
  * allenamento", che apre un selettore con tutte le schede — attive e
@@ -11,7 +13,7 @@
  * sono poche per utente, quindi il filtro è istantaneo e funziona anche
  * offline, come già fa la ricerca nella sezione esercizi.
  */
-function initWorkoutCalendar({ modalId, titleId, bodyId, csrfToken, plans }) {
+function initWorkoutCalendar({ modalId, titleId, bodyId, csrfToken, plans, days }) {
     var modalEl = document.getElementById(modalId);
     var titleEl = document.getElementById(titleId);
     var bodyEl = document.getElementById(bodyId);
@@ -19,6 +21,7 @@ function initWorkoutCalendar({ modalId, titleId, bodyId, csrfToken, plans }) {
 
     var modal = new bootstrap.Modal(modalEl);
     var allPlans = plans || [];
+    var dayIndex = days || {};
 
     var footerEl = document.getElementById('dayLogFooter');
     var logBtn = document.getElementById('dayLogBtn');
@@ -215,6 +218,27 @@ function initWorkoutCalendar({ modalId, titleId, bodyId, csrfToken, plans }) {
     }
 
     // ── Caricamento giornata ─────────────────────────────────────────
+    function showDay(data) {
+        titleEl.textContent = data.date_label;
+        currentDate = data.date;
+        bodyEl.innerHTML = data.sessions.length
+            ? renderSessions(data.sessions)
+            : renderEmpty();
+
+        // Il bottone compare solo su giornate vuote e non future.
+        if (footerEl) footerEl.hidden = !(data.sessions.length === 0 && data.can_log);
+
+        bodyEl.querySelectorAll('.session-delete-form').forEach(function (form) {
+            form.addEventListener('submit', function (e) {
+                if (!confirm('Eliminare questa registrazione?')) {
+                    e.preventDefault();
+                    return;
+                }
+                showPageLoader('Eliminazione in corso...');
+            });
+        });
+    }
+
     function loadDay(url) {
         bodyEl.innerHTML = '<div class="text-center py-3">' +
             '<div class="spinner-border spinner-border-sm text-warning" role="status">' +
@@ -225,26 +249,7 @@ function initWorkoutCalendar({ modalId, titleId, bodyId, csrfToken, plans }) {
                 if (!res.ok) throw new Error('HTTP ' + res.status);
                 return res.json();
             })
-            .then(function (data) {
-                titleEl.textContent = data.date_label;
-                currentDate = data.date;
-                bodyEl.innerHTML = data.sessions.length
-                    ? renderSessions(data.sessions)
-                    : renderEmpty();
-
-                // Il bottone compare solo su giornate vuote e non future.
-                if (footerEl) footerEl.hidden = !(data.sessions.length === 0 && data.can_log);
-
-                bodyEl.querySelectorAll('.session-delete-form').forEach(function (form) {
-                    form.addEventListener('submit', function (e) {
-                        if (!confirm('Eliminare questa registrazione?')) {
-                            e.preventDefault();
-                            return;
-                        }
-                        showPageLoader('Eliminazione in corso...');
-                    });
-                });
-            })
+            .then(showDay)
             .catch(function () {
                 bodyEl.innerHTML =
                     '<p class="text-danger text-center small mb-0 py-2">' +
@@ -259,7 +264,12 @@ function initWorkoutCalendar({ modalId, titleId, bodyId, csrfToken, plans }) {
             titleEl.textContent = 'Giornata';
             resetFooter();
             modal.show();
-            loadDay(cell.dataset.url);
+            var data = dayIndex[cell.dataset.day];
+            if (data) {
+                showDay(data);
+            } else {
+                loadDay(cell.dataset.url);
+            }
         });
     });
 }
@@ -4,10 +4,12 @@
  * Desktop : HTML5 Drag and Drop API (draggable="true")
  * Mobile  : Touch Events (touchstart / touchmove / touchend)
  *
- * Al rilascio salva il nuovo ordine via fetch POST → /plans/<pk>/reorder/
+ * Al rilascio salva lo spostamento via fetch POST → /plans/<pk>/move/:
+ * l'esercizio trascinato e i vicini tra cui è stato lasciato. Il server
+ * scrive solo la riga spostata.
  */
 
-function initDragDrop({ listId, reorderUrl, csrfToken }) {
+function initDragDrop({ listId, moveUrl, csrfToken }) {
     const list = document.getElementById(listId);
     if (!list) return;
 
@@ -24,6 +26,7 @@ function initDragDrop({ listId, reorderUrl, csrfToken }) {
     let dragged = null;         // elemento che si sta trascinando
     let placeholder = null;     // segnaposto visivo durante il drag
     let touchOffsetY = 0;       // offset touch rispetto all'elemento
+    let startNeighbours = null; // vicini prima del drag, per saltare i no-op
 
     // ── Helpers ───────────────────────────────────────────────────
 
@@ -64,17 +67,27 @@ function initDragDrop({ listId, reorderUrl, csrfToken }) {
         target.insertAdjacentElement('afterend', placeholder);
     }
 
-    async function saveOrder() {
-        const ids = getItems().map(el => parseInt(el.dataset.id));
+    function neighbourIds(item) {
+        const items = getItems();
+        const index = items.indexOf(item);
+        const id = el => (el ? parseInt(el.dataset.id, 10) : null);
+        return { after: id(items[index - 1]), before: id(items[index + 1]) };
+    }
+
+    async function saveMove(item, previous) {
+        const { after, before } = neighbourIds(item);
+        // Rilasciato dov'era: niente da salvare.
+        if (after === previous.after && before === previous.before) return;
+
         savingIndicator.classList.add('active');
         try {
-            const res = await fetch(reorderUrl, {
+            const res = await fetch(moveUrl, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                     'X-CSRFToken': csrfToken,
                 },
-                body: JSON.stringify({ order: ids }),
+                body: JSON.stringify({ id: parseInt(item.dataset.id, 10), after, before }),
             });
             if (!res.ok) console.error('Reorder failed', await res.text());
         } catch (e) {
@@ -99,6 +112,7 @@ function initDragDrop({ listId, reorderUrl, csrfToken }) {
     list.addEventListener('dragstart', (e) => {
         dragged = e.target.closest('.drag-item');
         if (!dragged) return;
+        startNeighbours = neighbourIds(dragged);
         placeholder = createPlaceholder(dragged);
         // Piccolo delay per permettere al browser di catturare lo snapshot
         setTimeout(() => setDraggingStyle(dragged, true), 0);
@@ -127,9 +141,10 @@ function initDragDrop({ listId, reorderUrl, csrfToken }) {
             placeholder.parentNode.insertBefore(dragged, placeholder);
             placeholder.remove();
         }
+        const moved = dragged;
         placeholder = null;
         dragged = null;
-        saveOrder();
+        saveMove(moved, startNeighbours);
     });
 
     // Evita il flash del "proibito" quando si entra nel placeholder
@@ -145,6 +160,7 @@ function initDragDrop({ listId, reorderUrl, csrfToken }) {
 
         dragged = handle.closest('.drag-item');
         if (!dragged) return;
+        startNeighbours = neighbourIds(dragged);
 
         const touch = e.touches[0];
         const rect = dragged.getBoundingClientRect();
@@ -208,9 +224,10 @@ function initDragDrop({ listId, reorderUrl, csrfToken }) {
             touchClone.remove();
             touchClone = null;
         }
+        const moved = dragged;
         placeholder = null;
         dragged = null;
-        saveOrder();
+        saveMove(moved, startNeighbours);
     });
 
     // ── Abilita draggable su tutti gli item ───────────────────────
@@ -8,14 +8,15 @@
  * per spostarle dentro/fuori una cartella; le cartelle si riordinano solo
  * tra loro/le schede sciolte a livello radice (mai annidabili).
  *
- * Al rilascio si risincronizza per intero (non un diff incrementale): un
- * POST alla lista radice + un POST per ogni cartella attualmente
- * renderizzata con il suo elenco corrente di schede. Semplice e robusto:
- * a questa scala (poche schede/cartelle per utente) il costo è trascurabile.
+ * Al rilascio si invia un solo spostamento (POST → /plans/move/):
+ * l'elemento trascinato, la cartella di destinazione (null = radice) e i
+ * vicini tra cui è stato lasciato. Il server scrive solo quella riga,
+ * quindi due dispositivi che riordinano insieme non si sovrascrivono le
+ * liste a vicenda.
  *
  * Desktop: HTML5 Drag and Drop API. Mobile: Touch Events sul drag-handle.
  */
-function initPlanTree({ treeId, reorderRootUrl, csrfToken }) {
+function initPlanTree({ treeId, moveUrl, csrfToken }) {
     const tree = document.getElementById(treeId);
     if (!tree) return;
 
@@ -35,6 +36,7 @@ function initPlanTree({ treeId, reorderRootUrl, csrfToken }) {
     let touchOffsetY = 0;
     let touchClone = null;
     let dropFolderTarget = null; // cartella attualmente evidenziata come drop-target
+    let startPosition = null;    // posizione prima del drag, per saltare i no-op
 
     const ITEM_SELECTOR = '.plan-folder, .drag-item[data-type="plan"]';
 
@@ -154,37 +156,47 @@ function initPlanTree({ treeId, reorderRootUrl, csrfToken }) {
         }
         if (placeholder && placeholder.parentNode) placeholder.remove();
 
+        const moved = dragged;
+        const before = startPosition;
         clearFolderHighlight();
         placeholder = null;
         dragged = null;
         draggedType = null;
+        startPosition = null;
 
-        persist();
+        persist(moved, before);
     }
 
-    // ── Salvataggio — risincronizza per intero ───────────────────
-    async function persist() {
+    // ── Salvataggio — un solo spostamento ────────────────────────
+    function itemRef(el) {
+        return el ? { type: el.dataset.type, id: parseInt(el.dataset.id, 10) } : null;
+    }
+
+    function positionOf(item) {
+        const container = item.parentNode;
+        const siblings = getSiblingItems(container);
+        const index = siblings.indexOf(item);
+        const folderBody = container.closest('.plan-folder-body');
+        return {
+            folder: folderBody ? parseInt(folderBody.dataset.folderId, 10) : null,
+            after: itemRef(siblings[index - 1]),
+            before: itemRef(siblings[index + 1]),
+        };
+    }
+
+    async function persist(item, previous) {
+        const position = positionOf(item);
+        // Rilasciato dov'era: niente da salvare.
+        if (JSON.stringify(position) === JSON.stringify(previous)) return;
+
         savingIndicator.classList.add('active');
         try {
-            const rootOrder = getSiblingItems(tree).map(el => ({
-                type: el.dataset.type,
-                id: parseInt(el.dataset.id, 10),
-            }));
-            await fetch(reorderRootUrl, {
+            const res = await fetch(moveUrl, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken },
-                body: JSON.stringify({ order: rootOrder }),
+                body: JSON.stringify({ ...itemRef(item), ...position }),
             });
-
-            const folderBodies = tree.querySelectorAll('.plan-folder-body');
-            for (const body of folderBodies) {
-                const ids = getSiblingItems(body).map(el => parseInt(el.dataset.id, 10));
-                await fetch(body.dataset.reorderUrl, {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken },
-                    body: JSON.stringify({ order: ids }),
-                });
-            }
+            if (!res.ok) console.error('Move failed', await res.text());
         } catch (e) {
             console.error('Reorder error', e);
         } finally {
@@ -198,6 +210,7 @@ function initPlanTree({ treeId, reorderRootUrl, csrfToken }) {
         if (!item) return;
         dragged = item;
         draggedType = item.dataset.type;
+        startPosition = positionOf(item);
         placeholder = createPlaceholder(item);
         setTimeout(() => setDraggingStyle(item, true), 0);
         e.dataTransfer.effectAllowed = 'move';
@@ -226,6 +239,7 @@ function initPlanTree({ treeId, reorderRootUrl, csrfToken }) {
 
         dragged = item;
         draggedType = item.dataset.type;
+        startPosition = positionOf(item);
 
         const touch = e.touches[0];
         const rect = item.getBoundingClientRect();
@@ -2,7 +2,8 @@
  * GymIt — Progress Chart
  * Inizializza il grafico Chart.js per l'andamento di un esercizio:
  * 1RM teorico + carico per gli esercizi con pesi, sole ripetizioni per
- * quelli a corpo libero (niente carico da correlare).
+ * quelli a corpo libero (niente carico da correlare). La media mobile
+ * del 1RM (campo `trend`) arriva già calcolata dal server.
  */
 
 function initProgressChart(canvasId, data, isBodyweight) {
@@ -100,6 +101,16 @@ function initProgressChart(canvasId, data, isBodyweight) {
                     pointHoverRadius: 8,
                     borderWidth: 2,
                 },
+                {
+                    label: 'Media mobile 1RM (kg)',
+                    data: data.map(d => d.trend),
+                    borderColor: '#20c997',
+                    backgroundColor: 'transparent',
+                    fill: false,
+                    tension: 0.4,
+                    pointRadius: 0,
+                    borderWidth: 2,
+                },
                 {
                     label: 'Carico effettivo (kg)',
                     data: weightValues,
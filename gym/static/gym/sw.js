@@ -9,7 +9,7 @@
  * Incrementa CACHE_VERSION ad ogni deploy per invalidare la cache.
  */
 
-const CACHE_VERSION = 'gymit-v6';
+const CACHE_VERSION = 'gymit-v7';
 const STATIC_CACHE = `${CACHE_VERSION}-static`;
 const PAGES_CACHE  = `${CACHE_VERSION}-pages`;
 
@@ -34,10 +34,20 @@ const NEVER_CACHE = [
     /\/planned\/\d+\/remove/,
     /\/log\/\d+\/delete/,
     /\/plans\/\d+\/reorder/,
+    /\/plans\/move/,
+    /\/plans\/\d+\/move/,
+    // Registrazione in blocco: precompilata con gli ultimi carichi
+    /\/plans\/\d+\/log/,
     /\/sessions\//,
+    // Avanzamento degli import in background
+    /\/imports\//,
+    // Export dell'account: un download a flusso, da non copiare in cache
+    /\/account\/export/,
     // Dettaglio giornata: JSON che cambia a ogni registrazione/eliminazione
     /\/calendar\/\d+\/\d+\/\d+/,
     /\/sw\.js/,
+    // Metriche per lo staff: sempre dal server
+    /^\/metrics$/,
 ];
 
 function shouldNeverCache(url) {
@@ -86,6 +96,20 @@ self.addEventListener('fetch', (event) => {
         return;
     }
 
+    // Catalogo esercizi: l'URL contiene l'hash del contenuto, non cambia
+    // mai ed è il ripiego dell'autocompletamento offline
+    if (url.pathname.startsWith('/exercises/catalog/')) {
+        event.respondWith(cacheFirst(request, STATIC_CACHE));
+        return;
+    }
+
+    // Heatmap annuale: JSON con ETag, la rete rivalida a basso costo (304)
+    // e l'ultima copia resta disponibile offline
+    if (url.pathname === '/calendar/heatmap/') {
+        event.respondWith(networkFirstWithCache(request, PAGES_CACHE));
+        return;
+    }
+
     // Pagine HTML: network-first con cache fallback
     if (request.headers.get('accept')?.includes('text/html')) {
         event.respondWith(networkFirstWithCache(request, PAGES_CACHE));
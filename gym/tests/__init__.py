@@ -0,0 +1,7 @@
+import logging
+
+# Le misure per richiesta (gymit/middleware.py) non devono finire
+# nell'output dei test, ad es. per l'import da 50.000 righe: i test che le
+# verificano usano assertLogs, che alza di nuovo il livello.
+for name in ('gymit.requests', 'gymit.sql'):
+    logging.getLogger(name).setLevel(logging.CRITICAL)
@@ -0,0 +1,150 @@
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from gym import analytics
+from gym.analytics import StrengthSeries
+from gym.models import Exercise, ExerciseLog, MuscleGroup
+
+START = date(2026, 1, 1)
+
+
+def rows_for(exercise_id, values, every=7, first_id=1):
+    """Log settimanali (di default) con i 1RM indicati."""
+    return [
+        (first_id + n, exercise_id, START + timedelta(days=n * every), Decimal(str(value)), 5, Decimal('80'))
+        for n, value in enumerate(values)
+    ]
+
+
+class StrengthSeriesTest(SimpleTestCase):
+    def test_segments(self):
+        series = StrengthSeries.from_rows(rows_for(3, [100, 101]) + rows_for(8, [50, 51, 52], first_id=10))
+        self.assertEqual(series.exercises.tolist(), [3, 8])
+        self.assertEqual(series.starts.tolist(), [0, 2])
+        self.assertEqual(series.ends.tolist(), [1, 4])
+        self.assertEqual(series.group.tolist(), [0, 0, 1, 1, 1])
+
+    def test_empty(self):
+        series = StrengthSeries.from_rows([])
+        self.assertEqual(len(series), 0)
+        self.assertEqual(analytics.trends(series), {})
+        self.assertEqual(len(analytics.rolling_mean(series)), 0)
+
+    def test_rolling_mean_restarts_per_exercise(self):
+        series = StrengthSeries.from_rows(rows_for(1, [10, 20, 30, 40]) + rows_for(2, [100, 200], first_id=10))
+        self.assertEqual(analytics.rolling_mean(series, window=3).tolist(), [10, 15, 20, 30, 100, 150])
+
+
+class TrendsTest(SimpleTestCase):
+    def test_linear_progress_slope(self):
+        # +2 kg a settimana, esatti: la retta passa per tutti i punti.
+        trend = analytics.trends(StrengthSeries.from_rows(rows_for(1, [100 + 2 * n for n in range(10)])))[1]
+        self.assertEqual(trend['kg_per_week'], 2.0)
+        self.assertEqual(trend['current'], 118.0)
+        self.assertEqual(trend['best'], 118.0)
+        self.assertFalse(trend['plateau'])
+        self.assertEqual(trend['log_count'], 10)
+
+    def test_only_recent_window_counts(self):
+        # Crescita vecchia, poi 12+ settimane piatte: la pendenza è zero.
+        values = [60 + 5 * n for n in range(8)] + [95] * 14
+        trend = analytics.trends(StrengthSeries.from_rows(rows_for(1, values)))[1]
+        self.assertEqual(trend['kg_per_week'], 0.0)
+
+    def test_too_few_logs_have_no_slope(self):
+        trend = analytics.trends(StrengthSeries.from_rows(rows_for(1, [100, 110])))[1]
+        self.assertIsNone(trend['kg_per_week'])
+        self.assertEqual(trend['current'], 110.0)
+
+    def test_plateau(self):
+        values = [100, 105, 110, 108, 109, 107, 110, 106, 109]
+        trend = analytics.trends(StrengthSeries.from_rows(rows_for(1, values)))[1]
+        self.assertTrue(trend['plateau'])
+        # Il pari merito non è un nuovo record.
+        self.assertEqual(trend['plateau_since'], START + timedelta(weeks=2))
+
+    def test_exercises_are_independent(self):
+        # Il primo esercizio ha valori più alti: non deve coprire i record del secondo.
+        rows = rows_for(1, [200] * 9) + rows_for(2, [50 + n for n in range(9)], first_id=100)
+        result = analytics.trends(StrengthSeries.from_rows(rows))
+        self.assertTrue(result[1]['plateau'])
+        self.assertFalse(result[2]['plateau'])
+        self.assertEqual(result[2]['best'], 58.0)
+        self.assertEqual(result[2]['kg_per_week'], 1.0)
+
+    def test_weeks_to_goal(self):
+        trend = {'current': 100.0, 'kg_per_week': 2.5}
+        self.assertEqual(analytics.weeks_to_goal(trend, 110), 4)
+        self.assertEqual(analytics.weeks_to_goal(trend, 95), 0)
+        self.assertIsNone(analytics.weeks_to_goal(trend, 1000))
+        self.assertIsNone(analytics.weeks_to_goal({'current': 100.0, 'kg_per_week': -1.0}, 110))
+        self.assertIsNone(analytics.weeks_to_goal(None, 110))
+
+
+class AnalyticsViewsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('trends', password='testpass')
+        self.client.login(username='trends', password='testpass')
+        self.squat = Exercise.objects.create(name='Squat', muscle_group=MuscleGroup.LEGS)
+        self.bench = Exercise.objects.create(name='Panca', muscle_group=MuscleGroup.CHEST)
+        today = timezone.localdate()
+        logs = []
+        for n in range(10):
+            day = today - timedelta(weeks=9 - n)
+            logs.append(ExerciseLog(
+                user=self.user, exercise=self.squat, date=day, sets=3, reps=1, weight=Decimal(100 + 2 * n),
+            ))
+            logs.append(ExerciseLog(
+                user=self.user, exercise=self.bench, date=day, sets=3, reps=1,
+                weight=Decimal(90 if n == 1 else 80),
+            ))
+        for log in logs:
+            log.save()
+
+    def test_dashboard_trends(self):
+        r = self.client.get(reverse('dashboard'))
+        self.assertEqual([e['exercise'] for e in r.context['rising_exercises']], [self.squat])
+        self.assertEqual(r.context['rising_exercises'][0]['trend']['kg_per_week'], 2.0)
+        self.assertEqual([e['exercise'] for e in r.context['stalled_exercises']], [self.bench])
+        self.assertContains(r, '+2 kg/settimana')
+
+    def test_progress_trend_and_rolling_mean(self):
+        r = self.client.get(reverse('exercise_progress', args=[self.squat.pk]))
+        self.assertEqual(r.context['trend']['kg_per_week'], 2.0)
+        chart = r.context['chart_data']
+        self.assertIn('"trend": 114.0', chart)  # media di 110..118
+        self.assertIsNone(r.context['weeks_to_goal'])
+
+    def test_progress_goal_projection(self):
+        r = self.client.get(reverse('exercise_progress', args=[self.squat.pk]), {'goal': '126,5'})
+        self.assertEqual(r.context['goal'], 126.5)
+        self.assertEqual(r.context['weeks_to_goal'], 5)
+        self.assertContains(r, 'tra circa 5 settimane')
+
+    def test_invalid_goal_ignored(self):
+        r = self.client.get(reverse('exercise_progress', args=[self.squat.pk]), {'goal': 'tanto'})
+        self.assertIsNone(r.context['goal'])
+
+    def test_bodyweight_has_no_trend(self):
+        dips = Exercise.objects.create(name='Dips', muscle_group=MuscleGroup.CHEST, is_bodyweight=True)
+        ExerciseLog.objects.create(user=self.user, exercise=dips, date=timezone.localdate(), sets=3, reps=10)
+        r = self.client.get(reverse('exercise_progress', args=[dips.pk]))
+        self.assertIsNone(r.context['trend'])
+
+
+class BenchmarkAnalyticsCommandTest(TestCase):
+    def test_runs(self):
+        User.objects.create_user('bench', password='testpass')
+        out = io.StringIO()
+        call_command('benchmark_analytics', '--logs', '50', '500', '--repeat', '1', '--user', 'bench', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[1].split()[0], '50')
+        self.assertEqual(lines[2].split()[0], '500')
+        self.assertIn('bench: 0 log', lines[3])
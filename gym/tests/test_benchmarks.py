@@ -0,0 +1,124 @@
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+
+from gym import benchmarks
+from gym.management.commands.seed_exercises import EXERCISES
+from gym.models import (
+    Exercise, ExerciseLog, ExerciseStats, PersonalRecord, PlanFolder, TrainingSummary, WorkoutPlan,
+    WorkoutSession,
+)
+
+
+def seed_catalogue():
+    Exercise.objects.bulk_create([
+        Exercise(name=name, muscle_group=muscle, is_bodyweight=name in {'Dips', 'Trazioni'})
+        for name, muscle, _ in EXERCISES
+    ])
+
+
+def generate(*args):
+    call_command('generate_load_data', *args, stdout=io.StringIO())
+
+
+class PercentileTest(SimpleTestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmarks.percentile(values, 50), 50)
+        self.assertEqual(benchmarks.percentile(values, 95), 95)
+        self.assertEqual(benchmarks.percentile([7], 95), 7)
+        self.assertEqual(benchmarks.percentile([3, 1, 2], 100), 3)
+
+
+class GenerateLoadDataTest(TestCase):
+    def setUp(self):
+        seed_catalogue()
+
+    def _snapshot(self):
+        return (
+            list(WorkoutPlan.objects.order_by('user__username', 'order').values_list('user__username', 'name', 'order')),
+            list(ExerciseLog.objects.order_by('user__username', 'date', 'exercise__name')
+                 .values_list('user__username', 'date', 'exercise__name', 'reps', 'weight')),
+        )
+
+    def test_creates_consistent_history(self):
+        generate('--users', '2', '--years', '1', '--prefix', 'perf')
+        users = User.objects.filter(username__startswith='perf')
+        self.assertEqual(sorted(u.username for u in users), ['perf0001', 'perf0002'])
+        user = users.get(username='perf0001')
+        self.assertTrue(self.client.login(username='perf0001', password='loadtest'))
+
+        self.assertEqual(PlanFolder.objects.filter(user=user).count(), 2)
+        self.assertTrue(WorkoutPlan.objects.filter(user=user, folder__isnull=True, is_active=False).exists())
+        sessions = WorkoutSession.objects.filter(user=user)
+        self.assertGreater(sessions.count(), 52 * 2)
+        self.assertEqual(TrainingSummary.objects.get(user=user).total_days, sessions.count())
+
+        logs = ExerciseLog.objects.filter(user=user)
+        self.assertTrue(logs.filter(one_rm__isnull=False).exists())
+        self.assertFalse(logs.filter(exercise__is_bodyweight=True, weight__isnull=False).exists())
+        # Statistiche e record allineati come dopo i salvataggi normali.
+        self.assertEqual(
+            sum(ExerciseStats.objects.filter(user=user).values_list('log_count', flat=True)), logs.count()
+        )
+        self.assertTrue(PersonalRecord.objects.filter(user=user).exists())
+
+    def test_deterministic_with_seed(self):
+        generate('--users', '1', '--prefix', 'seed', '--seed', '7')
+        first = self._snapshot()
+        generate('--users', '1', '--prefix', 'seed', '--seed', '7', '--replace')
+        self.assertEqual(self._snapshot(), first)
+
+    def test_existing_users_require_replace(self):
+        generate('--users', '1', '--prefix', 'dup')
+        with self.assertRaises(CommandError):
+            generate('--users', '1', '--prefix', 'dup')
+
+    def test_empty_catalogue(self):
+        Exercise.objects.all().delete()
+        with self.assertRaises(CommandError):
+            generate('--users', '1')
+
+
+class BenchmarkViewsTest(TestCase):
+    def setUp(self):
+        seed_catalogue()
+        generate('--users', '1', '--prefix', 'bench')
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_report(self):
+        path = os.path.join(self.dir.name, 'bench.json')
+        out = io.StringIO()
+        call_command('benchmark_views', 'bench0001', '--repeat', '2', '--output', path, stdout=out)
+        with open(path, encoding='utf-8') as f:
+            report = json.load(f)
+
+        self.assertEqual(report['user']['username'], 'bench0001')
+        rows = {(row['name'], row['cache']): row for row in report['results']}
+        for name in ('dashboard', 'plan_list', 'workout_calendar', 'exercise_progress', 'plan_detail'):
+            self.assertEqual(rows[name, 'cold']['status'], [200])
+            self.assertIn((name, 'warm'), rows)
+        # La dashboard in cache non ricalcola la pagina.
+        self.assertLess(rows['dashboard', 'warm']['queries'], rows['dashboard', 'cold']['queries'])
+        self.assertLessEqual(rows['dashboard', 'cold']['p50_ms'], rows['dashboard', 'cold']['p95_ms'])
+        self.assertIn('dashboard', out.getvalue())
+
+    def test_imports_are_rolled_back(self):
+        sessions = WorkoutSession.objects.count()
+        plans = WorkoutPlan.objects.count()
+        report = benchmarks.run(User.objects.get(username='bench0001'), repeat=1,
+                                names={'session_import', 'plan_import'})
+        self.assertEqual([row['status'] for row in report['results']], [[302], [302]])
+        self.assertEqual(WorkoutSession.objects.count(), sessions)
+        self.assertEqual(WorkoutPlan.objects.count(), plans)
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_views', 'nessuno')
@@ -0,0 +1,122 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from gym import catalog, search
+from gym.caching import catalog_version
+from gym.forms import ExerciseLogForm, PlannedExerciseForm
+from gym.models import CatalogVersion, Exercise, MuscleGroup
+
+
+def names(results):
+    return [result['name'] for result in results]
+
+
+class CatalogSnapshotTest(TestCase):
+    def setUp(self):
+        catalog.forget()
+        self.squat = Exercise.objects.create(name='Squat', muscle_group=MuscleGroup.LEGS)
+
+    def test_lookups_without_queries(self):
+        search.search_exercises('squ')
+        with self.assertNumQueries(0):
+            self.assertEqual(names(search.search_exercises('squ')), ['Squat'])
+            self.assertEqual(catalog.snapshot().by_id[self.squat.pk]['muscle_label'], 'Gambe')
+
+    def test_save_and_delete_bump_catalog_version(self):
+        version = catalog_version()
+        self.squat.name = 'Squat frontale'
+        self.squat.save()
+        self.assertEqual(catalog_version(), version + 1)
+        self.squat.delete()
+        self.assertEqual(catalog_version(), version + 2)
+
+    def test_new_exercise_visible_immediately(self):
+        search.search_exercises('squ')
+        Exercise.objects.create(name='Squat bulgaro', muscle_group=MuscleGroup.LEGS)
+        self.assertEqual(names(search.search_exercises('squ')), ['Squat', 'Squat bulgaro'])
+
+    def test_snapshot_forgotten_again_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Exercise.objects.create(name='Squat bulgaro', muscle_group=MuscleGroup.LEGS)
+            catalog.snapshot()
+        self.assertIsNone(catalog._snapshot)
+
+    def test_change_from_other_process_seen_after_recheck(self):
+        search.search_exercises('squ')
+        # Un altro worker: esercizio e versione cambiano senza passare di qui.
+        Exercise.objects.bulk_create([Exercise(name='Squat sumo', muscle_group=MuscleGroup.LEGS)])
+        CatalogVersion.objects.update_or_create(pk=1, defaults={'version': catalog_version() + 1})
+        self.assertEqual(names(search.search_exercises('squ')), ['Squat'])
+        with patch('gym.catalog.time.monotonic', return_value=catalog._checked_at + catalog.RECHECK_SECONDS):
+            self.assertEqual(names(search.search_exercises('squ')), ['Squat', 'Squat sumo'])
+
+    def test_digest_follows_content(self):
+        before = catalog.snapshot().digest
+        self.assertEqual(catalog.snapshot().digest, before)
+        Exercise.objects.create(name='Affondi', muscle_group=MuscleGroup.LEGS)
+        self.assertNotEqual(catalog.snapshot().digest, before)
+
+
+class CatalogViewTest(TestCase):
+    def setUp(self):
+        catalog.forget()
+        User.objects.create_user('cat', password='testpass')
+        self.client.login(username='cat', password='testpass')
+        self.dips = Exercise.objects.create(name='Dip', muscle_group=MuscleGroup.CHEST, is_bodyweight=True)
+
+    def test_served_with_long_cache(self):
+        snapshot = catalog.snapshot()
+        r = self.client.get(reverse('exercise_catalog', args=[snapshot.digest]))
+        self.assertEqual(r['Cache-Control'], 'private, max-age=31536000, immutable')
+        data = r.json()
+        self.assertEqual(data['version'], snapshot.version)
+        self.assertIn(
+            {'id': self.dips.pk, 'name': 'Dip', 'muscle_group': 'chest', 'muscle_label': 'Petto', 'is_bodyweight': True},
+            data['exercises'],
+        )
+
+    def test_stale_digest_redirects(self):
+        r = self.client.get(reverse('exercise_catalog', args=['0123456789abcdef']))
+        self.assertRedirects(r, reverse('exercise_catalog', args=[catalog.snapshot().digest]))
+
+    def test_login_required(self):
+        self.client.logout()
+        r = self.client.get(reverse('exercise_catalog', args=[catalog.snapshot().digest]))
+        self.assertEqual(r.status_code, 302)
+
+
+class ExerciseSelectTest(TestCase):
+    def setUp(self):
+        catalog.forget()
+        self.user = User.objects.create_user('sel', password='testpass')
+        Exercise.objects.bulk_create([
+            Exercise(name=f'Esercizio {n}', muscle_group=MuscleGroup.CHEST) for n in range(50)
+        ])
+        self.dips = Exercise.objects.create(name='Dip', muscle_group=MuscleGroup.CHEST, is_bodyweight=True)
+
+    def test_renders_only_selected_option(self):
+        html = str(ExerciseLogForm(user=self.user, initial={'exercise': self.dips.pk})['exercise'])
+        self.assertEqual(html.count('<option'), 2)
+        self.assertInHTML(f'<option value="{self.dips.pk}" data-bodyweight="true" selected>Dip</option>', html)
+        self.assertIn(f'data-catalog-url="{reverse("exercise_catalog", args=[catalog.snapshot().digest])}"', html)
+
+    def test_render_without_catalogue_query(self):
+        catalog.snapshot()
+        form = PlannedExerciseForm(initial={'exercise': self.dips.pk})
+        with self.assertNumQueries(0):
+            str(form['exercise'])
+
+    def test_exercise_missing_from_snapshot_read_from_db(self):
+        catalog.snapshot()
+        new = Exercise.objects.bulk_create([Exercise(name='Nuovo', muscle_group=MuscleGroup.BACK)])[0]
+        html = str(PlannedExerciseForm(initial={'exercise': new.pk})['exercise'])
+        self.assertIn('Nuovo</option>', html)
+
+    def test_validation_unchanged(self):
+        form = PlannedExerciseForm(data={'exercise': self.dips.pk, 'target_sets': 3, 'target_reps': 10})
+        self.assertTrue(form.is_valid())
+        form = PlannedExerciseForm(data={'exercise': 999999, 'target_sets': 3, 'target_reps': 10})
+        self.assertIn('exercise', form.errors)
@@ -0,0 +1,64 @@
+import random
+
+from django.test import SimpleTestCase, override_settings
+
+from gym.charts import downsample
+
+
+def make_series(values):
+    return [{'date': f'd{i}', 'one_rm': v} for i, v in enumerate(values)]
+
+
+@override_settings(GYM_CHART_MAX_POINTS={'sparkline': 30, 'progress': 300})
+class DownsampleTest(SimpleTestCase):
+    def test_short_series_untouched(self):
+        series = make_series([100, 90, 110])
+        self.assertEqual(downsample(series, 'sparkline'), series)
+
+    def test_long_series_reduced_to_limit(self):
+        rng = random.Random(1)
+        series = make_series([rng.uniform(80, 120) for _ in range(2000)])
+        result = downsample(series, 'progress')
+        self.assertLessEqual(len(result), 300)
+        self.assertGreater(len(result), 250)
+
+    def test_keeps_first_and_last_points(self):
+        rng = random.Random(2)
+        series = make_series([rng.uniform(80, 120) for _ in range(500)])
+        result = downsample(series, 'sparkline')
+        self.assertIs(result[0], series[0])
+        self.assertIs(result[-1], series[-1])
+
+    def test_preserves_chronological_order(self):
+        rng = random.Random(3)
+        series = make_series([rng.uniform(80, 120) for _ in range(500)])
+        dates = [int(p['date'][1:]) for p in downsample(series, 'sparkline')]
+        self.assertEqual(dates, sorted(dates))
+
+    def test_record_points_always_kept(self):
+        """Un picco isolato che fa da PR non può sparire nella riduzione."""
+        values = [100.0] * 1000
+        values[437] = 150.0
+        values[900] = 160.0
+        result = downsample(make_series(values), 'sparkline')
+        kept = {p['date'] for p in result}
+        self.assertIn('d437', kept)
+        self.assertIn('d900', kept)
+
+    def test_limit_holds_when_every_point_is_a_record(self):
+        series = make_series([float(v) for v in range(1000)])
+        result = downsample(series, 'sparkline')
+        self.assertLessEqual(len(result), 30)
+        self.assertEqual(result[-1]['one_rm'], 999.0)
+
+    def test_value_key_for_bodyweight(self):
+        series = [{'date': f'd{i}', 'one_rm': None, 'reps': 10} for i in range(400)]
+        series[123]['reps'] = 30
+        result = downsample(series, 'progress', value_key='reps')
+        self.assertLessEqual(len(result), 300)
+        self.assertIn('d123', {p['date'] for p in result})
+
+    @override_settings(GYM_CHART_MAX_POINTS={'sparkline': 10})
+    def test_limit_is_configurable(self):
+        series = make_series([float(v % 7) for v in range(100)])
+        self.assertLessEqual(len(downsample(series, 'sparkline')), 10)
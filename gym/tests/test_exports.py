@@ -0,0 +1,153 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from gym import exports
+from gym.models import (
+    Exercise, ExerciseLog, MuscleGroup, PlanFolder, PlannedExercise, WorkoutPlan, WorkoutSession,
+)
+
+
+def read_zip(content):
+    """{nome file: righe CSV} di uno zip esportato."""
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        return {
+            name: list(csv.reader(io.StringIO(archive.read(name).decode('utf-8-sig'))))
+            for name in archive.namelist()
+        }
+
+
+class AccountExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('exporter', password='testpass')
+        self.client.login(username='exporter', password='testpass')
+        self.squat = Exercise.objects.create(name='Squat', muscle_group=MuscleGroup.LEGS)
+        self.pullup = Exercise.objects.create(name='Trazioni', muscle_group=MuscleGroup.BACK, is_bodyweight=True)
+        folder = PlanFolder.objects.create(user=self.user, name='Inverno')
+        self.plan = WorkoutPlan.objects.create(user=self.user, name='Forza', folder=folder)
+        PlannedExercise.objects.create(plan=self.plan, exercise=self.squat, target_sets=5, target_reps=5, order='m')
+        PlannedExercise.objects.create(plan=self.plan, exercise=self.pullup, target_sets=3, target_reps=8, order='c')
+        ExerciseLog.objects.create(
+            user=self.user, exercise=self.squat, date=date(2026, 1, 15),
+            sets=5, reps=5, weight=Decimal('100'),
+        )
+        ExerciseLog.objects.create(user=self.user, exercise=self.pullup, date=date(2026, 1, 16), sets=3, reps=8)
+        WorkoutSession.objects.create(user=self.user, date=date(2026, 1, 15), plan_name='Forza')
+
+        # Dati di un altro utente: non devono comparire.
+        other = User.objects.create_user('other', password='testpass')
+        ExerciseLog.objects.create(user=other, exercise=self.squat, date=date(2026, 1, 15), sets=1, reps=1, weight=50)
+        WorkoutPlan.objects.create(user=other, name='Altrui')
+
+    def test_zip_contains_one_csv_per_table(self):
+        r = self.client.get(reverse('account_export'))
+        self.assertEqual(r['Content-Type'], 'application/zip')
+        self.assertIn('attachment; filename="gymit_exporter_', r['Content-Disposition'])
+        self.assertTrue(r.streaming)
+        files = read_zip(r.getvalue())
+        self.assertEqual(
+            sorted(files),
+            ['allenamenti.csv', 'cartelle.csv', 'esercizi_scheda.csv', 'log.csv', 'schede.csv'],
+        )
+        self.assertEqual(files['log.csv'][1][:6], ['2026-01-15', 'Squat', 'legs', '5', '5', '100.00'])
+        self.assertEqual(files['log.csv'][2][5], '')
+        self.assertEqual(len(files['log.csv']), 3)
+        self.assertEqual(files['allenamenti.csv'], [['data', 'scheda', 'libero'], ['2026-01-15', 'Forza', 'no']])
+        self.assertEqual([row[1] for row in files['schede.csv'][1:]], ['Forza'])
+
+    def test_planned_exercises_in_plan_order(self):
+        files = read_zip(self.client.get(reverse('account_export')).getvalue())
+        rows = files['esercizi_scheda.csv'][1:]
+        self.assertEqual([(row[1], row[5], row[7]) for row in rows], [('Trazioni', '1', 'si'), ('Squat', '2', 'no')])
+
+    def test_ndjson(self):
+        r = self.client.get(reverse('account_export'), {'format': 'ndjson'})
+        self.assertEqual(r['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in r.getvalue().decode().splitlines()]
+        self.assertEqual(len(records), 2 + 1 + 1 + 1 + 2)
+        log = records[0]
+        self.assertEqual(log['tipo'], 'log')
+        self.assertEqual((log['data'], log['esercizio'], log['peso']), ('2026-01-15', 'Squat', '100.00'))
+        session = next(rec for rec in records if rec['tipo'] == 'allenamenti')
+        self.assertIs(session['libero'], False)
+
+    def test_unknown_format_falls_back_to_zip(self):
+        r = self.client.get(reverse('account_export'), {'format': 'xml'})
+        self.assertEqual(r['Content-Type'], 'application/zip')
+
+    def test_login_required(self):
+        self.client.logout()
+        r = self.client.get(reverse('account_export'))
+        self.assertEqual(r.status_code, 302)
+
+
+class ExportStreamingTest(TestCase):
+    """Le righe si leggono e si consegnano a blocchi, non tutte insieme."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bigexport', password='testpass')
+        exercise = Exercise.objects.create(name='Panca', muscle_group=MuscleGroup.CHEST)
+        start = date(2020, 1, 1)
+        ExerciseLog.objects.bulk_create([
+            ExerciseLog(user=self.user, exercise=exercise, date=start + timedelta(days=n), sets=3, reps=5, weight=80)
+            for n in range(25)
+        ])
+
+    def test_zip_streamed_before_end(self):
+        with patch('gym.exports.EXPORT_CHUNK', 5):
+            stream = exports.iter_zip(self.user)
+            # La prima intestazione arriva prima di aver letto tutte le tabelle.
+            first = next(stream)
+            self.assertTrue(first.startswith(b'PK'))
+            chunks = [first, *stream]
+        files = read_zip(b''.join(chunks))
+        self.assertEqual(len(files['log.csv']), 26)
+
+    def test_ndjson_yields_per_chunk(self):
+        with patch('gym.exports.EXPORT_CHUNK', 10):
+            chunks = list(exports.iter_ndjson(self.user))
+        self.assertEqual([chunk.count(b'\n') for chunk in chunks], [10, 10, 5])
+
+    def test_rows_read_with_iterator(self):
+        with patch('django.db.models.query.QuerySet.iterator', autospec=True,
+                   side_effect=lambda qs, chunk_size=None: iter(qs._chain())) as iterator:
+            list(exports.iter_ndjson(self.user))
+        self.assertEqual({call.kwargs['chunk_size'] for call in iterator.call_args_list}, {exports.EXPORT_CHUNK})
+
+
+class ExportAccountCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cmdexport', password='testpass')
+        WorkoutSession.objects.create(user=self.user, date=date(2026, 2, 1), plan_name='Push')
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_writes_ndjson_file(self):
+        path = os.path.join(self.dir.name, 'export.ndjson')
+        out = io.StringIO()
+        call_command('export_account', 'cmdexport', '--output', path, '--format', 'ndjson', stdout=out)
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())['scheda'], 'Push')
+        self.assertIn('Completato', out.getvalue())
+
+    def test_writes_zip_file(self):
+        path = os.path.join(self.dir.name, 'export.zip')
+        call_command('export_account', 'cmdexport', '--output', path, stdout=io.StringIO())
+        with open(path, 'rb') as f:
+            self.assertEqual(read_zip(f.read())['allenamenti.csv'][1], ['2026-02-01', 'Push', 'no'])
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('export_account', 'nessuno', '--output', os.path.join(self.dir.name, 'x.zip'))
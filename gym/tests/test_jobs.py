@@ -0,0 +1,227 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from gym import jobs
+from gym.models import ImportJob, PlannedExercise, WorkoutPlan, WorkoutSession
+
+SESSIONS_CSV = 'data,scheda\n2026-01-15,Push\n2026-01-16,Pull\n2026-01-17,Legs\n'
+PLAN_CSV = 'piano,Forza,\nesercizio,gruppo,serie,ripetizioni\nPanca piana,,4,6\nSquat,,5,5\n'
+
+
+class MediaRootMixin:
+    """Gli upload dei job finiscono in una cartella temporanea."""
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('jobuser', password='testpass')
+
+    def make_job(self, kind=ImportJob.Kind.SESSIONS, content=SESSIONS_CSV, name='sessions.csv'):
+        upload = ContentFile(content.encode('utf-8'), name=name)
+        return jobs.enqueue(self.user, kind, upload)
+
+
+class EnqueueViewTest(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.login(username='jobuser', password='testpass')
+
+    def _post(self, url_name, content, name):
+        f = io.BytesIO(content.encode('utf-8'))
+        f.name = name
+        return self.client.post(reverse(url_name), {'csv_file': f})
+
+    @override_settings(GYM_IMPORT_INLINE_MAX_BYTES=10)
+    def test_large_session_file_queued(self):
+        r = self._post('session_import', SESSIONS_CSV, 'storico.csv')
+        job = ImportJob.objects.get()
+        self.assertRedirects(r, reverse('import_job_detail', kwargs={'pk': job.pk}))
+        self.assertEqual(job.status, ImportJob.Status.QUEUED)
+        self.assertEqual(job.kind, ImportJob.Kind.SESSIONS)
+        self.assertEqual(job.filename, 'storico.csv')
+        self.assertEqual(job.size, len(SESSIONS_CSV))
+        self.assertFalse(WorkoutSession.objects.exists())
+
+    @override_settings(GYM_IMPORT_INLINE_MAX_BYTES=10)
+    def test_large_plan_file_queued(self):
+        self._post('plan_import', PLAN_CSV, 'scheda.csv')
+        self.assertEqual(ImportJob.objects.get().kind, ImportJob.Kind.PLAN)
+        self.assertFalse(WorkoutPlan.objects.exists())
+
+    def test_small_file_imported_inline(self):
+        r = self._post('session_import', SESSIONS_CSV, 'storico.csv')
+        self.assertRedirects(r, reverse('workout_calendar'), fetch_redirect_response=False)
+        self.assertFalse(ImportJob.objects.exists())
+        self.assertEqual(WorkoutSession.objects.count(), 3)
+
+
+class RunJobTest(MediaRootMixin, TestCase):
+    def test_session_import_done(self):
+        job = self.make_job()
+        jobs.run_job(jobs.claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.DONE)
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(job.result['inserted'], 3)
+        self.assertEqual(WorkoutSession.objects.filter(user=self.user).count(), 3)
+
+    def test_upload_deleted_after_run(self):
+        job = self.make_job()
+        path = job.upload.path
+        jobs.run_job(jobs.claim_next())
+        job.refresh_from_db()
+        self.assertFalse(job.upload)
+        with self.assertRaises(FileNotFoundError):
+            open(path)
+
+    def test_plan_import_done(self):
+        job = self.make_job(ImportJob.Kind.PLAN, PLAN_CSV, 'scheda.csv')
+        jobs.run_job(jobs.claim_next())
+        job.refresh_from_db()
+        plan = WorkoutPlan.objects.get(user=self.user)
+        self.assertEqual(job.result['plan_id'], plan.pk)
+        self.assertEqual(PlannedExercise.objects.filter(plan=plan).count(), 2)
+
+    def test_invalid_file_marked_failed(self):
+        job = self.make_job(content='non è un csv di allenamenti\n')
+        jobs.run_job(jobs.claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.FAILED)
+        self.assertEqual(job.result['ok'], False)
+
+    def test_unexpected_error_marked_failed(self):
+        job = self.make_job()
+        with patch.dict(jobs.RUNNERS, {ImportJob.Kind.SESSIONS: lambda *a, **k: 1 / 0}), \
+                self.assertLogs('gym.jobs', 'ERROR'):
+            jobs.run_job(jobs.claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.FAILED)
+        self.assertEqual(job.result['messages'][0][0], 'error')
+
+    def test_progress_saved_while_running(self):
+        job = self.make_job()
+        seen = []
+
+        def runner(user, upload, progress):
+            upload.read(len(SESSIONS_CSV) // 2)
+            progress(7)
+            seen.append(ImportJob.objects.values_list('status', 'rows', 'progress').get(pk=job.pk))
+            return {'ok': True, 'messages': []}
+
+        with patch.dict(jobs.RUNNERS, {ImportJob.Kind.SESSIONS: runner}):
+            jobs.run_job(jobs.claim_next())
+        self.assertEqual(seen, [(ImportJob.Status.RUNNING, 7, 50)])
+
+
+class ClaimTest(MediaRootMixin, TestCase):
+    def test_oldest_first_and_exclusive(self):
+        first = self.make_job()
+        second = self.make_job()
+        self.assertEqual(jobs.claim_next().pk, first.pk)
+        self.assertEqual(jobs.claim_next().pk, second.pk)
+        self.assertIsNone(jobs.claim_next())
+
+    def test_lost_race_moves_to_next(self):
+        """Se un altro worker prende il job tra SELECT e UPDATE si passa al successivo."""
+        first = self.make_job()
+        second = self.make_job()
+        original = ImportJob.objects.filter
+        stolen = []
+
+        def racing_filter(*args, **kwargs):
+            if kwargs.get('pk') == first.pk and not stolen:
+                stolen.append(original(pk=first.pk).update(status=ImportJob.Status.RUNNING))
+            return original(*args, **kwargs)
+
+        with patch.object(ImportJob.objects, 'filter', racing_filter):
+            claimed = jobs.claim_next()
+        self.assertEqual(claimed.pk, second.pk)
+        self.assertEqual(claimed.attempts, 1)
+
+    def test_requeue_stale(self):
+        job = self.make_job()
+        jobs.claim_next()
+        later = timezone.now() + jobs.STALE_AFTER + timedelta(minutes=1)
+        self.assertEqual(jobs.requeue_stale(now=timezone.now()), (0, 0))
+        self.assertEqual(jobs.requeue_stale(now=later), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.QUEUED)
+
+    def test_requeue_gives_up_after_max_attempts(self):
+        job = self.make_job()
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.Status.RUNNING, attempts=jobs.MAX_ATTEMPTS,
+            started_at=timezone.now() - jobs.STALE_AFTER * 2,
+        )
+        self.assertEqual(jobs.requeue_stale(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.FAILED)
+
+
+class ImportJobViewsTest(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.login(username='jobuser', password='testpass')
+
+    def test_status_json(self):
+        job = self.make_job()
+        r = self.client.get(reverse('import_job_status', kwargs={'pk': job.pk}))
+        self.assertEqual(r.json(), {'status': 'queued', 'finished': False, 'progress': 0, 'rows': 0})
+        self.assertEqual(r['Cache-Control'], 'no-store')
+
+    def test_other_users_job_not_found(self):
+        job = self.make_job()
+        User.objects.create_user('other', password='testpass')
+        self.client.login(username='other', password='testpass')
+        for name in ('import_job_detail', 'import_job_status'):
+            r = self.client.get(reverse(name, kwargs={'pk': job.pk}))
+            self.assertEqual(r.status_code, 404)
+
+    def test_detail_while_running_polls(self):
+        job = self.make_job()
+        r = self.client.get(reverse('import_job_detail', kwargs={'pk': job.pk}))
+        self.assertContains(r, reverse('import_job_status', kwargs={'pk': job.pk}))
+        self.assertNotIn('next_url', r.context)
+
+    def test_detail_after_finish_shows_result(self):
+        job = self.make_job()
+        jobs.run_job(jobs.claim_next())
+        r = self.client.get(reverse('import_job_detail', kwargs={'pk': job.pk}))
+        self.assertContains(r, '3 allenamenti importati')
+        self.assertEqual(r.context['next_url'], reverse('workout_calendar'))
+
+    def test_failed_plan_job_links_back_to_form(self):
+        job = self.make_job(ImportJob.Kind.PLAN, 'colonna\nvalore\n', 'scheda.csv')
+        jobs.run_job(jobs.claim_next())
+        r = self.client.get(reverse('import_job_detail', kwargs={'pk': job.pk}))
+        self.assertEqual(r.context['next_url'], reverse('plan_import'))
+
+
+class RunJobsCommandTest(MediaRootMixin, TransactionTestCase):
+    # I job girano in un thread con la sua connessione: serve un DB con i
+    # dati davvero salvati. Un solo worker, perché il DB SQLite in memoria
+    # dei test non regge due scritture concorrenti.
+    def test_once_drains_queue(self):
+        self.make_job()
+        self.make_job(content='2026-02-01,Push\n')
+        out = io.StringIO()
+        call_command('run_jobs', '--once', '--workers', '1', '--poll', '0.05', stdout=out)
+        self.assertIn('Completato: 2 import eseguiti.', out.getvalue())
+        self.assertFalse(ImportJob.objects.exclude(status=ImportJob.Status.DONE).exists())
+        self.assertEqual(WorkoutSession.objects.filter(user=self.user).count(), 4)
@@ -0,0 +1,132 @@
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from gymit import metrics
+
+
+def sample_lines(text, prefix):
+    return [line for line in text.splitlines() if line.startswith(prefix)]
+
+
+class TempMetricsDbMixin:
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'metrics.sqlite3')
+        settings_override = override_settings(GYM_METRICS_DB=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class RegistryTest(TempMetricsDbMixin, SimpleTestCase):
+    def _registry(self):
+        registry = metrics.Registry()
+        registry.counter('app_hits_total', 'Visite.', ['view'])
+        registry.histogram('app_latency_seconds', 'Durata.', ['view'], buckets=(0.1, 1))
+        return registry
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = self._registry()
+        histogram = registry.metrics[1]
+        for value in (0.05, 0.5, 3):
+            histogram.observe(value, view='dashboard')
+        registry.flush()
+        text = registry.render()
+        self.assertEqual(sample_lines(text, 'app_latency_seconds'), [
+            'app_latency_seconds_bucket{view="dashboard",le="0.1"} 1',
+            'app_latency_seconds_bucket{view="dashboard",le="1"} 2',
+            'app_latency_seconds_bucket{view="dashboard",le="+Inf"} 3',
+            'app_latency_seconds_sum{view="dashboard"} 3.55',
+            'app_latency_seconds_count{view="dashboard"} 3',
+        ])
+        self.assertIn('# TYPE app_latency_seconds histogram', text)
+
+    def test_workers_are_summed(self):
+        # Due registri come due processi che scrivono nello stesso file.
+        first, second = self._registry(), self._registry()
+        first.metrics[0].inc(view='dashboard')
+        second.metrics[0].inc(2, view='dashboard')
+        second.metrics[0].inc(view='plan_list')
+        first.flush()
+        second.flush()
+        self.assertEqual(sample_lines(first.render(), 'app_hits_total'), [
+            'app_hits_total{view="dashboard"} 3',
+            'app_hits_total{view="plan_list"} 1',
+        ])
+
+    def test_label_values_are_escaped(self):
+        registry = self._registry()
+        registry.metrics[0].inc(view='a"b\\c')
+        registry.flush()
+        self.assertIn('app_hits_total{view="a\\"b\\\\c"} 1', registry.render())
+
+    def test_failed_flush_keeps_increments(self):
+        registry = self._registry()
+        registry.metrics[0].inc(view='dashboard')
+        with override_settings(GYM_METRICS_DB=os.path.join(self.path, 'manca', 'x.sqlite3')):
+            with self.assertLogs('gymit.metrics', 'WARNING'):
+                registry.flush()
+        registry.flush()
+        self.assertIn('app_hits_total{view="dashboard"} 1', registry.render())
+
+    def test_without_database_stays_in_memory(self):
+        registry = self._registry()
+        registry.metrics[0].inc(view='dashboard')
+        with override_settings(GYM_METRICS_DB=''):
+            registry.flush()
+            self.assertIn('app_hits_total{view="dashboard"} 1', registry.render())
+        self.assertFalse(os.path.exists(self.path))
+
+
+@override_settings(GYM_METRICS_TOKEN='segreto')
+class MetricsViewTest(TempMetricsDbMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.REGISTRY.reset()
+        self.staff = User.objects.create_user('staff', password='testpass', is_staff=True)
+        User.objects.create_user('utente', password='testpass')
+
+    def test_staff_sees_request_metrics(self):
+        self.client.login(username='staff', password='testpass')
+        self.client.get(reverse('dashboard'))
+        self.client.get(reverse('dashboard'))
+        r = self.client.get(reverse('metrics'))
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = r.content.decode()
+        self.assertIn('gymit_requests_total{view="dashboard",method="GET",status="200"} 2', text)
+        self.assertIn('gymit_request_duration_seconds_count{view="dashboard"} 2', text)
+        self.assertIn('gymit_request_queries_bucket{view="dashboard",le="+Inf"} 2', text)
+        self.assertIn('gymit_request_sql_seconds_sum{view="dashboard"}', text)
+
+    def test_unmatched_urls_share_one_label(self):
+        self.client.get('/non-esiste/1/')
+        self.client.get('/non-esiste/2/')
+        r = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer segreto')
+        self.assertIn('gymit_requests_total{view="<unmatched>",method="GET",status="404"} 2', r.content.decode())
+
+    def test_unknown_methods_share_one_label(self):
+        self.client.generic('BREW', reverse('login'))
+        self.client.generic('PROPFIND', reverse('login'))
+        r = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer segreto')
+        text = r.content.decode()
+        self.assertIn('gymit_requests_total{view="login",method="OTHER",status="200"} 2', text)
+        self.assertNotIn('BREW', text)
+
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer segreto').status_code, 200)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer altro').status_code, 403)
+
+    def test_forbidden_for_others(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.login(username='utente', password='testpass')
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(GYM_METRICS_TOKEN='')
+    def test_empty_token_disabled(self):
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 403)
@@ -0,0 +1,82 @@
+import json
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+def server_timing(response):
+    """{nome: (durata, descrizione)} dall'header Server-Timing."""
+    metrics = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        values = dict(param.split('=', 1) for param in params)
+        metrics[name] = (float(values['dur']), values.get('desc', '').strip('"'))
+    return metrics
+
+
+@override_settings(
+    GYM_SERVER_TIMING=False, GYM_TIMING_SAMPLE_RATE=0, GYM_SLOW_REQUEST_MS=10 ** 6, GYM_SLOW_QUERY_MS=10 ** 6,
+)
+class ServerTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        User.objects.create_user('timing', password='testpass', is_staff=True)
+        User.objects.create_user('utente', password='testpass')
+        self.client.login(username='timing', password='testpass')
+
+    def test_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.get(reverse('dashboard'))
+        metrics = server_timing(r)
+        self.assertEqual(set(metrics), {'db', 'tpl', 'app', 'total'})
+        self.assertEqual(metrics['db'][1], f'SQL ({len(queries)} query)')
+        self.assertGreater(metrics['tpl'][0], 0)
+        parts = metrics['db'][0] + metrics['tpl'][0] + metrics['app'][0]
+        self.assertAlmostEqual(parts, metrics['total'][0], delta=0.2)
+
+    def test_json_view_has_no_template_time(self):
+        r = self.client.get(reverse('exercise_autocomplete'), {'q': 'pa'})
+        self.assertEqual(server_timing(r)['tpl'][0], 0)
+
+    def test_header_only_for_staff(self):
+        self.client.login(username='utente', password='testpass')
+        self.assertFalse(self.client.get(reverse('dashboard')).has_header('Server-Timing'))
+        self.client.logout()
+        self.assertFalse(self.client.get(reverse('login')).has_header('Server-Timing'))
+
+    @override_settings(GYM_SERVER_TIMING=True)
+    def test_header_for_everyone(self):
+        self.client.login(username='utente', password='testpass')
+        self.assertTrue(self.client.get(reverse('dashboard')).has_header('Server-Timing'))
+
+    @override_settings(GYM_SLOW_REQUEST_MS=0)
+    def test_slow_request_logged(self):
+        with self.assertLogs('gymit.requests', 'WARNING') as logs:
+            r = self.client.get(reverse('plan_list'))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['url'], 'plan_list')
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(f'SQL ({line["queries"]} query)', server_timing(r)['db'][1])
+
+    @override_settings(GYM_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request_logged(self):
+        with self.assertLogs('gymit.requests', 'INFO') as logs:
+            self.client.get(reverse('login'))
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertEqual(json.loads(logs.records[0].getMessage())['url'], 'login')
+
+    def test_not_sampled(self):
+        with self.assertNoLogs('gymit.requests'):
+            self.client.get(reverse('dashboard'))
+
+    @override_settings(GYM_SLOW_QUERY_MS=0)
+    def test_slow_query_logged(self):
+        with self.assertLogs('gymit.sql', 'WARNING') as logs:
+            self.client.get(reverse('plan_list'))
+        lines = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertTrue(any(
+            line['url'] == 'plan_list' and re.search(r'gym_workoutplan', line['sql']) for line in lines
+        ))
@@ -1,13 +1,19 @@
+import io
+
 from django.test import TestCase
 from django.contrib.auth.models import User
 from decimal import Decimal
-from datetime import date
+from datetime import date, timedelta
 
+from django.core.management import call_command
+from django.db import connection
 from django.db.utils import IntegrityError
+from django.test.utils import CaptureQueriesContext
 
 from gym.models import (
     Exercise, WorkoutPlan, PlannedExercise, ExerciseLog,
-    MuscleGroup, PlanFolder, WorkoutSession,
+    MuscleGroup, PlanFolder, WorkoutSession, ExerciseStats, PersonalRecord,
+    TrainingSummary, TrainingWeek,
 )
 
 
@@ -128,6 +134,258 @@ class BodyweightExerciseLogTest(TestCase):
         self.assertIn('3x10', str(log))
 
 
+class ExerciseStatsTest(TestCase):
+    """Le statistiche per esercizio seguono i log a ogni scrittura."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('statsuser', password='testpass')
+        self.exercise = Exercise.objects.create(name='Squat', muscle_group=MuscleGroup.LEGS)
+
+    def _make_log(self, weight, reps=1, log_date=date(2026, 3, 10), exercise=None):
+        return ExerciseLog.objects.create(
+            user=self.user, exercise=exercise or self.exercise,
+            date=log_date, sets=3, reps=reps,
+            weight=Decimal(str(weight)) if weight is not None else None,
+        )
+
+    def _stats(self, exercise=None):
+        return ExerciseStats.objects.get(user=self.user, exercise=exercise or self.exercise)
+
+    def test_first_log_creates_stats(self):
+        log = self._make_log(100)
+        stats = self._stats()
+        self.assertEqual(stats.log_count, 1)
+        self.assertEqual(stats.first_one_rm, Decimal('100'))
+        self.assertEqual(stats.last_one_rm, Decimal('100'))
+        self.assertEqual(stats.best_one_rm, Decimal('100'))
+        self.assertEqual(stats.last_log, log)
+
+    def test_stats_follow_chronological_order_not_insertion(self):
+        """Un log retrodatato diventa il primo, non l'ultimo."""
+        self._make_log(100, log_date=date(2026, 3, 10))
+        self._make_log(80, log_date=date(2026, 1, 5))
+        stats = self._stats()
+        self.assertEqual(stats.first_one_rm, Decimal('80'))
+        self.assertEqual(stats.first_log_date, date(2026, 1, 5))
+        self.assertEqual(stats.last_one_rm, Decimal('100'))
+        self.assertEqual(stats.best_one_rm, Decimal('100'))
+        self.assertEqual(stats.log_count, 2)
+
+    def test_same_day_log_becomes_last(self):
+        self._make_log(100)
+        self._make_log(90)
+        self.assertEqual(self._stats().last_one_rm, Decimal('90'))
+
+    def test_editing_best_log_recomputes_best(self):
+        best = self._make_log(120, log_date=date(2026, 1, 5))
+        self._make_log(100)
+        best.weight = Decimal('90')
+        best.save()
+        stats = self._stats()
+        self.assertEqual(stats.best_one_rm, Decimal('100'))
+        self.assertEqual(stats.first_one_rm, Decimal('90'))
+
+    def test_deleting_last_log_recomputes_last(self):
+        self._make_log(100, log_date=date(2026, 1, 5))
+        last = self._make_log(110)
+        last.delete()
+        stats = self._stats()
+        self.assertEqual(stats.log_count, 1)
+        self.assertEqual(stats.last_one_rm, Decimal('100'))
+        self.assertEqual(stats.last_log_date, date(2026, 1, 5))
+
+    def test_deleting_only_log_removes_stats(self):
+        self._make_log(100).delete()
+        self.assertFalse(ExerciseStats.objects.filter(user=self.user).exists())
+
+    def test_moving_log_to_other_exercise_updates_both(self):
+        other = Exercise.objects.create(name='Panca', muscle_group=MuscleGroup.CHEST)
+        self._make_log(100, log_date=date(2026, 1, 5))
+        log = self._make_log(110)
+        log.exercise = other
+        log.save()
+        self.assertEqual(self._stats().log_count, 1)
+        self.assertEqual(self._stats(other).log_count, 1)
+        self.assertEqual(self._stats(other).best_one_rm, Decimal('110'))
+
+    def test_bodyweight_tracks_best_reps_only(self):
+        bw = Exercise.objects.create(name='Trazioni', muscle_group=MuscleGroup.BACK, is_bodyweight=True)
+        self._make_log(None, reps=8, exercise=bw)
+        self._make_log(None, reps=12, exercise=bw)
+        stats = self._stats(bw)
+        self.assertEqual(stats.best_reps, 12)
+        self.assertIsNone(stats.best_one_rm)
+
+    def test_rebuild_for_user_query_count_is_constant(self):
+        """La ricostruzione non fa una query per esercizio."""
+        self._make_log(100)
+        with CaptureQueriesContext(connection) as single:
+            ExerciseStats.rebuild_for_user(self.user.pk)
+        for i in range(10):
+            exercise = Exercise.objects.create(name=f'Esercizio {i}', muscle_group=MuscleGroup.CHEST)
+            self._make_log(80, exercise=exercise, log_date=date(2026, 1, 5))
+            self._make_log(90, exercise=exercise)
+        with CaptureQueriesContext(connection) as many:
+            ExerciseStats.rebuild_for_user(self.user.pk)
+        self.assertEqual(len(many.captured_queries), len(single.captured_queries))
+        self.assertEqual(ExerciseStats.objects.filter(user=self.user).count(), 11)
+
+    def test_rebuild_command_matches_incremental_stats(self):
+        self._make_log(100, log_date=date(2026, 1, 5))
+        self._make_log(120, reps=5)
+        before = self._stats()
+        ExerciseStats.objects.all().delete()
+        call_command('rebuild_exercise_stats', stdout=io.StringIO())
+        after = self._stats()
+        for field in ('log_count', 'first_one_rm', 'last_one_rm', 'best_one_rm',
+                      'best_reps', 'first_log_date', 'last_log_date', 'last_log_id'):
+            self.assertEqual(getattr(after, field), getattr(before, field), field)
+
+
+class PersonalRecordTest(TestCase):
+    """Record per massimale teorico e rep-max, aggiornati a ogni scrittura."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('pruser', password='testpass')
+        self.exercise = Exercise.objects.create(name='Stacco', muscle_group=MuscleGroup.BACK)
+
+    def _make_log(self, weight, reps, log_date=date(2026, 3, 10)):
+        return ExerciseLog.objects.create(
+            user=self.user, exercise=self.exercise,
+            date=log_date, sets=3, reps=reps, weight=Decimal(str(weight)),
+        )
+
+    def _records(self):
+        return {
+            r.reps: r for r in PersonalRecord.objects.filter(user=self.user, exercise=self.exercise)
+        }
+
+    def test_rep_max_counts_sets_with_at_least_n_reps(self):
+        log = self._make_log(100, reps=6)
+        records = self._records()
+        self.assertEqual(set(records), {PersonalRecord.ESTIMATED_ONE_RM, 1, 3, 5})
+        self.assertEqual(records[5].value, Decimal('100'))
+        self.assertEqual(records[5].log, log)
+
+    def test_first_log_is_not_reported_as_new_record(self):
+        self.assertEqual(self._make_log(100, reps=5).new_records, [])
+
+    def test_heavier_log_reports_improved_records(self):
+        self._make_log(100, reps=5)
+        log = self._make_log(110, reps=3)
+        labels = {r.label for r in log.new_records}
+        self.assertEqual(labels, {'1RM teorico', '1RM', '3RM'})
+        self.assertEqual(self._records()[5].value, Decimal('100'))
+
+    def test_tie_keeps_older_log(self):
+        first = self._make_log(100, reps=5, log_date=date(2026, 1, 5))
+        self._make_log(100, reps=5)
+        self.assertEqual(self._records()[5].log, first)
+
+    def test_editing_record_log_down_recomputes(self):
+        self._make_log(100, reps=5, log_date=date(2026, 1, 5))
+        best = self._make_log(120, reps=5)
+        best.weight = Decimal('90')
+        best.save()
+        self.assertEqual(self._records()[5].value, Decimal('100'))
+
+    def test_deleting_record_log_recomputes(self):
+        self._make_log(100, reps=8, log_date=date(2026, 1, 5))
+        best = self._make_log(120, reps=3)
+        best.delete()
+        records = self._records()
+        self.assertEqual(records[3].value, Decimal('100'))
+        self.assertEqual(records[PersonalRecord.ESTIMATED_ONE_RM].value, Decimal('126.67'))
+
+    def test_deleting_only_log_removes_records(self):
+        self._make_log(100, reps=5).delete()
+        self.assertEqual(self._records(), {})
+
+    def test_bodyweight_has_no_records(self):
+        bw = Exercise.objects.create(name='Dips', muscle_group=MuscleGroup.CHEST, is_bodyweight=True)
+        ExerciseLog.objects.create(user=self.user, exercise=bw, date=date.today(), sets=3, reps=12)
+        self.assertFalse(PersonalRecord.objects.filter(exercise=bw).exists())
+
+    def test_rebuild_command_matches_incremental_records(self):
+        self._make_log(100, reps=8, log_date=date(2026, 1, 5))
+        self._make_log(130, reps=1)
+        self._make_log(110, reps=5)
+        before = {reps: (r.value, r.log_id) for reps, r in self._records().items()}
+        PersonalRecord.objects.all().delete()
+        call_command('rebuild_exercise_stats', stdout=io.StringIO())
+        after = {reps: (r.value, r.log_id) for reps, r in self._records().items()}
+        self.assertEqual(after, before)
+
+
+class BulkLogTest(TestCase):
+    """ExerciseLog.bulk_log() lascia statistiche e record come save() log per log."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bulkuser', password='testpass')
+        self.other = User.objects.create_user('sequser', password='testpass')
+        self.squat = Exercise.objects.create(name='Squat', muscle_group=MuscleGroup.LEGS)
+        self.bench = Exercise.objects.create(name='Panca', muscle_group=MuscleGroup.CHEST)
+        self.dips = Exercise.objects.create(name='Dips', muscle_group=MuscleGroup.CHEST, is_bodyweight=True)
+        for user in (self.user, self.other):
+            ExerciseLog.objects.create(
+                user=user, exercise=self.squat, date=date(2026, 3, 1), sets=3, reps=5, weight=Decimal('100'),
+            )
+
+    def _workout(self, user):
+        return [
+            ExerciseLog(user=user, exercise=self.squat, date=date(2026, 3, 8), sets=5, reps=3, weight=Decimal('110')),
+            ExerciseLog(user=user, exercise=self.squat, date=date(2026, 3, 8), sets=1, reps=1, weight=Decimal('120')),
+            ExerciseLog(user=user, exercise=self.bench, date=date(2026, 3, 8), sets=3, reps=8, weight=Decimal('70')),
+            ExerciseLog(user=user, exercise=self.dips, date=date(2026, 3, 8), sets=3, reps=12),
+        ]
+
+    def _state(self, user):
+        # Gli id dei log sono diversi fra i due utenti: si confrontano i valori.
+        stats = {
+            s.exercise_id: (s.log_count, s.first_one_rm, s.last_one_rm, s.best_one_rm, s.last_log.weight)
+            for s in ExerciseStats.objects.filter(user=user).select_related('last_log')
+        }
+        records = {
+            (r.exercise_id, r.reps): (r.value, r.date, r.log.reps)
+            for r in PersonalRecord.objects.filter(user=user).select_related('log')
+        }
+        return stats, records
+
+    def test_matches_sequential_saves(self):
+        logs = self._workout(self.user)
+        ExerciseLog.bulk_log(logs)
+        for log in self._workout(self.other):
+            log.save()
+        self.assertEqual(self._state(self.user), self._state(self.other))
+        self.assertEqual(logs[0].one_rm, Decimal('121.00'))
+        self.assertIsNone(logs[3].one_rm)
+
+    def test_returns_improved_records_only(self):
+        records = ExerciseLog.bulk_log(self._workout(self.user))
+        self.assertEqual(
+            {(r.exercise_id, r.label) for r in records},
+            {(self.squat.pk, '1RM teorico'), (self.squat.pk, '1RM'), (self.squat.pk, '3RM')},
+        )
+
+    def test_query_count_does_not_grow_with_workout_size(self):
+        def run(count):
+            logs = [
+                ExerciseLog(
+                    user=self.user, date=date(2026, 3, 9), sets=3, reps=8, weight=Decimal('20'),
+                    exercise=Exercise.objects.create(name=f'Esercizio {count}-{n}', muscle_group=MuscleGroup.BICEPS),
+                )
+                for n in range(count)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                ExerciseLog.bulk_log(logs)
+            return len(ctx)
+
+        self.assertEqual(run(2), run(12))
+
+    def test_empty(self):
+        self.assertEqual(ExerciseLog.bulk_log([]), [])
+
+
 class WorkoutPlanTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user('planuser', password='testpass')
@@ -232,6 +490,91 @@ class WorkoutSessionTest(TestCase):
         self.assertEqual(WorkoutSession.objects.count(), 2)
 
 
+class TrainingSummaryTest(TestCase):
+    """Riepilogo dei giorni allenati mantenuto da WorkoutSession.save/delete."""
+
+    # Un lunedì qualsiasi, per ragionare in settimane intere.
+    MONDAY = date(2026, 3, 2)
+
+    def setUp(self):
+        self.user = User.objects.create_user('rollupuser', password='testpass')
+
+    def _session(self, day, name='A'):
+        return WorkoutSession.objects.create(user=self.user, date=day, plan_name=name)
+
+    def _summary(self):
+        return TrainingSummary.objects.get(user=self.user)
+
+    def _weeks(self):
+        return dict(
+            TrainingWeek.objects.filter(user=self.user).values_list('week_start', 'days')
+        )
+
+    def test_counts_distinct_days_per_week(self):
+        self._session(self.MONDAY, 'A')
+        self._session(self.MONDAY, 'B')
+        self._session(self.MONDAY + timedelta(days=6))
+        self.assertEqual(self._weeks(), {self.MONDAY: 2})
+        summary = self._summary()
+        self.assertEqual(summary.total_days, 2)
+        self.assertEqual(summary.first_date, self.MONDAY)
+
+    def test_delete_keeps_day_with_other_sessions(self):
+        self._session(self.MONDAY, 'A')
+        second = self._session(self.MONDAY, 'B')
+        second.delete()
+        self.assertEqual(self._summary().total_days, 1)
+
+        WorkoutSession.objects.get(user=self.user).delete()
+        self.assertEqual(self._weeks(), {})
+        summary = self._summary()
+        self.assertEqual(summary.total_days, 0)
+        self.assertIsNone(summary.first_date)
+        self.assertEqual(summary.longest_streak, 0)
+
+    def test_first_date_follows_earlier_sessions(self):
+        self._session(self.MONDAY)
+        earliest = self._session(self.MONDAY - timedelta(days=30))
+        self.assertEqual(self._summary().first_date, earliest.date)
+        earliest.delete()
+        self.assertEqual(self._summary().first_date, self.MONDAY)
+
+    def test_moving_session_to_another_week(self):
+        session = self._session(self.MONDAY)
+        session.date = self.MONDAY + timedelta(weeks=1)
+        session.save()
+        self.assertEqual(self._weeks(), {self.MONDAY + timedelta(weeks=1): 1})
+        self.assertEqual(self._summary().total_days, 1)
+
+    def test_streaks_in_consecutive_weeks(self):
+        # Due settimane di fila, una di pausa, tre di fila.
+        for week in (0, 1, 3, 4, 5):
+            self._session(self.MONDAY + timedelta(weeks=week))
+        summary = self._summary()
+        self.assertEqual(summary.streak_weeks, 3)
+        self.assertEqual(summary.longest_streak, 3)
+        self.assertEqual(summary.streak_end, self.MONDAY + timedelta(weeks=5))
+
+        # Riempire il buco unisce le due serie.
+        self._session(self.MONDAY + timedelta(weeks=2))
+        self.assertEqual(self._summary().longest_streak, 6)
+
+    def test_current_streak_survives_until_week_is_over(self):
+        self._session(self.MONDAY)
+        self._session(self.MONDAY + timedelta(weeks=1))
+        summary = self._summary()
+        # Settimana in corso ancora vuota: la serie resta aperta...
+        self.assertEqual(summary.current_streak(self.MONDAY + timedelta(weeks=2, days=3)), 2)
+        # ...ma se ne salta una intera è interrotta.
+        self.assertEqual(summary.current_streak(self.MONDAY + timedelta(weeks=3)), 0)
+
+    def test_rollups_are_per_user(self):
+        other = User.objects.create_user('altrorollup', password='testpass')
+        WorkoutSession.objects.create(user=other, date=self.MONDAY, plan_name='A')
+        self.assertFalse(TrainingSummary.objects.filter(user=self.user).exists())
+        self.assertEqual(TrainingSummary.objects.get(user=other).total_days, 1)
+
+
 class FreeWorkoutSessionTest(TestCase):
     """Allenamenti descritti a mano, non legati a nessuna scheda."""
 
@@ -0,0 +1,161 @@
+import io
+import random
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from gym import ordering
+from gym.models import Exercise, MuscleGroup, PlannedExercise, WorkoutPlan
+from gym.ordering import REBALANCE_LENGTH, key_between, spread_keys
+
+
+class KeyBetweenTest(SimpleTestCase):
+    def test_open_interval(self):
+        key = key_between(None, None)
+        self.assertTrue(key)
+
+    def test_strictly_between(self):
+        for a, b in [('a', 'b'), ('a', 'a1'), ('9', 'i'), ('az', 'b'), (None, '01'), ('zz', None)]:
+            with self.subTest(a=a, b=b):
+                key = key_between(a, b)
+                if a is not None:
+                    self.assertLess(a, key)
+                if b is not None:
+                    self.assertLess(key, b)
+
+    def test_never_ends_with_zero(self):
+        key = 'i'
+        for _ in range(50):
+            key = key_between(None, key)
+            self.assertFalse(key.endswith('0'))
+
+    def test_unordered_keys_rejected(self):
+        with self.assertRaises(ValueError):
+            key_between('b', 'a')
+        with self.assertRaises(ValueError):
+            key_between('a', 'a')
+
+    def test_invalid_characters_rejected(self):
+        with self.assertRaises(ValueError):
+            key_between('A', None)
+
+    def test_random_inserts_keep_order(self):
+        """Inserimenti in posizioni casuali: le chiavi restano distinte e ordinate."""
+        rng = random.Random(7)
+        keys = []
+        for _ in range(2000):
+            i = rng.randint(0, len(keys))
+            key = key_between(keys[i - 1] if i else None, keys[i] if i < len(keys) else None)
+            keys.insert(i, key)
+        self.assertEqual(keys, sorted(set(keys)))
+
+    def test_appends_grow_slowly(self):
+        """In coda la chiave si allunga di un carattere ogni 35 aggiunte."""
+        keys = [key_between(None, None)]
+        for _ in range(1000):
+            keys.append(key_between(keys[-1], None))
+        self.assertEqual(keys, sorted(set(keys)))
+        self.assertLessEqual(max(map(len, keys)), 30)
+        self.assertFalse(any(key.endswith('0') for key in keys))
+
+    def test_spread_keys_sorted_and_short(self):
+        keys = spread_keys(1000)
+        self.assertEqual(keys, sorted(set(keys)))
+        self.assertLessEqual(max(map(len, keys)), 3)
+
+
+def make_plan_with_exercises(count):
+    user = User.objects.create_user(username='ordering', password='testpass')
+    plan = WorkoutPlan.objects.create(user=user, name='Scheda')
+    items = [
+        PlannedExercise.objects.create(
+            plan=plan, target_sets=3, target_reps=8,
+            exercise=Exercise.objects.create(name=f'Es {i}', muscle_group=MuscleGroup.CHEST),
+        )
+        for i in range(count)
+    ]
+    return plan, items
+
+
+def ordered_pks(plan):
+    return list(plan.planned_exercises.values_list('pk', flat=True))
+
+
+class MoveTest(TestCase):
+    def setUp(self):
+        self.plan, self.items = make_plan_with_exercises(4)
+
+    def test_new_items_appended(self):
+        self.assertEqual(ordered_pks(self.plan), [pe.pk for pe in self.items])
+
+    def test_move_between_neighbours(self):
+        a, b, c, d = self.items
+        ordering.move(d, d.order_group(), after=(PlannedExercise, a.pk), before=(PlannedExercise, b.pk))
+        self.assertEqual(ordered_pks(self.plan), [a.pk, d.pk, b.pk, c.pk])
+
+    def test_move_to_start_and_end(self):
+        a, b, c, d = self.items
+        ordering.move(c, c.order_group(), before=(PlannedExercise, a.pk))
+        ordering.move(a, a.order_group())
+        self.assertEqual(ordered_pks(self.plan), [c.pk, b.pk, d.pk, a.pk])
+
+    def test_stale_neighbours_follow_after(self):
+        """Se after/before non sono più adiacenti l'elemento va subito dopo `after`."""
+        a, b, c, d = self.items
+        ordering.move(d, d.order_group(), after=(PlannedExercise, a.pk), before=(PlannedExercise, c.pk))
+        self.assertEqual(ordered_pks(self.plan), [a.pk, d.pk, b.pk, c.pk])
+
+    def test_writes_only_moved_row(self):
+        a, b, c, d = self.items
+        before = {pe.pk: pe.order for pe in self.items}
+        ordering.move(d, d.order_group(), after=(PlannedExercise, a.pk))
+        after = dict(self.plan.planned_exercises.values_list('pk', 'order'))
+        changed = [pk for pk in before if before[pk] != after[pk]]
+        self.assertEqual(changed, [d.pk])
+
+    def test_reference_outside_group_rejected(self):
+        with self.assertRaises(ValueError):
+            ordering.move(self.items[0], self.items[0].order_group(), after=(PlannedExercise, 999999))
+
+    def test_long_keys_rebalanced_after_commit(self):
+        a, b = self.items[:2]
+        with self.captureOnCommitCallbacks(execute=True):
+            for pe in self.items[2:] * 50:
+                ordering.move(pe, pe.order_group(), after=(PlannedExercise, a.pk), before=(PlannedExercise, b.pk))
+                b = pe
+            longest = max(len(pe.order) for pe in self.items)
+            self.assertGreater(longest, REBALANCE_LENGTH)
+        keys = list(self.plan.planned_exercises.values_list('order', flat=True))
+        self.assertLessEqual(max(map(len, keys)), REBALANCE_LENGTH)
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_rebalance_keeps_order(self):
+        a, b, c, d = self.items
+        ordering.move(d, d.order_group(), after=(PlannedExercise, a.pk))
+        expected = ordered_pks(self.plan)
+        ordering.rebalance(d.order_group())
+        self.assertEqual(ordered_pks(self.plan), expected)
+
+
+class AppendTest(TestCase):
+    def test_many_appends_stay_short(self):
+        user = User.objects.create_user(username='ordering', password='testpass')
+        plans = [WorkoutPlan.objects.create(user=user, name=f'Scheda {i}') for i in range(500)]
+        keys = list(WorkoutPlan.objects.filter(user=user).values_list('order', flat=True))
+        self.assertLessEqual(max(map(len, keys)), REBALANCE_LENGTH)
+        self.assertEqual(
+            list(WorkoutPlan.objects.filter(user=user).values_list('pk', flat=True)),
+            [plan.pk for plan in plans],
+        )
+
+
+class RebalanceCommandTest(TestCase):
+    def test_shortens_long_keys(self):
+        plan, items = make_plan_with_exercises(3)
+        PlannedExercise.objects.filter(pk=items[1].pk).update(order=items[0].order + 'z' * 20)
+        expected = ordered_pks(plan)
+        call_command('rebalance_order_keys', stdout=io.StringIO())
+        keys = list(plan.planned_exercises.values_list('order', flat=True))
+        self.assertLessEqual(max(map(len, keys)), REBALANCE_LENGTH)
+        self.assertEqual(ordered_pks(plan), expected)
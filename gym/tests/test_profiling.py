@@ -0,0 +1,139 @@
+import os
+import pstats
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+class ProfilingTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = os.path.join(directory.name, 'profiles')
+        settings_override = override_settings(GYM_PROFILE_DIR=self.dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.staff = User.objects.create_user('staff', password='testpass', is_staff=True)
+        User.objects.create_superuser('admin', password='testpass')
+        self.user = User.objects.create_user('utente', password='testpass')
+
+    def _files(self):
+        return sorted(os.listdir(self.dir)) if os.path.isdir(self.dir) else []
+
+    def test_cpu_capture(self):
+        self.client.login(username='staff', password='testpass')
+        r = self.client.get(reverse('dashboard'), {'_profile': 'cpu'})
+        self.assertEqual(r.status_code, 200)
+        name = r['X-Profile-Capture']
+        self.assertRegex(name, rf'^dashboard__u{self.staff.pk}__\d{{8}}-\d{{6}}-\d{{6}}\.pstats$')
+        self.assertEqual(self._files(), [name])
+        stats = pstats.Stats(os.path.join(self.dir, name))
+        self.assertTrue(any(func[2] == 'dashboard' for func in stats.stats))
+
+    def test_memory_capture_from_header(self):
+        self.client.login(username='staff', password='testpass')
+        r = self.client.get(reverse('plan_list'), HTTP_X_PROFILE='memory')
+        name = r['X-Profile-Capture']
+        self.assertTrue(name.startswith(f'plan_list__u{self.staff.pk}__') and name.endswith('.txt'))
+        with open(os.path.join(self.dir, name), encoding='utf-8') as f:
+            content = f.read()
+        self.assertIn('Picco di memoria tracciata', content)
+
+    def test_ignored_for_non_staff(self):
+        self.client.login(username='utente', password='testpass')
+        r = self.client.get(reverse('dashboard'), {'_profile': 'cpu'})
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(r.has_header('X-Profile-Capture'))
+        self.assertEqual(self._files(), [])
+
+    def test_unknown_kind_ignored(self):
+        self.client.login(username='staff', password='testpass')
+        r = self.client.get(reverse('dashboard'), {'_profile': 'tutto'})
+        self.assertFalse(r.has_header('X-Profile-Capture'))
+
+    def test_capture_as_other_user(self):
+        self.client.login(username='admin', password='testpass')
+        r = self.client.get(reverse('dashboard'), {'_profile': 'cpu', '_profile_user': self.user.pk})
+        self.assertEqual(r.status_code, 200)
+        name = r['X-Profile-Capture']
+        self.assertTrue(name.startswith(f'dashboard__u{self.user.pk}__'))
+        # Allo staff solo il nome della cattura, non la pagina dell'utente.
+        self.assertEqual(r['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertContains(r, name)
+        self.assertNotContains(r, '<html')
+        self.assertEqual(self._files(), [name])
+
+    def test_other_user_only_for_get(self):
+        self.client.login(username='admin', password='testpass')
+        url = reverse('plan_list') + f'?_profile=cpu&_profile_user={self.user.pk}'
+        self.assertEqual(self.client.post(url).status_code, 405)
+        self.assertEqual(self._files(), [])
+
+    def test_other_user_missing(self):
+        self.client.login(username='admin', password='testpass')
+        for user_id in ('9999', 'x'):
+            r = self.client.get(reverse('dashboard'), {'_profile': 'cpu'}, HTTP_X_PROFILE_USER=user_id)
+            self.assertEqual(r.status_code, 404)
+        self.assertEqual(self._files(), [])
+
+    def test_other_user_only_for_superusers(self):
+        self.client.login(username='staff', password='testpass')
+        r = self.client.get(reverse('dashboard'), {'_profile': 'cpu', '_profile_user': self.user.pk})
+        self.assertEqual(r.status_code, 403)
+        self.assertEqual(self._files(), [])
+
+    def test_other_user_messages_kept_apart(self):
+        """La view profilata non consuma né aggiunge messaggi di chi profila."""
+        self.client.login(username='admin', password='testpass')
+        self.client.post(reverse('plan_create'), {'name': 'Mia', 'is_active': 'on'})
+        self.client.get(reverse('plan_list'), {'_profile': 'cpu', '_profile_user': self.user.pk})
+        r = self.client.get(reverse('plan_list'))
+        self.assertEqual([str(m) for m in r.context['messages']], ['Scheda "Mia" creata con successo.'])
+
+    def test_other_user_ignored_for_non_staff(self):
+        self.client.login(username='utente', password='testpass')
+        r = self.client.get(reverse('dashboard'), {'_profile': 'cpu', '_profile_user': self.staff.pk})
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(r.has_header('X-Profile-Capture'))
+
+    @override_settings(GYM_PROFILE_MAX_FILES=2)
+    def test_old_captures_pruned(self):
+        self.client.login(username='staff', password='testpass')
+        names = [self.client.get(reverse('dashboard'), {'_profile': 'cpu'})['X-Profile-Capture'] for _ in range(3)]
+        self.assertEqual(self._files(), sorted(names[1:]))
+
+    def test_admin_list_and_download(self):
+        self.client.login(username='staff', password='testpass')
+        cpu = self.client.get(reverse('dashboard'), {'_profile': 'cpu'})['X-Profile-Capture']
+        memory = self.client.get(reverse('plan_list'), {'_profile': 'memory'})['X-Profile-Capture']
+
+        r = self.client.get(reverse('profile_capture_list'))
+        self.assertEqual([c['name'] for c in r.context['captures']], [memory, cpu])
+        self.assertContains(r, reverse('profile_capture_download', args=[cpu]))
+
+        r = self.client.get(reverse('profile_capture_list'), {'view': 'dashboard'})
+        self.assertEqual([c['name'] for c in r.context['captures']], [cpu])
+
+        r = self.client.get(reverse('profile_capture_download', args=[cpu]))
+        self.assertIn('attachment', r['Content-Disposition'])
+        self.assertTrue(b''.join(r.streaming_content))
+
+        r = self.client.get(reverse('profile_capture_download', args=[cpu]), {'format': 'text'})
+        self.assertContains(r, 'cumulative')
+
+    def test_download_only_captures(self):
+        self.client.login(username='staff', password='testpass')
+        os.makedirs(self.dir)
+        with open(os.path.join(self.dir, 'altro.txt'), 'w') as f:
+            f.write('x')
+        self.assertEqual(self.client.get(reverse('profile_capture_download', args=['altro.txt'])).status_code, 404)
+        missing = 'dashboard__u1__20260101-000000-000000.pstats'
+        self.assertEqual(self.client.get(reverse('profile_capture_download', args=[missing])).status_code, 404)
+
+    def test_admin_pages_staff_only(self):
+        self.client.login(username='utente', password='testpass')
+        r = self.client.get(reverse('profile_capture_list'))
+        self.assertEqual(r.status_code, 302)
+        self.assertIn(reverse('admin:login'), r['Location'])
@@ -0,0 +1,326 @@
+"""
+Il numero di query di ogni view non deve crescere con i dati dell'utente.
+
+Ogni URL di gym/urls.py ha qui uno scenario, eseguito per due utenti con
+la stessa struttura di dati: il secondo ne ha SCALE volte di più (schede,
+esercizi in scheda, log, allenamenti, righe degli import e dei riordini).
+Le due richieste devono fare le stesse query, salvo un `budget` dichiarato
+nello scenario; se lo sforano il test mostra le query che si ripetono di
+più nella richiesta grande, cioè quasi sempre la query dentro un ciclo.
+
+Una view nuova senza scenario fa fallire test_every_url_has_a_scenario.
+"""
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Callable, Optional
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from gym import analytics, catalog
+from gym.caching import bump_data_version
+from gym.models import (
+    Exercise, ExerciseLog, ImportJob, MuscleGroup, PlanFolder, PlannedExercise, TrainingSummary,
+    WorkoutPlan, WorkoutSession,
+)
+from gym.ordering import spread_keys
+from gym.urls import urlpatterns
+
+SCALE = 10
+
+MUSCLES = [MuscleGroup.CHEST, MuscleGroup.BACK, MuscleGroup.LEGS, MuscleGroup.SHOULDERS]
+
+
+class Fixture:
+    """
+    Dati di un utente, proporzionali a `scale`: scale esercizi propri con
+    5·scale log ciascuno, una scheda principale con tutti gli esercizi,
+    scale cartelle (la prima con 3·scale schede), scale schede sciolte e
+    10·scale allenamenti.
+    """
+
+    def __init__(self, username, scale):
+        self.scale = scale
+        self.user = User.objects.create_user(username, password='testpass')
+        today = timezone.localdate()
+
+        self.exercises = Exercise.objects.bulk_create([
+            Exercise(
+                name=f'{username} esercizio {n}', muscle_group=MUSCLES[n % len(MUSCLES)],
+                created_by=self.user,
+            )
+            for n in range(3 * scale)
+        ])
+        self.exercise = self.exercises[0]
+        # Fuori da tutte le schede, per aggiungerlo.
+        self.spare = Exercise.objects.create(
+            name=f'{username} da aggiungere', muscle_group=MuscleGroup.ABS, created_by=self.user,
+        )
+
+        root_keys = spread_keys(2 * scale + 1)
+        self.folders = PlanFolder.objects.bulk_create([
+            PlanFolder(user=self.user, name=f'Cartella {n}', order=root_keys[n]) for n in range(scale)
+        ])
+        self.folder = self.folders[0]
+        plans = [WorkoutPlan(user=self.user, name='Principale', order=root_keys[scale])]
+        plans += [
+            WorkoutPlan(user=self.user, name=f'Sciolta {n}', order=root_keys[scale + 1 + n],
+                        is_active=n > 0)
+            for n in range(scale)
+        ]
+        for folder in self.folders:
+            size = 3 * scale if folder is self.folder else 2
+            plans += [
+                WorkoutPlan(user=self.user, name=f'{folder.name} / {n}', folder=folder, order=key)
+                for n, key in enumerate(spread_keys(size))
+            ]
+        plans = WorkoutPlan.objects.bulk_create(plans)
+        self.plan, self.loose_plan = plans[0], plans[1]
+        self.folder_plans = [p.pk for p in plans if p.folder_id == self.folder.pk]
+        self.root_items = (
+            [{'type': 'folder', 'id': f.pk} for f in self.folders]
+            + [{'type': 'plan', 'id': p.pk} for p in plans if p.folder_id is None]
+        )
+
+        planned = [
+            PlannedExercise(plan=self.plan, exercise=exercise, order=key, target_sets=3, target_reps=8)
+            for exercise, key in zip(self.exercises, spread_keys(len(self.exercises)))
+        ]
+        for plan in plans[1:]:
+            planned += [
+                PlannedExercise(plan=plan, exercise=exercise, order=key, target_sets=3, target_reps=10)
+                for exercise, key in zip(self.exercises[:2], spread_keys(2))
+            ]
+        PlannedExercise.objects.bulk_create(planned)
+        self.planned = list(self.plan.planned_exercises.order_by('order').values_list('pk', flat=True))
+
+        logs = [
+            ExerciseLog(
+                user=self.user, exercise=exercise, date=today - timedelta(days=3 * n + 1),
+                sets=3, reps=5, weight=Decimal(100 - n),
+            )
+            for exercise in self.exercises
+            for n in range(5 * scale)
+        ]
+        ExerciseLog.bulk_log(logs)
+        self.log = ExerciseLog.objects.filter(user=self.user, exercise=self.exercise).latest('date')
+
+        sessions = WorkoutSession.objects.bulk_create([
+            WorkoutSession(user=self.user, date=today - timedelta(days=2 * n + 1),
+                           plan=self.plan, plan_name=self.plan.name)
+            for n in range(10 * scale)
+        ])
+        TrainingSummary.refresh(self.user.pk, [s.date for s in sessions])
+        self.session = sessions[0]
+        bump_data_version(self.user.pk)
+
+        self.job = ImportJob.objects.create(
+            user=self.user, kind=ImportJob.Kind.SESSIONS, status=ImportJob.Status.DONE,
+            filename='allenamenti.csv', rows=10 * scale,
+            result={'ok': True, 'messages': [['success', 'Importati.']]},
+        )
+
+    def plan_csv(self):
+        rows = ['piano,Importata,', 'esercizio,gruppo,serie,ripetizioni']
+        rows += [f'{exercise.name},,3,10' for exercise in self.exercises]
+        return SimpleUploadedFile('scheda.csv', '\n'.join(rows).encode(), 'text/csv')
+
+    def session_csv(self):
+        # Date lontane dallo storico: tutte le righe sono nuove.
+        start = date(2020, 1, 1)
+        rows = ['data,scheda'] + [
+            f'{(start + timedelta(days=n)).isoformat()},{self.plan.name}' for n in range(10 * self.scale)
+        ]
+        return SimpleUploadedFile('allenamenti.csv', '\n'.join(rows).encode(), 'text/csv')
+
+
+@dataclass
+class Scenario:
+    """
+    Una richiesta a una view. `args`, `query`, `data` e `payload` ricevono
+    la Fixture dell'utente; `payload` è inviato come JSON. `budget` sono le
+    query in più ammesse alla richiesta grande.
+    """
+    method: str = 'get'
+    args: Optional[Callable] = None
+    query: Optional[Callable] = None
+    data: Optional[Callable] = None
+    payload: Optional[Callable] = None
+    budget: int = 0
+
+
+def _log_form(f):
+    return {'exercise': f.exercise.pk, 'date': timezone.localdate().isoformat(),
+            'sets': 3, 'reps': 5, 'weight': '150'}
+
+
+def _exercise_form(name):
+    return {'name': name, 'muscle_group': MuscleGroup.CHEST, 'description': ''}
+
+
+SCENARIOS = {
+    'dashboard': Scenario(),
+    'plan_list': Scenario(),
+    'plan_create': Scenario('post', data=lambda f: {'name': 'Nuova', 'is_active': 'on'}),
+    'plan_list_reorder': Scenario('post', payload=lambda f: {'order': f.root_items[::-1]}),
+    'plan_tree_move': Scenario('post', payload=lambda f: {
+        'type': 'plan', 'id': f.loose_plan.pk, 'folder': f.folder.pk, 'after': None, 'before': None,
+    }),
+    'plan_folder_create': Scenario('post', data=lambda f: {'name': 'Nuova cartella'}),
+    'plan_folder_rename': Scenario('post', args=lambda f: [f.folder.pk], data=lambda f: {'name': 'Rinominata'}),
+    'plan_folder_delete': Scenario('post', args=lambda f: [f.folder.pk]),
+    'plan_folder_reorder': Scenario('post', args=lambda f: [f.folder.pk],
+                                    payload=lambda f: {'order': f.folder_plans[::-1]}),
+    'plan_detail': Scenario(args=lambda f: [f.plan.pk]),
+    'plan_edit': Scenario('post', args=lambda f: [f.plan.pk],
+                          data=lambda f: {'name': 'Rinominata', 'is_active': 'on'}),
+    'plan_delete': Scenario('post', args=lambda f: [f.plan.pk]),
+    'plan_reorder': Scenario('post', args=lambda f: [f.plan.pk], payload=lambda f: {'order': f.planned[::-1]}),
+    'plan_exercise_move': Scenario('post', args=lambda f: [f.plan.pk], payload=lambda f: {
+        'id': f.planned[-1], 'after': None, 'before': f.planned[0],
+    }),
+    'plan_log_workout': Scenario('post', args=lambda f: [f.plan.pk], payload=lambda f: {
+        'date': timezone.localdate().isoformat(),
+        'logs': [{'exercise': ex.pk, 'sets': 3, 'reps': 5, 'weight': 150} for ex in f.exercises],
+    }),
+    'planned_exercise_add': Scenario('post', args=lambda f: [f.plan.pk], data=lambda f: {
+        'exercise': f.spare.pk, 'target_sets': 3, 'target_reps': 10,
+    }),
+    'planned_exercise_remove': Scenario('post', args=lambda f: [f.planned[0]]),
+    'log_create': Scenario('post', data=_log_form),
+    'log_delete': Scenario('post', args=lambda f: [f.log.pk]),
+    'progress_overview': Scenario(),
+    'exercise_progress': Scenario(args=lambda f: [f.exercise.pk]),
+    'exercise_history': Scenario(args=lambda f: [f.exercise.pk],
+                                 query=lambda f: {'after': f'{f.log.date.isoformat()}.{f.log.pk}'}),
+    'exercise_autocomplete': Scenario(query=lambda f: {'q': 'esercizio'}),
+    'exercise_catalog': Scenario(args=lambda f: [catalog.snapshot().digest]),
+    'exercise_list': Scenario(),
+    'exercise_create': Scenario('post', data=lambda f: _exercise_form(f'{f.user.username} nuovo')),
+    'exercise_edit': Scenario('post', args=lambda f: [f.exercise.pk],
+                              data=lambda f: _exercise_form(f'{f.exercise.name} bis')),
+    'exercise_delete': Scenario('post', args=lambda f: [f.exercise.pk]),
+    'log_edit': Scenario('post', args=lambda f: [f.log.pk], data=_log_form),
+    'plan_export': Scenario(args=lambda f: [f.plan.pk]),
+    'plan_import': Scenario('post', data=lambda f: {'csv_file': f.plan_csv()}),
+    'session_create': Scenario('post', data=lambda f: {'plan_id': f.plan.pk}),
+    'session_delete': Scenario('post', args=lambda f: [f.session.pk]),
+    'session_import': Scenario('post', data=lambda f: {'csv_file': f.session_csv()}),
+    'session_template_download': Scenario(),
+    'workout_calendar': Scenario(),
+    'session_day_detail': Scenario(args=lambda f: [f.session.date.year, f.session.date.month, f.session.date.day]),
+    'calendar_heatmap': Scenario(query=lambda f: {
+        'start': (timezone.localdate() - timedelta(days=364)).isoformat(),
+        'end': timezone.localdate().isoformat(),
+    }),
+    'import_job_detail': Scenario(args=lambda f: [f.job.pk]),
+    'import_job_status': Scenario(args=lambda f: [f.job.pk]),
+    'account_export': Scenario(),
+    'service_worker': Scenario(),
+}
+
+
+def _shape(sql):
+    """La query senza valori: le ripetizioni della stessa query si contano insieme."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'\(\?(, \?)*\)', '(...)', sql)
+
+
+def _report(name, small, large, budget):
+    """Messaggio di errore con le query che nella richiesta grande si ripetono di più."""
+    small_shapes = Counter(_shape(q['sql']) for q in small)
+    large_shapes = Counter(_shape(q['sql']) for q in large)
+    lines = [
+        f'{name}: {len(small)} query con i dati piccoli, {len(large)} con quelli '
+        f'{SCALE}x (budget {budget}). Query in più:'
+    ]
+    for shape, count in (large_shapes - small_shapes).most_common():
+        lines.append(f'  {small_shapes[shape]} -> {small_shapes[shape] + count}x  {shape}')
+    return '\n'.join(lines)
+
+
+class QueryScalingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.small = Fixture('piccolo', 1)
+        cls.large = Fixture('grande', SCALE)
+
+    def _queries(self, client, name, scenario, fixture):
+        """Query della richiesta, a cache vuota e in una transazione annullata."""
+        url = reverse(name, args=scenario.args(fixture) if scenario.args else None)
+        cache.clear()
+        catalog.forget()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                if scenario.payload is not None:
+                    response = client.post(url, json.dumps(scenario.payload(fixture)),
+                                           content_type='application/json')
+                elif scenario.method == 'post':
+                    response = client.post(url, scenario.data(fixture) if scenario.data else {})
+                else:
+                    response = client.get(url, scenario.query(fixture) if scenario.query else None)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400, f'{name}: risposta {response.status_code}')
+        return queries.captured_queries
+
+    def test_every_url_has_a_scenario(self):
+        self.assertEqual({pattern.name for pattern in urlpatterns}, set(SCENARIOS))
+
+    def test_queries_do_not_grow_with_data(self):
+        clients = {}
+        for fixture in (self.small, self.large):
+            clients[fixture] = Client()
+            clients[fixture].force_login(fixture.user)
+        for name, scenario in SCENARIOS.items():
+            with self.subTest(view=name):
+                small = self._queries(clients[self.small], name, scenario, self.small)
+                large = self._queries(clients[self.large], name, scenario, self.large)
+                self.assertLessEqual(
+                    len(large), len(small) + scenario.budget,
+                    _report(name, small, large, scenario.budget),
+                )
+
+    def test_dashboard_series_skips_old_history(self):
+        """Sparkline e tendenze leggono l'ultimo anno di log, non tutto lo storico."""
+        client = Client()
+        client.force_login(self.large.user)
+
+        def series_rows():
+            cache.clear()
+            with patch.object(analytics.StrengthSeries, 'from_rows',
+                              wraps=analytics.StrengthSeries.from_rows) as from_rows:
+                self.assertEqual(client.get(reverse('dashboard')).status_code, 200)
+            return len(from_rows.call_args.args[0])
+
+        before = series_rows()
+        oldest = ExerciseLog.objects.filter(user=self.large.user).earliest('date').date
+        ExerciseLog.bulk_log([
+            ExerciseLog(
+                user=self.large.user, exercise=exercise, date=oldest - timedelta(days=400 + n),
+                sets=3, reps=5, weight=Decimal(80),
+            )
+            for exercise in self.large.exercises
+            for n in range(20)
+        ])
+        self.assertEqual(series_rows(), before)
+
+    def test_report_shows_repeated_query(self):
+        small = [{'sql': 'SELECT * FROM gym_exerciselog WHERE id = 1'}]
+        large = [{'sql': f'SELECT * FROM gym_exerciselog WHERE id = {n}'} for n in range(3)]
+        report = _report('vista', small, large, 0)
+        self.assertIn('1 query con i dati piccoli, 3 con quelli', report)
+        self.assertIn('1 -> 3x  SELECT * FROM gym_exerciselog WHERE id = ?', report)
@@ -0,0 +1,81 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from gym import catalog
+from gym.catalog import CatalogSnapshot
+from gym.models import Exercise, MuscleGroup
+from gym.search import fold
+
+
+def make_index(*names):
+    return CatalogSnapshot(1, [(i, name, MuscleGroup.CHEST, False) for i, name in enumerate(names, start=1)]).index
+
+
+def names(results):
+    return [result['name'] for result in results]
+
+
+class ExerciseIndexTest(SimpleTestCase):
+    def test_fold(self):
+        self.assertEqual(fold('  Panca – Inclinata (Manubri) '), 'panca inclinata manubri')
+        self.assertEqual(fold('Alzate à 90°'), 'alzate a 90')
+
+    def test_accent_and_case_insensitive(self):
+        index = make_index('Crunch su fitball', 'Leg curl')
+        self.assertEqual(names(index.search('CRÙNCH')), ['Crunch su fitball'])
+
+    def test_ranking_prefix_word_start_substring(self):
+        index = make_index('Curl bilanciere', 'Leg curl', 'Scurlo immaginario', 'Curl martello')
+        self.assertEqual(
+            names(index.search('curl')),
+            ['Curl bilanciere', 'Curl martello', 'Leg curl', 'Scurlo immaginario'],
+        )
+
+    def test_all_words_must_match_in_any_order(self):
+        index = make_index('Panca piana manubri', 'Panca inclinata manubri', 'Panca piana bilanciere')
+        self.assertEqual(names(index.search('manubri panca')), ['Panca inclinata manubri', 'Panca piana manubri'])
+        self.assertEqual(names(index.search('pan incl')), ['Panca inclinata manubri'])
+
+    def test_substring_inside_word(self):
+        index = make_index('Squat', 'Tasquat')
+        self.assertEqual(names(index.search('squa')), ['Squat', 'Tasquat'])
+        self.assertEqual(names(index.search('qatu')), [])
+
+    def test_two_letter_query(self):
+        index = make_index('Dip', 'Leg press', 'Deadlift')
+        self.assertEqual(names(index.search('di')), ['Dip'])
+
+    def test_limit(self):
+        index = make_index(*(f'Esercizio {n:02}' for n in range(30)))
+        self.assertEqual(len(index.search('eser', limit=10)), 10)
+
+    def test_result_fields(self):
+        index = CatalogSnapshot(1, [(7, 'Trazioni', MuscleGroup.BACK, True)]).index
+        self.assertEqual(
+            index.search('traz'),
+            [{'id': 7, 'name': 'Trazioni', 'muscle_group': 'Schiena', 'is_bodyweight': True}],
+        )
+
+
+class AutocompleteViewTest(TestCase):
+    def setUp(self):
+        catalog.forget()
+        User.objects.create_user('ac2', password='testpass')
+        self.client.login(username='ac2', password='testpass')
+        Exercise.objects.create(name='Alzate laterali', muscle_group=MuscleGroup.SHOULDERS)
+        Exercise.objects.create(name='Military press', muscle_group=MuscleGroup.SHOULDERS)
+
+    def test_json_format(self):
+        r = self.client.get(reverse('exercise_autocomplete'), {'q': 'àlza'})
+        result = r.json()['results'][0]
+        self.assertEqual(result['name'], 'Alzate laterali')
+        self.assertEqual(result['muscle_group'], MuscleGroup.SHOULDERS.label)
+        self.assertIs(result['is_bodyweight'], False)
+
+    def test_no_catalogue_query_when_warm(self):
+        self.client.get(reverse('exercise_autocomplete'), {'q': 'press'})
+        # Restano solo sessione e utente.
+        with self.assertNumQueries(2):
+            r = self.client.get(reverse('exercise_autocomplete'), {'q': 'press'})
+        self.assertEqual(names(r.json()['results']), ['Military press'])
@@ -1,21 +1,25 @@
 import io
 import json
+import re
 from datetime import date, timedelta
 from decimal import Decimal
 from unittest.mock import patch
 
 from django.contrib.messages.storage.cookie import CookieStorage
 from django.http import HttpResponse
-from django.test import TestCase, Client, RequestFactory
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from django.utils import timezone
 
 from gym.models import (
     Exercise, WorkoutPlan, PlannedExercise, ExerciseLog,
-    MuscleGroup, PlanFolder, WorkoutSession,
+    MuscleGroup, PlanFolder, WorkoutSession, TrainingSummary,
 )
+from gym.caching import data_version
 from gym.views import log_create as log_create_view, dashboard as dashboard_view
 
 
@@ -27,10 +31,10 @@ def make_user(username='testuser', password='testpass'):
 def make_exercise(name='Squat', muscle=MuscleGroup.LEGS, is_bodyweight=False):
     return Exercise.objects.create(name=name, muscle_group=muscle, is_bodyweight=is_bodyweight)
 
-def make_plan(user, name='Test Plan', is_active=True, order=0, folder=None):
+def make_plan(user, name='Test Plan', is_active=True, order='', folder=None):
     return WorkoutPlan.objects.create(user=user, name=name, is_active=is_active, order=order, folder=folder)
 
-def make_folder(user, name='Cartella Test', order=0):
+def make_folder(user, name='Cartella Test', order=''):
     return PlanFolder.objects.create(user=user, name=name, order=order)
 
 def make_log(user, exercise, weight=100, reps=5, sets=3, log_date=None):
@@ -181,6 +185,165 @@ class DashboardTest(TestCase):
         self.assertNotIn('back', keys)
 
 
+class UserDataCacheTest(TestCase):
+    """Le pagine calcolate si servono dalla cache finché i dati non cambiano."""
+
+    def setUp(self):
+        self.user = make_user('cacheuser')
+        self.client.login(username='cacheuser', password='testpass')
+        self.exercise = make_exercise('Panca Cache', MuscleGroup.CHEST)
+        make_log(self.user, self.exercise, weight=80, log_date=date.today() - timedelta(days=3))
+        make_log(self.user, self.exercise, weight=90)
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        return len(ctx.captured_queries)
+
+    def test_unchanged_dashboard_skips_heavy_queries(self):
+        url = reverse('dashboard')
+        cold = self._queries(url)
+        warm = self._queries(url)
+        self.assertLess(warm, cold)
+
+    def test_new_log_invalidates_progress_overview(self):
+        url = reverse('progress_overview')
+        self.client.get(url)
+        make_log(self.user, make_exercise('Squat Cache', MuscleGroup.LEGS))
+        r = self.client.get(url)
+        self.assertEqual(len(r.context['exercises']), 2)
+
+    def test_edited_log_invalidates_exercise_progress(self):
+        url = reverse('exercise_progress', kwargs={'exercise_id': self.exercise.pk})
+        self.client.get(url)
+        log = ExerciseLog.objects.filter(user=self.user).latest('id')
+        log.weight = Decimal('150')
+        log.save()
+        r = self.client.get(url)
+        self.assertEqual(r.context['best_one_rm'], Decimal('175'))  # Epley, 5 reps
+
+    def test_cache_is_per_user(self):
+        url = reverse('progress_overview')
+        self.client.get(url)
+        make_user('cacheother')
+        self.client.login(username='cacheother', password='testpass')
+        r = self.client.get(url)
+        self.assertEqual(r.context['exercises'], [])
+
+    def test_reorder_bumps_version(self):
+        plan = make_plan(self.user)
+        before = data_version(self.user.pk)
+        self.client.post(
+            reverse('plan_list_reorder'),
+            json.dumps({'order': [{'type': 'plan', 'id': plan.pk}]}),
+            content_type='application/json',
+        )
+        self.assertGreater(data_version(self.user.pk), before)
+
+    def test_session_import_bumps_version(self):
+        before = data_version(self.user.pk)
+        csv_file = io.BytesIO(b'2026-01-10,Push')
+        csv_file.name = 'sessioni.csv'
+        self.client.post(reverse('session_import'), {'csv_file': csv_file})
+        self.assertGreater(data_version(self.user.pk), before)
+
+    def test_renaming_exercise_invalidates_everyone(self):
+        url = reverse('progress_overview')
+        self.client.get(url)
+        self.exercise.name = 'Panca Rinominata'
+        self.exercise.save()
+        r = self.client.get(url)
+        self.assertEqual(r.context['exercises'][0]['exercise'].name, 'Panca Rinominata')
+
+
+class ConditionalGetTest(TestCase):
+    """Le pagine per utente si rivalidano con ETag/Last-Modified (304)."""
+
+    def setUp(self):
+        self.user = make_user('etaguser')
+        self.client.login(username='etaguser', password='testpass')
+        self.exercise = make_exercise('Panca ETag', MuscleGroup.CHEST)
+        make_log(self.user, self.exercise, weight=80)
+        self.plan = make_plan(self.user)
+        # Il primo accesso imposta il cookie CSRF, che fa parte dell'ETag.
+        self.client.get(reverse('plan_list'))
+
+    def _urls(self):
+        return [
+            reverse('dashboard'),
+            reverse('plan_list'),
+            reverse('plan_detail', args=[self.plan.pk]),
+            reverse('progress_overview'),
+            reverse('exercise_progress', kwargs={'exercise_id': self.exercise.pk}),
+            reverse('workout_calendar'),
+            reverse('exercise_list'),
+        ]
+
+    def _revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_return_304(self):
+        for url in self._urls():
+            with self.subTest(url=url):
+                r = self.client.get(url)
+                self.assertEqual(r.status_code, 200)
+                self.assertIn('Last-Modified', r)
+                self.assertIn('private', r['Cache-Control'])
+                self.assertIn('no-cache', r['Cache-Control'])
+                self.assertEqual(self._revalidate(url, r['ETag']).status_code, 304)
+
+    def test_304_runs_only_the_version_query(self):
+        url = reverse('dashboard')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            r = self._revalidate(url, etag)
+        self.assertEqual(r.status_code, 304)
+        # Sessione, utente e versione dati: nessuna query della pagina.
+        self.assertLessEqual(len(ctx.captured_queries), 3)
+
+    def test_write_changes_etag(self):
+        url = reverse('progress_overview')
+        etag = self.client.get(url)['ETag']
+        make_log(self.user, self.exercise, weight=100)
+        self.assertEqual(self._revalidate(url, etag).status_code, 200)
+
+    def test_folder_write_changes_plan_list_etag(self):
+        url = reverse('plan_list')
+        etag = self.client.get(url)['ETag']
+        PlanFolder.objects.create(user=self.user, name='Nuova')
+        self.assertEqual(self._revalidate(url, etag).status_code, 200)
+
+    def test_query_string_changes_etag(self):
+        url = reverse('exercise_list')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'muscle': 'chest'})['ETag'], etag)
+
+    def test_etag_is_per_user(self):
+        url = reverse('plan_list')
+        etag = self.client.get(url)['ETag']
+        make_user('etagother')
+        self.client.login(username='etagother', password='testpass')
+        self.assertEqual(self._revalidate(url, etag).status_code, 200)
+
+    def test_pending_message_forces_full_page(self):
+        url = reverse('workout_calendar')
+        etag = self.client.get(url)['ETag']
+        # Errore senza scritture: il messaggio deve comparire comunque.
+        r = self.client.post(reverse('session_create'), {
+            'free_name': 'Cardio', 'date': 'boh', 'next': 'calendar',
+        })
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, 'Data non valida')
+
+    def test_day_change_changes_etag(self):
+        url = reverse('plan_detail', args=[self.plan.pk])
+        etag = self.client.get(url)['ETag']
+        tomorrow = timezone.localtime() + timedelta(days=1)
+        with patch('django.utils.timezone.localtime', return_value=tomorrow):
+            self.assertEqual(self._revalidate(url, etag).status_code, 200)
+
+
 # ─── Log CRUD ─────────────────────────────────────────────────────────────────
 
 class LogCreateTest(TestCase):
@@ -245,7 +408,7 @@ class LogCreateTest(TestCase):
     def test_prefills_sets_reps_from_plan(self):
         plan = make_plan(self.user)
         PlannedExercise.objects.create(
-            plan=plan, exercise=self.exercise, target_sets=4, target_reps=6, order=0
+            plan=plan, exercise=self.exercise, target_sets=4, target_reps=6
         )
         initial = self._get_log_form_initial(
             {'exercise': self.exercise.pk, 'from': 'plan', 'plan': plan.pk}
@@ -256,12 +419,24 @@ class LogCreateTest(TestCase):
     def test_prefill_not_applied_without_plan_context(self):
         plan = make_plan(self.user)
         PlannedExercise.objects.create(
-            plan=plan, exercise=self.exercise, target_sets=4, target_reps=6, order=0
+            plan=plan, exercise=self.exercise, target_sets=4, target_reps=6
         )
         initial = self._get_log_form_initial({'exercise': self.exercise.pk})
         self.assertNotIn('sets', initial)
         self.assertNotIn('reps', initial)
 
+    def test_new_record_message(self):
+        self._post(weight='80.00')
+        r = self._post(weight='90.00')
+        msgs = [str(m) for m in r.wsgi_request._messages]
+        self.assertTrue(any(m.startswith('Nuovo record!') for m in msgs))
+
+    def test_no_record_message_without_improvement(self):
+        self._post(weight='90.00')
+        r = self._post(weight='80.00')
+        msgs = [str(m) for m in r.wsgi_request._messages]
+        self.assertFalse(any(m.startswith('Nuovo record!') for m in msgs))
+
     def test_historic_immutability(self):
         self._post(weight='80.00')
         self._post(weight='85.00')
@@ -353,6 +528,16 @@ class ProgressViewTest(TestCase):
         )
         self.assertEqual(r.context['log_count'], 1)
 
+    def test_chart_data_downsampled_for_long_history(self):
+        start = date.today() - timedelta(days=400)
+        for i in range(40):
+            make_log(self.user, self.exercise, weight=80 + i % 5, log_date=start + timedelta(days=i))
+        url = reverse('exercise_progress', kwargs={'exercise_id': self.exercise.pk})
+        with self.settings(GYM_CHART_MAX_POINTS={'progress': 10}):
+            r = self.client.get(url)
+        self.assertLessEqual(len(json.loads(r.context['chart_data'])), 10)
+        self.assertEqual(r.context['log_count'], 40)
+
     def test_period_filter_all(self):
         from datetime import timedelta
         old_date = date.today() - timedelta(days=400)
@@ -364,6 +549,71 @@ class ProgressViewTest(TestCase):
         self.assertEqual(r.context['log_count'], 2)
 
 
+class ProgressHistoryPaginationTest(TestCase):
+    """Lo storico in pagina è limitato, il resto arriva a pagine via JSON."""
+
+    def setUp(self):
+        self.user = make_user('histuser')
+        self.client.login(username='histuser', password='testpass')
+        self.exercise = make_exercise('Rematore Storico', MuscleGroup.BACK)
+        start = date.today() - timedelta(days=100)
+        # Due log per giorno: il cursore deve distinguere anche per id.
+        self.logs = [
+            make_log(self.user, self.exercise, weight=60 + i, log_date=start + timedelta(days=i // 2))
+            for i in range(70)
+        ]
+        self.url = reverse('exercise_progress', kwargs={'exercise_id': self.exercise.pk})
+        self.history_url = reverse('exercise_history', kwargs={'exercise_id': self.exercise.pk})
+
+    def test_first_page_is_bounded(self):
+        r = self.client.get(self.url)
+        self.assertEqual(len(r.context['logs']), 30)
+        self.assertEqual(r.context['log_count'], 70)
+        self.assertIsNotNone(r.context['next_cursor'])
+
+    def test_load_more_walks_whole_history_without_gaps(self):
+        r = self.client.get(self.url)
+        seen = [log.pk for log in r.context['logs']]
+        cursor = r.context['next_cursor']
+        while cursor:
+            data = self.client.get(self.history_url, {'after': cursor}).json()
+            seen += [int(pk) for pk in re.findall(r'/log/(\d+)/delete/', data['html'])]
+            cursor = data['next_cursor']
+        expected = [log.pk for log in sorted(self.logs, key=lambda l: (l.date, l.pk), reverse=True)]
+        self.assertEqual(seen, expected)
+
+    def test_history_respects_period(self):
+        cutoff = date.today() - timedelta(days=90)
+        in_period = sorted(
+            (log for log in self.logs if log.date >= cutoff),
+            key=lambda l: (l.date, l.pk), reverse=True,
+        )
+        self.assertLess(len(in_period), len(self.logs))
+        data = self.client.get(self.history_url, {'after': '2100-01-01.0', 'period': '3m'}).json()
+        pks = [int(pk) for pk in re.findall(r'/log/(\d+)/delete/', data['html'])]
+        self.assertEqual(pks, [log.pk for log in in_period[:30]])
+
+    def test_invalid_cursor_rejected(self):
+        r = self.client.get(self.history_url, {'after': 'ieri'})
+        self.assertEqual(r.status_code, 400)
+
+    def test_other_users_logs_not_returned(self):
+        other = make_user('histother')
+        make_log(other, self.exercise, log_date=date.today())
+        data = self.client.get(self.history_url, {'after': '2100-01-01.0'}).json()
+        self.assertEqual(len(re.findall(r'/log/(\d+)/delete/', data['html'])), 30)
+
+    def test_query_count_independent_of_history_length(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        before = len(ctx.captured_queries)
+        for i in range(50):
+            make_log(self.user, self.exercise, log_date=date.today() - timedelta(days=i))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertEqual(len(ctx.captured_queries), before)
+
+
 class BodyweightProgressViewTest(TestCase):
     def setUp(self):
         self.user = make_user('bwprog')
@@ -421,6 +671,29 @@ class ProgressOverviewTest(TestCase):
         self.assertEqual(item['best_reps'], 18)
         self.assertIsNone(item['best_one_rm'])
 
+    def test_shows_latest_log(self):
+        ex = make_exercise('Stacco Overview', MuscleGroup.BACK)
+        make_log(self.user, ex, weight=140, log_date=date.today())
+        make_log(self.user, ex, weight=100, log_date=date.today() - timedelta(days=7))
+        r = self.client.get(reverse('progress_overview'))
+        item = r.context['exercises'][0]
+        self.assertEqual(item['last_log'].weight, Decimal('140'))
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('progress_overview'))
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_exercises(self):
+        """Regressione N+1: una pagina con 20 esercizi costa quanto una con 1."""
+        make_log(self.user, make_exercise('Esercizio 0', MuscleGroup.LEGS))
+        baseline = self._count_queries()
+        for i in range(1, 20):
+            ex = make_exercise(f'Esercizio {i}', MuscleGroup.CHEST)
+            make_log(self.user, ex, weight=80)
+            make_log(self.user, ex, weight=90)
+        self.assertEqual(self._count_queries(), baseline)
+
 
 # ─── Workout Plans ────────────────────────────────────────────────────────────
 
@@ -485,9 +758,9 @@ class PlanReorderTest(TestCase):
         ex1 = make_exercise('Ex1', MuscleGroup.CHEST)
         ex2 = make_exercise('Ex2', MuscleGroup.BACK)
         ex3 = make_exercise('Ex3', MuscleGroup.LEGS)
-        self.pe1 = PlannedExercise.objects.create(plan=self.plan, exercise=ex1, target_sets=3, target_reps=8, order=0)
-        self.pe2 = PlannedExercise.objects.create(plan=self.plan, exercise=ex2, target_sets=3, target_reps=8, order=1)
-        self.pe3 = PlannedExercise.objects.create(plan=self.plan, exercise=ex3, target_sets=3, target_reps=8, order=2)
+        self.pe1 = PlannedExercise.objects.create(plan=self.plan, exercise=ex1, target_sets=3, target_reps=8, order='a')
+        self.pe2 = PlannedExercise.objects.create(plan=self.plan, exercise=ex2, target_sets=3, target_reps=8, order='b')
+        self.pe3 = PlannedExercise.objects.create(plan=self.plan, exercise=ex3, target_sets=3, target_reps=8, order='c')
 
     def _reorder(self, order):
         return self.client.post(
@@ -502,8 +775,8 @@ class PlanReorderTest(TestCase):
 
     def test_reorder_updates_order(self):
         self._reorder([self.pe3.pk, self.pe1.pk, self.pe2.pk])
-        self.pe3.refresh_from_db()
-        self.assertEqual(self.pe3.order, 0)
+        ordered = list(self.plan.planned_exercises.values_list('pk', flat=True))
+        self.assertEqual(ordered, [self.pe3.pk, self.pe1.pk, self.pe2.pk])
 
     def test_invalid_ids_rejected(self):
         r = self._reorder([self.pe1.pk, self.pe2.pk, 9999])
@@ -545,9 +818,9 @@ class PlanListRootReorderTest(TestCase):
 
     def test_reorder_persists_after_reload(self):
         """Il caso concreto del bug: l'ordine deve sopravvivere a un nuovo GET."""
-        p1 = make_plan(self.user, 'Prima', is_active=True, order=0)
-        p2 = make_plan(self.user, 'Archiviata', is_active=False, order=1)
-        p3 = make_plan(self.user, 'Seconda', is_active=True, order=2)
+        p1 = make_plan(self.user, 'Prima', is_active=True, order='a')
+        p2 = make_plan(self.user, 'Archiviata', is_active=False, order='b')
+        p3 = make_plan(self.user, 'Seconda', is_active=True, order='c')
         self._reorder([{'type': 'plan', 'id': p3.pk}, {'type': 'plan', 'id': p1.pk}])
         r = self.client.get(reverse('plan_list'))
         ordered_ids = [n['obj'].pk for n in r.context['root_nodes']]
@@ -563,8 +836,7 @@ class PlanListRootReorderTest(TestCase):
         self.assertEqual(r.status_code, 200)
         plan.refresh_from_db()
         folder.refresh_from_db()
-        self.assertEqual(plan.order, 0)
-        self.assertEqual(folder.order, 1)
+        self.assertLess(plan.order, folder.order)
 
     def test_plan_included_here_gets_removed_from_folder(self):
         """Trascinare una scheda dalla cartella alla radice: folder -> None."""
@@ -617,13 +889,12 @@ class PlanFolderReorderTest(TestCase):
         self.assertEqual(plan.folder, self.folder)
 
     def test_reorders_plans_already_inside(self):
-        p1 = make_plan(self.user, 'Uno', is_active=True, folder=self.folder, order=0)
-        p2 = make_plan(self.user, 'Due', is_active=True, folder=self.folder, order=1)
+        p1 = make_plan(self.user, 'Uno', is_active=True, folder=self.folder, order='a')
+        p2 = make_plan(self.user, 'Due', is_active=True, folder=self.folder, order='b')
         self._reorder(self.folder.pk, [p2.pk, p1.pk])
         p1.refresh_from_db()
         p2.refresh_from_db()
-        self.assertEqual(p2.order, 0)
-        self.assertEqual(p1.order, 1)
+        self.assertLess(p2.order, p1.order)
 
     def test_invalid_folder_404(self):
         r = self._reorder(9999, [])
@@ -642,6 +913,148 @@ class PlanFolderReorderTest(TestCase):
         self.assertEqual(r.status_code, 400)
 
 
+class PlanExerciseMoveTest(TestCase):
+    """plan_exercise_move — drag & drop di un esercizio: si scrive solo la riga spostata."""
+
+    def setUp(self):
+        self.user = make_user('exmove')
+        self.client.login(username='exmove', password='testpass')
+        self.plan = make_plan(self.user)
+        self.pes = [
+            PlannedExercise.objects.create(
+                plan=self.plan, exercise=make_exercise(f'Move {i}', MuscleGroup.CHEST),
+                target_sets=3, target_reps=8,
+            )
+            for i in range(3)
+        ]
+
+    def _move(self, payload, plan=None):
+        return self.client.post(
+            reverse('plan_exercise_move', kwargs={'pk': (plan or self.plan).pk}),
+            data=json.dumps(payload),
+            content_type='application/json',
+        )
+
+    def _ordered(self):
+        return list(self.plan.planned_exercises.values_list('pk', flat=True))
+
+    def test_move_between_neighbours(self):
+        pe1, pe2, pe3 = self.pes
+        r = self._move({'id': pe3.pk, 'after': pe1.pk, 'before': pe2.pk})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self._ordered(), [pe1.pk, pe3.pk, pe2.pk])
+
+    def test_move_to_start(self):
+        pe1, pe2, pe3 = self.pes
+        self._move({'id': pe2.pk, 'after': None, 'before': pe1.pk})
+        self.assertEqual(self._ordered(), [pe2.pk, pe1.pk, pe3.pk])
+
+    def test_single_update_query(self):
+        pe1, pe2, pe3 = self.pes
+        with CaptureQueriesContext(connection) as ctx:
+            self._move({'id': pe1.pk, 'after': pe3.pk, 'before': None})
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "gym_plannedexercise"')]
+        self.assertEqual(len(updates), 1)
+
+    def test_bumps_version(self):
+        before = data_version(self.user.pk)
+        self._move({'id': self.pes[0].pk, 'after': self.pes[2].pk, 'before': None})
+        self.assertGreater(data_version(self.user.pk), before)
+
+    def test_reference_from_other_plan_rejected(self):
+        other_plan = make_plan(self.user, 'Altra')
+        foreign = PlannedExercise.objects.create(
+            plan=other_plan, exercise=self.pes[0].exercise, target_sets=3, target_reps=8,
+        )
+        r = self._move({'id': self.pes[0].pk, 'after': foreign.pk, 'before': None})
+        self.assertEqual(r.status_code, 400)
+
+    def test_invalid_payload_rejected(self):
+        r = self._move({'id': str(self.pes[0].pk), 'after': None, 'before': None})
+        self.assertEqual(r.status_code, 400)
+
+    def test_other_user_plan_404(self):
+        make_user('exmoveother')
+        self.client.login(username='exmoveother', password='testpass')
+        r = self._move({'id': self.pes[0].pk, 'after': None, 'before': None})
+        self.assertEqual(r.status_code, 404)
+
+
+class PlanTreeMoveTest(TestCase):
+    """plan_tree_move — drag & drop di schede e cartelle nella lista schede."""
+
+    def setUp(self):
+        self.user = make_user('treemove')
+        self.client.login(username='treemove', password='testpass')
+        self.folder = make_folder(self.user, 'Cartella')
+        self.p1 = make_plan(self.user, 'Uno')
+        self.p2 = make_plan(self.user, 'Due')
+
+    def _move(self, payload):
+        return self.client.post(
+            reverse('plan_tree_move'),
+            data=json.dumps(payload),
+            content_type='application/json',
+        )
+
+    def _root(self):
+        r = self.client.get(reverse('plan_list'))
+        return [(n['type'], n['obj'].pk) for n in r.context['root_nodes']]
+
+    def test_move_plan_before_folder(self):
+        r = self._move({
+            'type': 'plan', 'id': self.p2.pk, 'folder': None,
+            'after': None, 'before': {'type': 'folder', 'id': self.folder.pk},
+        })
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self._root()[0], ('plan', self.p2.pk))
+
+    def test_move_plan_into_and_out_of_folder(self):
+        self._move({'type': 'plan', 'id': self.p1.pk, 'folder': self.folder.pk, 'after': None, 'before': None})
+        self.p1.refresh_from_db()
+        self.assertEqual(self.p1.folder, self.folder)
+        self._move({
+            'type': 'plan', 'id': self.p1.pk, 'folder': None,
+            'after': {'type': 'plan', 'id': self.p2.pk}, 'before': None,
+        })
+        self.p1.refresh_from_db()
+        self.assertIsNone(self.p1.folder)
+        self.assertEqual(self._root()[-1], ('plan', self.p1.pk))
+
+    def test_folder_cannot_go_into_folder(self):
+        other = make_folder(self.user, 'Altra')
+        r = self._move({'type': 'folder', 'id': other.pk, 'folder': self.folder.pk, 'after': None, 'before': None})
+        self.assertEqual(r.status_code, 400)
+
+    def test_reference_outside_destination_rejected(self):
+        """`after` deve stare nella cartella di destinazione, non alla radice."""
+        r = self._move({
+            'type': 'plan', 'id': self.p1.pk, 'folder': self.folder.pk,
+            'after': {'type': 'plan', 'id': self.p2.pk}, 'before': None,
+        })
+        self.assertEqual(r.status_code, 400)
+
+    def test_other_users_items_rejected(self):
+        other = make_user('treemoveother')
+        other_plan = make_plan(other, 'Non mia')
+        r = self._move({'type': 'plan', 'id': other_plan.pk, 'folder': None, 'after': None, 'before': None})
+        self.assertEqual(r.status_code, 400)
+        r = self._move({
+            'type': 'plan', 'id': self.p1.pk, 'folder': None,
+            'after': {'type': 'plan', 'id': other_plan.pk}, 'before': None,
+        })
+        self.assertEqual(r.status_code, 400)
+
+    def test_invalid_type_rejected(self):
+        r = self._move({'type': 'exercise', 'id': self.p1.pk, 'folder': None})
+        self.assertEqual(r.status_code, 400)
+
+    def test_bumps_version(self):
+        before = data_version(self.user.pk)
+        self._move({'type': 'folder', 'id': self.folder.pk, 'folder': None, 'after': None, 'before': None})
+        self.assertGreater(data_version(self.user.pk), before)
+
+
 class PlanFolderCrudTest(TestCase):
     def setUp(self):
         self.user = make_user('foldercrud')
@@ -693,7 +1106,7 @@ class PlanExportTest(TestCase):
         self.ex = make_exercise('Panca', MuscleGroup.CHEST)
         PlannedExercise.objects.create(
             plan=self.plan, exercise=self.ex,
-            target_sets=4, target_reps=8, order=0
+            target_sets=4, target_reps=8
         )
 
     def _rows(self):
@@ -738,12 +1151,20 @@ class PlanExportTest(TestCase):
         bw_ex = make_exercise('Trazioni Export', MuscleGroup.BACK, is_bodyweight=True)
         PlannedExercise.objects.create(
             plan=self.plan, exercise=bw_ex,
-            target_sets=3, target_reps=10, order=1
+            target_sets=3, target_reps=10
         )
         rows = self._rows()
         bw_row = next(row for row in rows[2:] if row[0] == 'Trazioni Export')
         self.assertEqual(bw_row[-1], 'si')
 
+    def test_export_order_column_is_position(self):
+        PlannedExercise.objects.create(
+            plan=self.plan, exercise=make_exercise('Rematore', MuscleGroup.BACK),
+            target_sets=3, target_reps=10,
+        )
+        rows = self._rows()
+        self.assertEqual([(row[0], row[4]) for row in rows[2:]], [('Panca', '1'), ('Rematore', '2')])
+
 
 class PlanImportTest(TestCase):
     def setUp(self):
@@ -830,6 +1251,61 @@ class PlanImportTest(TestCase):
         exercise = Exercise.objects.get(name='Trazioni Esistente')
         self.assertTrue(exercise.is_bodyweight)
 
+    def test_import_follows_order_column(self):
+        csv_file = self._make_csv(rows=[
+            ['Stacco', 'back', '3', '5', '2', ''],
+            ['Squat', 'legs', '4', '6', '1', ''],
+            ['Affondi', 'legs', '3', '10', '2', ''],
+        ])
+        csv_file.name = 'test.csv'
+        self.client.post(reverse('plan_import'), {'csv_file': csv_file})
+        plan = WorkoutPlan.objects.get(user=self.user)
+        names = list(plan.planned_exercises.values_list('exercise__name', flat=True))
+        self.assertEqual(names, ['Squat', 'Stacco', 'Affondi'])
+
+    def test_import_query_count_does_not_grow_with_rows(self):
+        for i in range(30):
+            make_exercise(f'Esistente {i}', MuscleGroup.CHEST)
+        rows = [[f'Esistente {i}', 'chest', '3', '10', str(i), ''] for i in range(30)]
+        rows += [[f'Nuovo {i}', 'back', '4', '8', str(30 + i), ''] for i in range(30)]
+        csv_file = self._make_csv(rows=rows)
+        csv_file.name = 'test.csv'
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.post(reverse('plan_import'), {'csv_file': csv_file})
+        self.assertEqual(r.status_code, 302)
+        # Sessione, scheda, versione dati, una lettura e una scrittura per
+        # gli esercizi: nessuna query per riga.
+        self.assertLessEqual(len(ctx.captured_queries), 20)
+        plan = WorkoutPlan.objects.get(user=self.user)
+        names = list(plan.planned_exercises.values_list('exercise__name', flat=True))
+        self.assertEqual(names, [row[0] for row in rows])
+
+    def test_import_reports_all_row_errors_and_writes_nothing(self):
+        csv_file = self._make_csv(rows=[
+            ['Squat', 'legs', 'quattro', '6', '0', ''],
+            ['Panca', 'chest', '4', '8', '1', ''],
+            ['Panca', 'chest', '3', '8', '2', ''],
+            ['Curl', 'bicipiti', '3', '12', '3', ''],
+            ['Rematore', 'back', '3'],
+        ])
+        csv_file.name = 'test.csv'
+        r = self.client.post(reverse('plan_import'), {'csv_file': csv_file})
+        texts = [str(m) for m in r.context['messages']]
+        self.assertIn('4 righe da correggere', texts[0])
+        for line in (3, 5, 6, 7):
+            self.assertTrue(any(t.startswith(f'Riga {line}') for t in texts), line)
+        self.assertFalse(WorkoutPlan.objects.filter(user=self.user).exists())
+        self.assertFalse(Exercise.objects.filter(name='Panca').exists())
+
+    def test_import_new_exercise_bumps_everyones_version(self):
+        other = make_user('importother')
+        make_plan(other, 'Altra')
+        before = data_version(other.pk)
+        csv_file = self._make_csv(rows=[['Esercizio Nuovo', 'chest', '3', '10', '0', '']])
+        csv_file.name = 'test.csv'
+        self.client.post(reverse('plan_import'), {'csv_file': csv_file})
+        self.assertGreater(data_version(other.pk), before)
+
 
 # ─── Autocomplete ─────────────────────────────────────────────────────────────
 
@@ -980,7 +1456,7 @@ class SessionCreateTest(TestCase):
         self.assertEqual(r.status_code, 302)
 
     def test_two_plans_same_day_creates_two_sessions(self):
-        other_plan = make_plan(self.user, 'Full Body', order=1)
+        other_plan = make_plan(self.user, 'Full Body')
         self.client.post(reverse('session_create'), {'plan_id': self.plan.pk})
         self.client.post(reverse('session_create'), {'plan_id': other_plan.pk})
         self.assertEqual(WorkoutSession.objects.filter(user=self.user).count(), 2)
@@ -1067,7 +1543,7 @@ class PlanDetailSessionStateTest(TestCase):
         self.assertFalse(r.context['session_logged_today'])
 
     def test_other_plan_session_does_not_set_flag(self):
-        other_plan = make_plan(self.user, 'Full Body', order=1)
+        other_plan = make_plan(self.user, 'Full Body')
         WorkoutSession.objects.create(
             user=self.user, date=timezone.localdate(), plan=other_plan
         )
@@ -1075,6 +1551,146 @@ class PlanDetailSessionStateTest(TestCase):
         self.assertFalse(r.context['session_logged_today'])
 
 
+class PlanLogWorkoutTest(TestCase):
+    """Registrazione in blocco di tutti gli esercizi di una scheda."""
+
+    def setUp(self):
+        self.user = make_user('bulklog')
+        self.client.login(username='bulklog', password='testpass')
+        self.plan = make_plan(self.user, 'Forza')
+        self.squat = make_exercise('Squat')
+        self.bench = make_exercise('Panca', MuscleGroup.CHEST)
+        self.pullup = make_exercise('Trazioni', MuscleGroup.BACK, is_bodyweight=True)
+        for order, ex in zip('bcd', (self.squat, self.bench, self.pullup)):
+            PlannedExercise.objects.create(plan=self.plan, exercise=ex, target_sets=4, target_reps=6, order=order)
+        self.url = reverse('plan_log_workout', kwargs={'pk': self.plan.pk})
+
+    def _post(self, rows, log_date=None):
+        data = {
+            'date': (log_date or timezone.localdate()).isoformat(),
+            'ex-TOTAL_FORMS': len(rows), 'ex-INITIAL_FORMS': 0,
+        }
+        for i, row in enumerate(rows):
+            data.update({f'ex-{i}-{key}': value for key, value in row.items()})
+        return self.client.post(self.url, data)
+
+    def _post_json(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_get_prefills_targets_and_last_weight(self):
+        make_log(self.user, self.squat, weight=90, log_date=timezone.localdate() - timedelta(days=3))
+        r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        initial = r.context['formset'].initial
+        self.assertEqual([row['exercise'] for row in initial], [self.squat.pk, self.bench.pk, self.pullup.pk])
+        self.assertEqual((initial[0]['sets'], initial[0]['reps']), (4, 6))
+        self.assertEqual(initial[0]['weight'], Decimal('90'))
+        self.assertIsNone(initial[1]['weight'])
+
+    def test_form_post_logs_done_rows(self):
+        r = self._post([
+            {'exercise': self.squat.pk, 'done': 'on', 'sets': 4, 'reps': 6, 'weight': '100'},
+            {'exercise': self.bench.pk, 'sets': 4, 'reps': 6, 'weight': '60'},
+            {'exercise': self.pullup.pk, 'done': 'on', 'sets': 3, 'reps': 10, 'weight': '20'},
+        ])
+        self.assertRedirects(r, reverse('plan_detail', kwargs={'pk': self.plan.pk}))
+        logs = {log.exercise_id: log for log in ExerciseLog.objects.filter(user=self.user)}
+        self.assertEqual(set(logs), {self.squat.pk, self.pullup.pk})
+        self.assertEqual(logs[self.squat.pk].one_rm, Decimal('120.00'))
+        self.assertIsNone(logs[self.pullup.pk].weight)
+        session = WorkoutSession.objects.get(user=self.user)
+        self.assertEqual((session.plan, session.plan_name, session.is_free), (self.plan, 'Forza', False))
+
+    def test_invalid_row_writes_nothing(self):
+        r = self._post([
+            {'exercise': self.squat.pk, 'done': 'on', 'sets': 4, 'reps': 6, 'weight': '100'},
+            {'exercise': self.bench.pk, 'done': 'on', 'sets': 4, 'reps': 6},
+        ])
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.context['formset'].errors[1])
+        self.assertFalse(ExerciseLog.objects.exists())
+        self.assertFalse(WorkoutSession.objects.exists())
+
+    def test_nothing_done_is_an_error(self):
+        r = self._post([{'exercise': self.squat.pk, 'sets': 4, 'reps': 6, 'weight': '100'}])
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(ExerciseLog.objects.exists())
+
+    def test_future_date_rejected(self):
+        r = self._post(
+            [{'exercise': self.squat.pk, 'done': 'on', 'sets': 4, 'reps': 6, 'weight': '100'}],
+            log_date=timezone.localdate() + timedelta(days=1),
+        )
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(ExerciseLog.objects.exists())
+
+    def test_json_returns_new_records(self):
+        make_log(self.user, self.squat, weight=100, reps=5, log_date=timezone.localdate() - timedelta(days=7))
+        r = self._post_json({'logs': [
+            {'exercise': self.squat.pk, 'sets': 5, 'reps': 5, 'weight': 105},
+            {'exercise': self.bench.pk, 'sets': 3, 'reps': 8, 'weight': '62.5', 'notes': 'facile'},
+            {'exercise': self.pullup.pk, 'sets': 3, 'reps': 8},
+        ]})
+        self.assertEqual(r.status_code, 201)
+        body = r.json()
+        self.assertEqual(body['created'], 3)
+        self.assertIs(body['session_created'], True)
+        self.assertEqual(
+            {(rec['exercise_name'], rec['label'], rec['value']) for rec in body['records']},
+            {('Squat', '1RM teorico', '122.50'), ('Squat', '1RM', '105.00'),
+             ('Squat', '3RM', '105.00'), ('Squat', '5RM', '105.00')},
+        )
+        self.assertEqual(ExerciseLog.objects.get(exercise=self.bench).notes, 'facile')
+
+    def test_json_rejects_exercise_outside_plan(self):
+        other = make_exercise('Curl', MuscleGroup.BICEPS)
+        r = self._post_json({'logs': [
+            {'exercise': self.squat.pk, 'sets': 5, 'reps': 5, 'weight': 100},
+            {'exercise': other.pk, 'sets': 3, 'reps': 10, 'weight': 15},
+        ]})
+        self.assertEqual(r.status_code, 400)
+        self.assertIn('__all__', r.json()['errors']['logs'][1])
+        self.assertFalse(ExerciseLog.objects.exists())
+
+    def test_json_bad_payload(self):
+        self.assertEqual(self._post_json({'logs': []}).status_code, 400)
+        r = self.client.post(self.url, 'non json', content_type='application/json')
+        self.assertEqual(r.status_code, 400)
+
+    def test_existing_session_reused(self):
+        WorkoutSession.objects.create(user=self.user, date=timezone.localdate(), plan=self.plan)
+        r = self._post_json({'logs': [{'exercise': self.squat.pk, 'sets': 5, 'reps': 5, 'weight': 100}]})
+        self.assertIs(r.json()['session_created'], False)
+        self.assertEqual(WorkoutSession.objects.filter(user=self.user).count(), 1)
+
+    def test_bumps_data_version(self):
+        before = data_version(self.user.pk)
+        self._post_json({'logs': [{'exercise': self.squat.pk, 'sets': 5, 'reps': 5, 'weight': 100}]})
+        self.assertNotEqual(data_version(self.user.pk), before)
+
+    def test_query_count_independent_of_exercise_count(self):
+        def post(count):
+            plan = make_plan(self.user, f'Scheda {count}')
+            exercises = [make_exercise(f'Esercizio {count}-{n}') for n in range(count)]
+            for n, ex in enumerate(exercises):
+                PlannedExercise.objects.create(plan=plan, exercise=ex, target_sets=3, target_reps=8, order=f'a{n}')
+            url = reverse('plan_log_workout', kwargs={'pk': plan.pk})
+            payload = {'logs': [{'exercise': ex.pk, 'sets': 3, 'reps': 8, 'weight': 50} for ex in exercises]}
+            with CaptureQueriesContext(connection) as ctx:
+                r = self.client.post(url, json.dumps(payload), content_type='application/json')
+            self.assertEqual(r.status_code, 201)
+            return len(ctx)
+
+        post(1)  # sessione e cache calde
+        self.assertEqual(post(2), post(15))
+
+    def test_other_users_plan_404(self):
+        other = make_user('intruder')
+        plan = make_plan(other, 'Altrui')
+        r = self.client.get(reverse('plan_log_workout', kwargs={'pk': plan.pk}))
+        self.assertEqual(r.status_code, 404)
+
+
 # ─── Calendario ───────────────────────────────────────────────────────────────
 
 class WorkoutCalendarTest(TestCase):
@@ -1268,6 +1884,35 @@ class WorkoutCalendarTest(TestCase):
         self.assertEqual(r.context['weekly_average'], 0)
 
 
+    def test_streaks_in_context(self):
+        week_start = self._week_start()
+        for weeks_ago in (1, 2, 3):
+            WorkoutSession.objects.create(
+                user=self.user, date=week_start - timedelta(weeks=weeks_ago), plan_name='A'
+            )
+        r = self.client.get(reverse('workout_calendar'))
+        self.assertEqual(r.context['current_streak'], 3)
+        self.assertEqual(r.context['longest_streak'], 3)
+
+    def test_stats_do_not_scan_history(self):
+        """Le statistiche costano lo stesso numero di query con 1 o 200 giorni."""
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(reverse('workout_calendar'), {'year': 2020, 'month': 1})
+            return len(ctx.captured_queries)
+
+        WorkoutSession.objects.create(user=self.user, date=self._week_start(), plan_name='A')
+        few = count_queries()
+        for i in range(1, 200):
+            WorkoutSession.objects.create(
+                user=self.user, date=self._week_start() - timedelta(days=i), plan_name='A'
+            )
+        self.assertEqual(count_queries(), few)
+        self.assertEqual(
+            self.client.get(reverse('workout_calendar')).context['total_days_trained'], 200
+        )
+
+
 class SessionDayDetailTest(TestCase):
     def setUp(self):
         self.user = make_user('daydetail')
@@ -1308,6 +1953,147 @@ class SessionDayDetailTest(TestCase):
         self.assertEqual(r.json()['sessions'], [])
 
 
+class CalendarDayIndexTest(TestCase):
+    """Il dettaglio delle giornate del mese viaggia con la pagina."""
+
+    def setUp(self):
+        self.user = make_user('dayindex')
+        self.client.login(username='dayindex', password='testpass')
+        self.plan = make_plan(self.user, 'Push Pull Legs')
+
+    def _month(self, year=2026, month=3):
+        return self.client.get(reverse('workout_calendar'), {'year': year, 'month': month})
+
+    def test_matches_day_detail_endpoint(self):
+        WorkoutSession.objects.create(user=self.user, date=date(2026, 3, 10), plan=self.plan)
+        WorkoutSession.objects.create(
+            user=self.user, date=date(2026, 3, 10), plan_name='Cardio', is_free=True
+        )
+        inline = self._month().context['day_index'][10]
+        detail = self.client.get(reverse('session_day_detail', args=[2026, 3, 10])).json()
+        self.assertEqual(inline, detail)
+
+    def test_covers_every_day_of_month(self):
+        index = self._month(2026, 2).context['day_index']
+        self.assertEqual(sorted(index), list(range(1, 29)))
+        self.assertEqual(index[1]['sessions'], [])
+        self.assertEqual(index[1]['date_label'], '1 Febbraio 2026')
+
+    def test_future_days_cannot_log(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        index = self._month(tomorrow.year, tomorrow.month).context['day_index']
+        self.assertFalse(index[tomorrow.day]['can_log'])
+
+    def test_plan_names_are_escaped_in_page(self):
+        WorkoutSession.objects.create(
+            user=self.user, date=date(2026, 3, 10), plan_name='</script><b>x'
+        )
+        r = self._month()
+        self.assertContains(r, 'id="calendarDays"')
+        self.assertNotContains(r, '</script><b>x')
+
+    def test_opening_month_does_not_query_per_day(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self._month()
+            return len(ctx.captured_queries)
+
+        WorkoutSession.objects.create(user=self.user, date=date(2026, 3, 1), plan=self.plan)
+        few = count_queries()
+        for day in range(2, 20):
+            WorkoutSession.objects.create(user=self.user, date=date(2026, 3, day), plan=self.plan)
+        self.assertEqual(count_queries(), few)
+
+
+class CalendarHeatmapTest(TestCase):
+    def setUp(self):
+        self.user = make_user('heatmapuser')
+        self.client.login(username='heatmapuser', password='testpass')
+        self.url = reverse('calendar_heatmap')
+
+    def _get(self, **params):
+        return self.client.get(self.url, params)
+
+    def test_counts_sessions_per_day(self):
+        WorkoutSession.objects.create(user=self.user, date=date(2026, 1, 15), plan_name='A')
+        WorkoutSession.objects.create(user=self.user, date=date(2026, 1, 15), plan_name='B')
+        WorkoutSession.objects.create(
+            user=self.user, date=date(2026, 1, 16), plan_name='Cardio', is_free=True
+        )
+        data = self._get(start='2026-01-01', end='2026-01-31').json()
+        self.assertEqual(data['days'], {
+            '2026-01-15': {'count': 2, 'only_free': False},
+            '2026-01-16': {'count': 1, 'only_free': True},
+        })
+
+    def test_range_is_inclusive_and_filtered(self):
+        for day in (date(2025, 12, 31), date(2026, 1, 1), date(2026, 1, 31), date(2026, 2, 1)):
+            WorkoutSession.objects.create(user=self.user, date=day, plan_name='A')
+        data = self._get(start='2026-01-01', end='2026-01-31').json()
+        self.assertEqual(sorted(data['days']), ['2026-01-01', '2026-01-31'])
+
+    def test_defaults_to_last_year(self):
+        today = timezone.localdate()
+        data = self._get().json()
+        self.assertEqual(data['end'], today.isoformat())
+        self.assertEqual(data['start'], (today - timedelta(days=364)).isoformat())
+
+    def test_ignores_other_users(self):
+        other = make_user('altroheatmap')
+        WorkoutSession.objects.create(user=other, date=date(2026, 1, 15), plan_name='A')
+        self.assertEqual(self._get(start='2026-01-01', end='2026-01-31').json()['days'], {})
+
+    def test_invalid_ranges_rejected(self):
+        self.assertEqual(self._get(start='2026-02-01', end='2026-01-01').status_code, 400)
+        self.assertEqual(self._get(start='boh').status_code, 400)
+        self.assertEqual(self._get(start='2026-02-30').status_code, 400)
+        self.assertEqual(self._get(start='2020-01-01', end='2026-01-01').status_code, 400)
+
+    def test_single_query_for_data(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self._get(start='2025-01-01', end='2025-12-31')
+            return len(ctx.captured_queries)
+
+        WorkoutSession.objects.create(user=self.user, date=date(2025, 1, 1), plan_name='A')
+        few = count_queries()
+        for i in range(1, 100):
+            WorkoutSession.objects.create(
+                user=self.user, date=date(2025, 1, 1) + timedelta(days=i), plan_name='A'
+            )
+        self.assertEqual(count_queries(), few)
+
+    def test_revalidation_returns_304_until_data_changes(self):
+        WorkoutSession.objects.create(user=self.user, date=date(2026, 1, 15), plan_name='A')
+        r = self._get(start='2026-01-01', end='2026-01-31')
+        etag = r['ETag']
+        self.assertIn('Last-Modified', r)
+        self.assertEqual(r['Cache-Control'], 'private, no-cache')
+
+        r = self.client.get(
+            self.url, {'start': '2026-01-01', 'end': '2026-01-31'}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(r.status_code, 304)
+
+        WorkoutSession.objects.create(user=self.user, date=date(2026, 1, 16), plan_name='A')
+        r = self.client.get(
+            self.url, {'start': '2026-01-01', 'end': '2026-01-31'}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r['ETag'], etag)
+
+    def test_etag_depends_on_range(self):
+        a = self._get(start='2026-01-01', end='2026-01-31')['ETag']
+        b = self._get(start='2026-02-01', end='2026-02-28')['ETag']
+        self.assertNotEqual(a, b)
+
+    def test_etag_differs_between_users(self):
+        mine = self._get(start='2026-01-01', end='2026-01-31')['ETag']
+        make_user('altroetag')
+        self.client.login(username='altroetag', password='testpass')
+        self.assertNotEqual(self._get(start='2026-01-01', end='2026-01-31')['ETag'], mine)
+
+
 # ─── Import CSV allenamenti ───────────────────────────────────────────────────
 
 class SessionImportTest(TestCase):
@@ -1327,6 +2113,16 @@ class SessionImportTest(TestCase):
         })
         self.assertEqual(WorkoutSession.objects.filter(user=self.user).count(), 2)
 
+    def test_import_updates_training_summary(self):
+        """bulk_create salta save(): il riepilogo va aggiornato dall'import."""
+        WorkoutSession.objects.create(user=self.user, date=date(2026, 1, 15), plan_name='Push')
+        self.client.post(reverse('session_import'), {
+            'csv_file': self._csv('data,scheda\n2026-01-15,Push\n2026-01-15,Pull\n2026-01-20,Pull\n')
+        })
+        summary = TrainingSummary.objects.get(user=self.user)
+        self.assertEqual(summary.total_days, 2)
+        self.assertEqual(summary.longest_streak, 2)
+
     def test_header_is_optional(self):
         self.client.post(reverse('session_import'), {
             'csv_file': self._csv('2026-01-15,Push\n')
@@ -1505,6 +2301,101 @@ class SessionImportDelimiterTest(TestCase):
         self.assertContains(r, 'Nessuna riga valida')
 
 
+class SessionImportStreamingTest(TestCase):
+    """Il file si legge a blocchi: separatore, date e codifica restano corretti."""
+
+    def setUp(self):
+        self.user = make_user('streamuser')
+        self.client.login(username='streamuser', password='testpass')
+
+    def _post(self, content):
+        f = io.BytesIO(content if isinstance(content, bytes) else content.encode('utf-8-sig'))
+        f.name = 'sessions.csv'
+        return self.client.post(reverse('session_import'), {'csv_file': f})
+
+    def test_file_larger_than_sample(self):
+        start = date(2015, 1, 1)
+        lines = [f'{(start + timedelta(days=n)).isoformat()};Scheda {n % 7}, lunga\n' for n in range(3000)]
+        self._post('data;scheda\n' + ''.join(lines))
+        self.assertEqual(WorkoutSession.objects.filter(user=self.user).count(), 3000)
+        self.assertEqual(WorkoutSession.objects.earliest('date').plan_name, 'Scheda 0, lunga')
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_multibyte_characters_split_across_chunks(self):
+        # Solo i file caricati su disco vengono letti a blocchi.
+        with patch('gym.imports.UPLOAD_CHUNK_BYTES', 5):
+            self._post('data,scheda\n2026-01-15,Forza à più 💪\n2026-01-16,Caffè\n')
+        names = set(WorkoutSession.objects.values_list('plan_name', flat=True))
+        self.assertEqual(names, {'Forza à più 💪', 'Caffè'})
+
+    def test_quoted_newline_inside_field(self):
+        self._post('2026-01-15,"Push\nPull"\n2026-01-16,Legs\n')
+        self.assertEqual(WorkoutSession.objects.count(), 2)
+
+    def test_non_utf8_file_rejected(self):
+        r = self._post('2026-01-15,Caffè\n'.encode('latin-1'))
+        self.assertContains(r, 'UTF-8')
+        self.assertEqual(WorkoutSession.objects.count(), 0)
+
+    def test_mixed_date_formats(self):
+        self._post('2026-01-15,Push\n16/01/2026,Pull\n17.01.2026,Legs\n2026-01-18,Push\n')
+        dates = sorted(WorkoutSession.objects.values_list('date', flat=True))
+        self.assertEqual(dates, [date(2026, 1, d) for d in (15, 16, 17, 18)])
+
+    @override_settings(GYM_IMPORT_INLINE_MAX_BYTES=10 * 1024 * 1024)
+    def test_large_import_in_chunks(self):
+        """Un IN con tutte le date supererebbe il limite di variabili di SQLite."""
+        start = date(1880, 1, 1)
+        lines = ''.join(f'{(start + timedelta(days=n)).isoformat()},Push\n' for n in range(50000))
+        r = self._post(lines)
+        self.assertEqual(r.status_code, 302)
+        self.assertEqual(WorkoutSession.objects.filter(user=self.user).count(), 50000)
+        self.assertEqual(TrainingSummary.objects.get(user=self.user).total_days, 50000)
+
+    def test_counts_across_chunks(self):
+        WorkoutSession.objects.create(user=self.user, date=date(2026, 1, 16), plan_name='Pull')
+        WorkoutSession.objects.create(user=self.user, date=date(2026, 1, 20), plan_name='Push')
+        content = (
+            '2026-01-15,Push\n2026-01-16,Pull\n2026-01-17,Legs\n'
+            '2026-01-18,Push\n2026-01-15,Push\n2026-01-20,Push\n2026-01-21,Pull\n'
+        )
+        with patch('gym.imports.SESSION_IMPORT_CHUNK', 2):
+            r = self._post(content)
+        self.assertEqual(WorkoutSession.objects.filter(user=self.user).count(), 6)
+        texts = [str(m) for m in r.wsgi_request._messages]
+        self.assertIn('4 allenamenti importati. 3 già presenti sono stati ignorati.', texts)
+        summary = TrainingSummary.objects.get(user=self.user)
+        self.assertEqual(summary.total_days, 6)
+
+    def test_duplicates_counted_inside_and_across_chunks(self):
+        # Blocchi da due: la prima coppia cade nello stesso blocco, la
+        # seconda a cavallo tra il secondo e il terzo.
+        content = (
+            '2026-01-15,Push\n2026-01-15,Push\n2026-01-16,Pull\n'
+            '2026-01-17,Legs\n2026-01-18,Push\n2026-01-18,Push\n2026-01-19,Pull\n'
+        )
+        with patch('gym.imports.SESSION_IMPORT_CHUNK', 2):
+            r = self._post(content)
+        self.assertEqual(WorkoutSession.objects.filter(user=self.user).count(), 5)
+        texts = [str(m) for m in r.wsgi_request._messages]
+        self.assertIn('5 allenamenti importati. 2 già presenti sono stati ignorati.', texts)
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_decode_error_after_first_chunk_keeps_saved_rows(self):
+        content = '2026-01-15,Push\n2026-01-16,Pull\n'.encode() + b'2026-01-17,Caff\xe8\n'
+        with patch('gym.imports.SESSION_IMPORT_CHUNK', 2), patch('gym.imports.UPLOAD_CHUNK_BYTES', 8), \
+                patch('gym.imports.DELIMITER_SAMPLE_CHARS', 10):
+            r = self._post(content)
+        self.assertContains(r, 'UTF-8')
+        self.assertContains(r, '2 allenamenti importati prima')
+        self.assertEqual(WorkoutSession.objects.count(), 2)
+
+    def test_impossible_date_reported_not_crashing(self):
+        r = self._post('2026-02-30,Push\n2026-01-16,Pull\n')
+        self.assertEqual(r.status_code, 302)
+        self.assertEqual(WorkoutSession.objects.get().plan_name, 'Pull')
+
+
 class SessionTemplateDownloadTest(TestCase):
     def setUp(self):
         self.user = make_user('templateuser')
@@ -1573,22 +2464,22 @@ class CalendarQuickLogTest(TestCase):
 
     # ── Schede disponibili nel selettore ─────────────────────────────
     def test_picker_includes_active_and_archived_plans(self):
-        make_plan(self.user, 'Vecchia Scheda', is_active=False, order=1)
+        make_plan(self.user, 'Vecchia Scheda', is_active=False)
         r = self.client.get(reverse('workout_calendar'))
         names = [p['name'] for p in json.loads(r.context['picker_plans'])]
         self.assertIn('Push Pull Legs', names)
         self.assertIn('Vecchia Scheda', names)
 
     def test_picker_marks_archived_plans(self):
-        make_plan(self.user, 'Vecchia Scheda', is_active=False, order=1)
+        make_plan(self.user, 'Vecchia Scheda', is_active=False)
         r = self.client.get(reverse('workout_calendar'))
         by_name = {p['name']: p for p in json.loads(r.context['picker_plans'])}
         self.assertTrue(by_name['Push Pull Legs']['is_active'])
         self.assertFalse(by_name['Vecchia Scheda']['is_active'])
 
     def test_picker_lists_active_plans_first(self):
-        make_plan(self.user, 'Archiviata', is_active=False, order=0)
-        make_plan(self.user, 'Attiva', is_active=True, order=1)
+        make_plan(self.user, 'Archiviata', is_active=False, order='a')
+        make_plan(self.user, 'Attiva', is_active=True, order='b')
         r = self.client.get(reverse('workout_calendar'))
         actives = [p['is_active'] for p in json.loads(r.context['picker_plans'])]
         self.assertEqual(actives, sorted(actives, reverse=True))
@@ -1666,7 +2557,7 @@ class CalendarQuickLogTest(TestCase):
         self.assertRedirects(r, reverse('plan_detail', kwargs={'pk': self.plan.pk}))
 
     def test_archived_plan_can_be_logged(self):
-        archived = make_plan(self.user, 'Vecchia Scheda', is_active=False, order=1)
+        archived = make_plan(self.user, 'Vecchia Scheda', is_active=False)
         past = timezone.localdate() - timedelta(days=2)
         self.client.post(reverse('session_create'), {
             'plan_id': archived.pk,
@@ -9,6 +9,7 @@ urlpatterns = [
     path('plans/', views.plan_list, name='plan_list'),
     path('plans/create/', views.plan_create, name='plan_create'),
     path('plans/reorder/', views.plan_list_reorder, name='plan_list_reorder'),
+    path('plans/move/', views.plan_tree_move, name='plan_tree_move'),
 
     # Cartelle
     path('plans/folders/create/', views.plan_folder_create, name='plan_folder_create'),
@@ -20,6 +21,8 @@ urlpatterns = [
     path('plans/<int:pk>/edit/', views.plan_edit, name='plan_edit'),
     path('plans/<int:pk>/delete/', views.plan_delete, name='plan_delete'),
     path('plans/<int:pk>/reorder/', views.plan_reorder, name='plan_reorder'),
+    path('plans/<int:pk>/move/', views.plan_exercise_move, name='plan_exercise_move'),
+    path('plans/<int:pk>/log/', views.plan_log_workout, name='plan_log_workout'),
 
     # Esercizi in scheda
     path('plans/<int:plan_pk>/add-exercise/', views.planned_exercise_add, name='planned_exercise_add'),
@@ -32,9 +35,11 @@ urlpatterns = [
     # Progresso
     path('progress/', views.progress_overview, name='progress_overview'),
     path('progress/<int:exercise_id>/', views.exercise_progress, name='exercise_progress'),
+    path('progress/<int:exercise_id>/history/', views.exercise_history, name='exercise_history'),
 
     # Autocomplete
     path('exercises/autocomplete/', views.exercise_autocomplete, name='exercise_autocomplete'),
+    path('exercises/catalog/<str:digest>.json', views.exercise_catalog, name='exercise_catalog'),
 
     # Catalogo esercizi
     path('exercises/', views.exercise_list, name='exercise_list'),
@@ -56,6 +61,14 @@ urlpatterns = [
     path('sessions/template/', views.session_template_download, name='session_template_download'),
     path('calendar/', views.workout_calendar, name='workout_calendar'),
     path('calendar/<int:year>/<int:month>/<int:day>/', views.session_day_detail, name='session_day_detail'),
+    path('calendar/heatmap/', views.calendar_heatmap, name='calendar_heatmap'),
+
+    # Import in background
+    path('imports/<int:pk>/', views.import_job_detail, name='import_job_detail'),
+    path('imports/<int:pk>/status/', views.import_job_status, name='import_job_status'),
+
+    # Esportazione account
+    path('account/export/', views.account_export, name='account_export'),
 
     # PWA Service Worker (deve stare alla root per avere scope /)
     path('sw.js', views.service_worker, name='service_worker'),
@@ -1,76 +1,97 @@
-import io
 import json
 from collections import defaultdict
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Max, Count, Prefetch
+from django.db import transaction
+from django.db.models import Max, Count, Prefetch, Q
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.template.loader import render_to_string
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.dateparse import parse_date
+from django.views.decorators.http import condition
 
+from . import analytics, catalog, exports, imports, jobs, ordering, search
+from .caching import (
+    bump_data_version, cached_for_user, today_window, user_conditional_page,
+    user_etag, user_last_modified,
+)
+from .charts import downsample
 from .forms import (
     WorkoutPlanForm,
     PlannedExerciseForm,
     ExerciseLogForm,
     ExerciseForm,
     PlanFolderForm,
+    WorkoutLogForm,
+    WorkoutLogFormSet,
 )
 
 from .models import (
     Exercise, WorkoutPlan, PlannedExercise, ExerciseLog,
-    MuscleGroup, PlanFolder, WorkoutSession,
+    MuscleGroup, PlanFolder, WorkoutSession, ExerciseStats, PersonalRecord,
+    TrainingSummary, TrainingWeek, ImportJob, plan_tree_group,
 )
 
 
 # ─── Dashboard ────────────────────────────────────────────────────────────────
 
-@login_required
-def dashboard(request):
-    """Dashboard aggregata per gruppo muscolare con sparkline 1RM."""
-    import json
-    from collections import defaultdict
-    from .models import MuscleGroup
+# Righe per elenco nel riquadro tendenze.
+DASHBOARD_TREND_ROWS = 3
+# Giorni di log letti per sparkline e tendenze, a ritroso dall'ultimo log
+# di ogni esercizio: la dashboard non scorre tutto lo storico.
+DASHBOARD_SERIES_DAYS = 365
 
-    # Tutti i log dell'utente in ordine cronologico per esercizio.
-    # order_by esplicito: il default del modello è per data desc e
-    # creerebbe liste invertite nel defaultdict.
-    all_logs = (
-        ExerciseLog.objects
-        .filter(user=request.user)
+
+def _dashboard_data(user, today):
+    """Parte della dashboard che dipende solo dai dati dell'utente e dalla data."""
+    # Una riga di statistiche per esercizio: primo/ultimo 1RM e conteggio
+    # sono già pronti, non serve scorrere tutto lo storico dei log.
+    all_stats = list(
+        ExerciseStats.objects
+        .filter(user=user)
         .select_related('exercise')
-        .order_by('exercise_id', 'date', 'id')
+        .order_by('exercise_id')
     )
 
-    # Raggruppa log per esercizio (mantiene l'ordine cronologico)
-    exercise_logs = defaultdict(list)
-    for log in all_logs:
-        exercise_logs[log.exercise].append(log)
+    # Escludi esercizi con <2 log e quelli a corpo libero (niente 1RM da
+    # tracciare per loro)
+    tracked = [
+        s for s in all_stats
+        if s.log_count >= 2 and not s.exercise.is_bodyweight
+        and s.first_one_rm is not None and s.last_one_rm is not None
+    ]
+
+    # Le sparkline e le tendenze richiedono la serie: una query per tutti
+    # gli esercizi, in array (vedi gym/analytics.py), limitata all'ultimo
+    # anno di ciascuno. La retta usa solo le ultime 12 settimane; record e
+    # stallo si riferiscono all'anno mostrato.
+    series = analytics.StrengthSeries.load(user, since={
+        s.exercise_id: s.last_log_date - timedelta(days=DASHBOARD_SERIES_DAYS) for s in tracked
+    })
+    trends = analytics.trends(series)
+    points = defaultdict(list)
+    for exercise_id, day, one_rm in zip(series.exercise_ids.tolist(), series.days.tolist(), series.one_rm.tolist()):
+        points[exercise_id].append({'date': date.fromordinal(day).strftime('%d/%m'), 'one_rm': one_rm})
 
-    # Aggrega per gruppo muscolare, escludendo esercizi con <2 log e quelli
-    # a corpo libero (niente 1RM da tracciare per loro)
     mg_exercises = defaultdict(list)
-    for exercise, logs in exercise_logs.items():
-        if len(logs) < 2 or exercise.is_bodyweight:
-            continue
-        first_1rm = float(logs[0].one_rm)
-        last_1rm = float(logs[-1].one_rm)
+    for stats in tracked:
+        first_1rm = float(stats.first_one_rm)
+        last_1rm = float(stats.last_one_rm)
         variation_pct = round(
             ((last_1rm - first_1rm) / first_1rm * 100) if first_1rm else 0.0, 1
         )
-        chart_data = json.dumps([
-            {'date': log.date.strftime('%d/%m'), 'one_rm': float(log.one_rm)}
-            for log in logs
-        ])
-        mg_exercises[exercise.muscle_group].append({
-            'exercise': exercise,
+        mg_exercises[stats.exercise.muscle_group].append({
+            'exercise': stats.exercise,
             'last_one_rm': last_1rm,
             'variation_pct': variation_pct,
-            'chart_data': chart_data,
-            'log_count': len(logs),
+            'chart_data': json.dumps(downsample(points[stats.exercise_id], 'sparkline')),
+            'log_count': stats.log_count,
+            'trend': trends.get(stats.exercise_id),
         })
 
     mg_display = dict(MuscleGroup.choices)
@@ -92,11 +113,49 @@ def dashboard(request):
 
     # Allenamenti (non log di esercizi) nella finestra di 30 giorni che
     # finisce oggi: 29 giorni indietro più oggi.
-    window_start = timezone.localdate() - timedelta(days=29)
+    window_start = today - timedelta(days=29)
     workouts_last_30_days = WorkoutSession.objects.filter(
-        user=request.user, date__gte=window_start
+        user=user, date__gte=window_start
     ).count()
-    active_plans_count = WorkoutPlan.objects.filter(user=request.user, is_active=True).count()
+    active_plans_count = WorkoutPlan.objects.filter(user=user, is_active=True).count()
+
+    # Chi sale più in fretta e chi è fermo, per il riquadro tendenze.
+    with_trend = [
+        e for exercises in mg_exercises.values() for e in exercises if e['trend'] is not None
+    ]
+    rising = sorted(
+        (e for e in with_trend if (e['trend']['kg_per_week'] or 0) > 0 and not e['trend']['plateau']),
+        key=lambda e: e['trend']['kg_per_week'], reverse=True,
+    )
+    stalled = sorted((e for e in with_trend if e['trend']['plateau']), key=lambda e: e['trend']['plateau_since'])
+
+    return {
+        'muscle_groups': muscle_groups,
+        'rising_exercises': rising[:DASHBOARD_TREND_ROWS],
+        'stalled_exercises': stalled[:DASHBOARD_TREND_ROWS],
+        'workouts_last_30_days': workouts_last_30_days,
+        'exercises_tracked': len(all_stats),
+        'active_plans_count': active_plans_count,
+    }
+
+
+def _greeting_window():
+    # Il saluto della dashboard cambia ogni 6 ore: la pagina in cache nel
+    # browser vale fino al cambio di fascia.
+    now = timezone.localtime()
+    return now.replace(hour=now.hour // 6 * 6, minute=0, second=0, microsecond=0)
+
+
+@login_required
+@user_conditional_page('dashboard', window=_greeting_window)
+def dashboard(request):
+    """Dashboard aggregata per gruppo muscolare con sparkline 1RM."""
+    # La data fa parte della chiave: la finestra dei 30 giorni si sposta
+    # anche senza nuove scritture.
+    today = timezone.localdate()
+    context = cached_for_user(
+        request.user, 'dashboard', lambda: _dashboard_data(request.user, today), today
+    )
 
     hour = timezone.localtime().hour
     if hour < 6:
@@ -108,18 +167,13 @@ def dashboard(request):
     else:
         greeting = 'Buonasera'
 
-    return render(request, 'gym/dashboard.html', {
-        'muscle_groups': muscle_groups,
-        'workouts_last_30_days': workouts_last_30_days,
-        'exercises_tracked': len(exercise_logs),
-        'active_plans_count': active_plans_count,
-        'greeting': greeting,
-    })
+    return render(request, 'gym/dashboard.html', {**context, 'greeting': greeting})
 
 
 # ─── Workout Plans ────────────────────────────────────────────────────────────
 
 @login_required
+@user_conditional_page('plan_list')
 def plan_list(request):
     base_qs = WorkoutPlan.objects.filter(user=request.user).annotate(
         exercise_count=Count('planned_exercises')
@@ -152,16 +206,14 @@ def plan_create(request):
     if form.is_valid():
         plan = form.save(commit=False)
         plan.user = request.user
-        from django.db.models import Max
-        last_order = WorkoutPlan.objects.filter(user=request.user).aggregate(Max('order'))['order__max']
-        plan.order = (last_order or 0) + 1
-        plan.save()
+        plan.save()  # in fondo alla lista: la chiave la assegna save()
         messages.success(request, f'Scheda "{plan.name}" creata con successo.')
         return redirect('plan_detail', pk=plan.pk)
     return render(request, 'gym/plan_form.html', {'form': form, 'action': 'Crea'})
 
 
 @login_required
+@user_conditional_page('plan_detail', window=today_window)
 def plan_detail(request, pk):
     plan = get_object_or_404(WorkoutPlan, pk=pk, user=request.user)
     planned = plan.planned_exercises.select_related('exercise').all()
@@ -198,6 +250,111 @@ def plan_delete(request, pk):
         return redirect('plan_list')
     return render(request, 'gym/plan_confirm_delete.html', {'plan': plan})
 
+def _move_payload(request):
+    """Payload JSON di una richiesta di spostamento, o None se non valido."""
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@login_required
+def plan_exercise_move(request, pk):
+    """
+    Sposta un esercizio della scheda tra due altri (drag & drop).
+    Payload: {"id": N, "after": id|null, "before": id|null} — gli esercizi
+    che nella lista compaiono subito prima e subito dopo la posizione di
+    rilascio. Scrive solo la riga spostata.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    plan = get_object_or_404(WorkoutPlan, pk=pk, user=request.user)
+    data = _move_payload(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    ids = [data.get('id'), data.get('after'), data.get('before')]
+    if not isinstance(ids[0], int) or not all(i is None or isinstance(i, int) for i in ids):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    item = plan.planned_exercises.filter(pk=ids[0]).first()
+    if item is None:
+        return JsonResponse({'error': 'Invalid exercise ID'}, status=400)
+    refs = {
+        side: (PlannedExercise, ref) if ref is not None else None
+        for side, ref in zip(('after', 'before'), ids[1:])
+    }
+
+    try:
+        key = ordering.move(item, item.order_group(), **refs)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid exercise IDs'}, status=400)
+    return JsonResponse({'status': 'ok', 'order': key})
+
+
+_TREE_MODELS = {'plan': WorkoutPlan, 'folder': PlanFolder}
+
+
+def _tree_ref(value):
+    """{"type": "plan"|"folder", "id": N} → (modello, id); ValueError se non valido."""
+    if value is None:
+        return None
+    if not isinstance(value, dict) or value.get('type') not in _TREE_MODELS:
+        raise ValueError(value)
+    if not isinstance(value.get('id'), int):
+        raise ValueError(value)
+    return _TREE_MODELS[value['type']], value['id']
+
+
+@login_required
+def plan_tree_move(request):
+    """
+    Sposta una scheda o una cartella nella lista schede (drag & drop).
+    Payload: {"type": "plan"|"folder", "id": N, "folder": id|null,
+              "after": {"type", "id"}|null, "before": {"type", "id"}|null}
+
+    `folder` è la cartella di destinazione (null = radice); `after` e
+    `before` sono gli elementi tra cui è stato rilasciato. Le cartelle
+    stanno solo alla radice. Scrive solo la riga spostata.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    data = _move_payload(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    try:
+        item_model, item_id = _tree_ref({'type': data.get('type'), 'id': data.get('id')})
+        after, before = _tree_ref(data.get('after')), _tree_ref(data.get('before'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    item = item_model.objects.filter(pk=item_id, user=request.user).first()
+    if item is None:
+        return JsonResponse({'error': 'Invalid IDs'}, status=400)
+
+    folder_id = data.get('folder')
+    fields = {}
+    if folder_id is None:
+        group = plan_tree_group(request.user.pk)
+        if item_model is WorkoutPlan:
+            fields['folder'] = None
+    else:
+        folder = None
+        if isinstance(folder_id, int):
+            folder = PlanFolder.objects.filter(pk=folder_id, user=request.user).first()
+        if folder is None or item_model is PlanFolder:
+            # Le cartelle non si annidano.
+            return JsonResponse({'error': 'Invalid folder'}, status=400)
+        group = [WorkoutPlan.objects.filter(user=request.user, folder=folder)]
+        fields['folder'] = folder
+
+    try:
+        key = ordering.move(item, group, after=after, before=before, **fields)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid IDs'}, status=400)
+    return JsonResponse({'status': 'ok', 'order': key})
+
+
 @login_required
 def plan_list_reorder(request):
     """
@@ -221,16 +378,20 @@ def plan_list_reorder(request):
     except (json.JSONDecodeError, AttributeError, KeyError, TypeError):
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
 
-    valid_plan_ids = set(WorkoutPlan.objects.filter(user=request.user).values_list('id', flat=True))
-    valid_folder_ids = set(PlanFolder.objects.filter(user=request.user).values_list('id', flat=True))
-    if not set(plan_ids) <= valid_plan_ids or not set(folder_ids) <= valid_folder_ids:
+    plans = WorkoutPlan.objects.filter(user=request.user).in_bulk(plan_ids)
+    folders = PlanFolder.objects.filter(user=request.user).in_bulk(folder_ids)
+    if len(plans) != len(set(plan_ids)) or len(folders) != len(set(folder_ids)):
         return JsonResponse({'error': 'Invalid IDs'}, status=400)
 
-    for position, entry in enumerate(order):
-        if entry.get('type') == 'plan':
-            WorkoutPlan.objects.filter(pk=entry['id'], user=request.user).update(order=position, folder=None)
-        elif entry.get('type') == 'folder':
-            PlanFolder.objects.filter(pk=entry['id'], user=request.user).update(order=position)
+    items = [
+        plans[entry['id']] if entry.get('type') == 'plan' else folders[entry['id']]
+        for entry in order if entry.get('type') in ('plan', 'folder')
+    ]
+    with transaction.atomic():
+        ordering.reorder(plan_tree_group(request.user.pk), items)
+        # Le schede elencate qui tornano sciolte.
+        WorkoutPlan.objects.filter(pk__in=plans, folder__isnull=False).update(folder=None)
+        bump_data_version(request.user.pk)  # bulk_update non emette segnali
     return JsonResponse({'status': 'ok'})
 
 
@@ -249,11 +410,19 @@ def plan_folder_reorder(request, pk):
         ordered_ids = data.get('order', [])
     except (json.JSONDecodeError, AttributeError):
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
-    valid_ids = set(WorkoutPlan.objects.filter(user=request.user).values_list('id', flat=True))
-    if not set(ordered_ids) <= valid_ids:
+    try:
+        plans = WorkoutPlan.objects.filter(user=request.user).in_bulk(ordered_ids)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Invalid plan IDs'}, status=400)
+    if len(plans) != len(set(ordered_ids)):
         return JsonResponse({'error': 'Invalid plan IDs'}, status=400)
-    for position, plan_id in enumerate(ordered_ids):
-        WorkoutPlan.objects.filter(pk=plan_id, user=request.user).update(order=position, folder=folder)
+    with transaction.atomic():
+        ordering.reorder(
+            [WorkoutPlan.objects.filter(user=request.user, folder=folder)],
+            [plans[plan_id] for plan_id in ordered_ids],
+            folder=folder,
+        )
+        bump_data_version(request.user.pk)  # bulk_update non emette segnali
     return JsonResponse({'status': 'ok'})
 
 
@@ -264,8 +433,6 @@ def plan_folder_create(request):
         if form.is_valid():
             folder = form.save(commit=False)
             folder.user = request.user
-            last_order = PlanFolder.objects.filter(user=request.user).aggregate(Max('order'))['order__max']
-            folder.order = (last_order or 0) + 1
             folder.save()
             messages.success(request, f'Cartella "{folder.name}" creata.')
         else:
@@ -306,9 +473,6 @@ def planned_exercise_add(request, plan_pk):
     if form.is_valid():
         pe = form.save(commit=False)
         pe.plan = plan
-        from django.db.models import Max
-        last_order = plan.planned_exercises.aggregate(Max('order'))['order__max']
-        pe.order = (last_order or 0) + 1
         pe.save()
         messages.success(request, f'"{pe.exercise.name}" aggiunto alla scheda.')
         return redirect('plan_detail', pk=plan.pk)
@@ -320,9 +484,10 @@ def planned_exercise_add(request, plan_pk):
 @login_required
 def plan_reorder(request, pk):
     """
-    Riceve via POST JSON con la nuova sequenza di ID PlannedExercise
-    e aggiorna il campo order di ciascuno.
-    Chiamato in AJAX dal drag & drop nel frontend.
+    Riceve via POST JSON la sequenza completa di ID PlannedExercise e
+    riassegna le chiavi d'ordine di tutti, in una transazione.
+    Il drag & drop usa plan_exercise_move, che scrive una riga sola:
+    questa resta per le sincronizzazioni complete.
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
@@ -332,11 +497,14 @@ def plan_reorder(request, pk):
         ordered_ids = data.get('order', [])
     except (json.JSONDecodeError, AttributeError):
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
-    valid_ids = set(plan.planned_exercises.values_list('id', flat=True))
-    if set(ordered_ids) != valid_ids:
+    planned = plan.planned_exercises.in_bulk()
+    if set(ordered_ids) != set(planned):
         return JsonResponse({'error': 'Invalid exercise IDs'}, status=400)
-    for position, pe_id in enumerate(ordered_ids):
-        PlannedExercise.objects.filter(pk=pe_id, plan=plan).update(order=position)
+    with transaction.atomic():
+        ordering.reorder(
+            [plan.planned_exercises.all()], [planned[pe_id] for pe_id in ordered_ids]
+        )
+        bump_data_version(request.user.pk)  # bulk_update non emette segnali
     return JsonResponse({'status': 'ok'})
 @login_required
 def planned_exercise_remove(request, pk):
@@ -384,13 +552,16 @@ def log_create(request):
             messages.success(request, f'Log salvato — 1RM teorico: {log.one_rm} kg')
         else:
             messages.success(request, 'Log salvato.')
+        if log.new_records:
+            messages.success(request, 'Nuovo record! ' + ', '.join(
+                f'{record.label}: {record.value} kg' for record in log.new_records
+            ))
         from_page = request.POST.get('from')
         plan_pk = request.POST.get('plan')
         if from_page == 'plan' and plan_pk:
             return redirect('plan_detail', pk=plan_pk)
         return redirect('exercise_progress', exercise_id=log.exercise.pk)
-    bodyweight_map = json.dumps({ex.pk: ex.is_bodyweight for ex in Exercise.objects.all()})
-    return render(request, 'gym/log_form.html', {'form': form, 'bodyweight_map': bodyweight_map})
+    return render(request, 'gym/log_form.html', {'form': form})
 
 @login_required
 def log_edit(request, pk):
@@ -403,12 +574,10 @@ def log_edit(request, pk):
         else:
             messages.success(request, 'Log aggiornato.')
         return redirect('exercise_progress', exercise_id=log.exercise.pk)
-    bodyweight_map = json.dumps({ex.pk: ex.is_bodyweight for ex in Exercise.objects.all()})
     return render(request, 'gym/log_form.html', {
         'form': form,
         'editing': True,
         'log': log,
-        'bodyweight_map': bodyweight_map,
     })
 
 
@@ -422,52 +591,267 @@ def log_delete(request, pk):
     return redirect('exercise_progress', exercise_id=exercise_id)
 
 
+def _workout_log_formset_data(entries):
+    """Dati di WorkoutLogFormSet dalle righe di una richiesta JSON."""
+    data = {'ex-TOTAL_FORMS': len(entries), 'ex-INITIAL_FORMS': 0}
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            entry = {}
+        data[f'ex-{i}-done'] = 'on'
+        for field in ('exercise', 'sets', 'reps', 'weight', 'notes'):
+            value = entry.get(field)
+            data[f'ex-{i}-{field}'] = '' if value is None else str(value)
+    return data
+
+
+def _save_workout_logs(user, plan, log_date, entries):
+    """
+    Salva i log di un allenamento con ExerciseLog.bulk_log() e registra la
+    giornata nel calendario. Restituisce (log creati, record migliorati,
+    True se la giornata è nuova).
+    """
+    logs = [
+        ExerciseLog(
+            user=user,
+            exercise=entry['exercise_obj'],
+            date=log_date,
+            sets=entry['sets'],
+            reps=entry['reps'],
+            weight=entry['weight'],
+            notes=entry['notes'],
+        )
+        for entry in entries
+    ]
+    with transaction.atomic():
+        records = ExerciseLog.bulk_log(logs)
+        bump_data_version(user.pk)  # bulk_create non emette segnali
+        _, session_created = WorkoutSession.objects.get_or_create(
+            user=user, date=log_date, plan_name=plan.name,
+            defaults={'plan': plan},
+        )
+    return logs, records, session_created
+
+
+@login_required
+def plan_log_workout(request, pk):
+    """
+    Registra in una volta sola i carichi di tutti gli esercizi di una
+    scheda per una data: un solo INSERT per i log e aggiornamenti in blocco
+    di statistiche e record, invece di un POST a log_create per esercizio.
+
+    Oltre al form accetta JSON (per client e sincronizzazioni):
+    {"date": "AAAA-MM-GG", "logs": [{"exercise": id, "sets": 3, "reps": 8,
+    "weight": 80, "notes": ""}, ...]} → 201 {"created", "session_created",
+    "records"}, oppure 400 {"errors"}.
+    """
+    plan = get_object_or_404(WorkoutPlan, pk=pk, user=request.user)
+    planned = list(plan.planned_exercises.select_related('exercise'))
+    exercises = {pe.exercise_id: pe.exercise for pe in planned}
+    is_json = request.content_type == 'application/json'
+
+    if request.method == 'POST' and is_json:
+        try:
+            payload = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        if not isinstance(payload, dict) or not isinstance(payload.get('logs'), list) or not payload['logs']:
+            return JsonResponse({'error': 'Invalid payload'}, status=400)
+        date_form = WorkoutLogForm({'date': payload.get('date') or timezone.localdate().isoformat()})
+        formset = WorkoutLogFormSet(
+            _workout_log_formset_data(payload['logs']), prefix='ex', form_kwargs={'exercises': exercises},
+        )
+        if not (date_form.is_valid() and formset.is_valid()):
+            return JsonResponse({'errors': {
+                'date': date_form.errors.get('date', []),
+                'logs': [dict(form.errors) for form in formset],
+            }}, status=400)
+        logs, records, session_created = _save_workout_logs(
+            request.user, plan, date_form.cleaned_data['date'], formset.cleaned_data,
+        )
+        return JsonResponse({
+            'created': len(logs),
+            'session_created': session_created,
+            'records': [
+                {
+                    'exercise': record.exercise_id,
+                    'exercise_name': exercises[record.exercise_id].name,
+                    'label': record.label,
+                    'value': f'{record.value:.2f}',
+                }
+                for record in records
+            ],
+        }, status=201)
+
+    if request.method == 'POST':
+        date_form = WorkoutLogForm(request.POST)
+        formset = WorkoutLogFormSet(request.POST, prefix='ex', form_kwargs={'exercises': exercises})
+        if date_form.is_valid() and formset.is_valid():
+            entries = [entry for entry in formset.cleaned_data if entry.get('done')]
+            if not entries:
+                messages.error(request, 'Segna almeno un esercizio come eseguito.')
+            else:
+                logs, records, _ = _save_workout_logs(
+                    request.user, plan, date_form.cleaned_data['date'], entries,
+                )
+                messages.success(request, f'Allenamento registrato: {len(logs)} esercizi salvati.')
+                if records:
+                    messages.success(request, 'Nuovo record! ' + ', '.join(
+                        f'{exercises[record.exercise_id].name} {record.label}: {record.value} kg'
+                        for record in records
+                    ))
+                return redirect('plan_detail', pk=plan.pk)
+    else:
+        # Precompilato con i target della scheda e l'ultimo carico usato.
+        last_weights = dict(
+            ExerciseStats.objects
+            .filter(user=request.user, exercise_id__in=exercises)
+            .values_list('exercise_id', 'last_log__weight')
+        )
+        date_form = WorkoutLogForm(initial={'date': timezone.localdate()})
+        formset = WorkoutLogFormSet(prefix='ex', form_kwargs={'exercises': exercises}, initial=[
+            {
+                'exercise': pe.exercise_id,
+                'done': True,
+                'sets': pe.target_sets,
+                'reps': pe.target_reps,
+                'weight': last_weights.get(pe.exercise_id),
+            }
+            for pe in planned
+        ])
+
+    return render(request, 'gym/plan_log.html', {
+        'plan': plan,
+        'date_form': date_form,
+        'rows': list(zip(planned, formset)),
+        'formset': formset,
+    })
+
+
 # ─── Progress ─────────────────────────────────────────────────────────────────
 
+# Filtro temporale della pagina progressi: giorni all'indietro da oggi.
+PROGRESS_PERIODS = {'3m': 90, '6m': 180, '1y': 365, 'all': None}
+
+# Righe dello storico per pagina: il costo della pagina non dipende dalla
+# lunghezza dello storico, il resto arriva con "Carica altri".
+HISTORY_PAGE_SIZE = 30
+
+
+def _progress_period(request):
+    period = request.GET.get('period', 'all')
+    return period if period in PROGRESS_PERIODS else 'all'
+
+
+def _period_cutoff(period, today):
+    days = PROGRESS_PERIODS[period]
+    return None if days is None else today - timedelta(days=days)
+
+
+def _parse_history_cursor(raw):
+    """Cursore "AAAA-MM-GG.id" dell'ultimo log mostrato, o None se non valido."""
+    raw_date, _, raw_id = (raw or '').partition('.')
+    cursor_date = parse_date(raw_date) if raw_date else None
+    if cursor_date is None or not raw_id.isdigit():
+        return None
+    return cursor_date, int(raw_id)
+
+
+def _parse_goal(raw):
+    """Obiettivo di 1RM in kg da ?goal=, o None se assente o non valido."""
+    try:
+        goal = float((raw or '').replace(',', '.'))
+    except ValueError:
+        return None
+    return goal if 0 < goal < 10000 else None
+
+
+def _history_page(logs, after=None):
+    """
+    Pagina dello storico in ordine (data, id) decrescente, con paginazione
+    keyset: si riparte dall'ultimo log mostrato invece di usare un OFFSET,
+    quindi ogni pagina legge al massimo HISTORY_PAGE_SIZE + 1 righe
+    dall'indice (user, exercise, -date).
+    """
+    if after is not None:
+        after_date, after_id = after
+        logs = logs.filter(Q(date__lt=after_date) | Q(date=after_date, id__lt=after_id))
+    page = list(logs.order_by('-date', '-id')[:HISTORY_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(page) > HISTORY_PAGE_SIZE:
+        page = page[:HISTORY_PAGE_SIZE]
+        next_cursor = f'{page[-1].date.isoformat()}.{page[-1].pk}'
+    return page, next_cursor
+
+
 @login_required
+@user_conditional_page('exercise_progress', window=today_window)
 def exercise_progress(request, exercise_id):
     """
     Visualizza lo storico del 1RM per un esercizio con filtro temporale.
     Il best 1RM è sempre calcolato sull'intero storico (all-time).
     Default: tutto lo storico.
     """
-    from datetime import timedelta
-
     exercise = get_object_or_404(Exercise, pk=exercise_id)
+    period = _progress_period(request)
+    today = date.today()
+
+    def build():
+        all_logs = ExerciseLog.objects.filter(user=request.user, exercise=exercise)
+        cutoff = _period_cutoff(period, today)
+        logs = all_logs if cutoff is None else all_logs.filter(date__gte=cutoff)
+
+        # Best all-time e conteggi (totale e del periodo) in un'unica query.
+        totals = all_logs.aggregate(
+            best_one_rm=Max('one_rm'),
+            best_reps=Max('reps'),
+            total_log_count=Count('id'),
+            log_count=Count('id') if cutoff is None else Count('id', filter=Q(date__gte=cutoff)),
+        )
 
-    # Tutti i log — usati per best all-time e conteggio totale
-    all_logs = (
-        ExerciseLog.objects
-        .filter(user=request.user, exercise=exercise)
-        .order_by('date', 'id')
-    )
-
-    if not all_logs.exists():
-        messages.info(request, f'Nessun log trovato per "{exercise.name}".')
-
-    best = all_logs.aggregate(best_one_rm=Max('one_rm'))['best_one_rm']
-    best_reps = all_logs.aggregate(best_reps=Max('reps'))['best_reps']
-    total_log_count = all_logs.count()
+        # Dati per Chart.js, ridotti ai punti che lo schermo può mostrare:
+        # per il corpo libero la curva è quella delle ripetizioni.
+        chart_data = list(logs.order_by('date', 'id').values('id', 'date', 'one_rm', 'weight', 'reps', 'sets'))
+        chart_data = downsample(
+            chart_data, 'progress', value_key='reps' if exercise.is_bodyweight else 'one_rm'
+        )
 
-    # ── Filtro temporale ──────────────────────────────────────────
-    PERIODS = {'3m': 90, '6m': 180, '1y': 365, 'all': None}
-    period = request.GET.get('period', 'all')
-    if period not in PERIODS:
-        period = 'all'
+        # Tendenza e media mobile sempre sull'intero storico, come il best.
+        trend, rolling = None, {}
+        if not exercise.is_bodyweight:
+            series = analytics.StrengthSeries.load(request.user, exercise_ids=[exercise.pk])
+            trend = analytics.trends(series).get(exercise.pk)
+            rolling = dict(zip(series.ids.tolist(), analytics.rolling_mean(series).round(2).tolist()))
+
+        for entry in chart_data:
+            log_id = entry.pop('id')
+            entry['date'] = entry['date'].strftime('%d/%m/%Y')
+            entry['one_rm'] = round(float(entry['one_rm']), 2) if entry['one_rm'] is not None else None
+            entry['weight'] = round(float(entry['weight']), 2) if entry['weight'] is not None else None
+            entry['trend'] = rolling.get(log_id)
+
+        history, next_cursor = _history_page(logs)
+        return {
+            **totals,
+            'logs': history,
+            'next_cursor': next_cursor,
+            'chart_data': json.dumps(chart_data),
+            'trend': trend,
+            'records': list(
+                PersonalRecord.objects.filter(user=request.user, exercise=exercise)
+            ),
+        }
 
-    days = PERIODS[period]
-    if days is not None:
-        cutoff = date.today() - timedelta(days=days)
-        logs = all_logs.filter(date__gte=cutoff)
-    else:
-        logs = all_logs
+    # La data entra nella chiave perché sposta l'inizio del periodo.
+    context = cached_for_user(
+        request.user, 'exercise_progress', build, exercise.pk, period, today
+    )
+    if not context['total_log_count']:
+        messages.info(request, f'Nessun log trovato per "{exercise.name}".')
 
-    # Dati per Chart.js
-    chart_data = list(logs.values('date', 'one_rm', 'weight', 'reps', 'sets'))
-    for entry in chart_data:
-        entry['date'] = entry['date'].strftime('%d/%m/%Y')
-        entry['one_rm'] = round(float(entry['one_rm']), 2) if entry['one_rm'] is not None else None
-        entry['weight'] = round(float(entry['weight']), 2) if entry['weight'] is not None else None
+    # Obiettivo di 1RM scelto dall'utente: la proiezione costa una
+    # divisione, resta fuori dalla cache.
+    goal = _parse_goal(request.GET.get('goal'))
+    weeks_to_goal = analytics.weeks_to_goal(context['trend'], goal) if goal else None
 
     PERIOD_LABELS = {
         '3m':  '3 mesi',
@@ -476,62 +860,77 @@ def exercise_progress(request, exercise_id):
         'all': 'Tutto',
     }
     return render(request, 'gym/progress.html', {
+        **context,
         'exercise': exercise,
-        'logs': logs.order_by('-date', '-id'),
-        'best_one_rm': best,
-        'best_reps': best_reps,
-        'chart_data': json.dumps(chart_data),
-        'log_count': logs.count(),
-        'total_log_count': total_log_count,
+        'goal': goal,
+        'weeks_to_goal': weeks_to_goal,
         'period': period,
         'period_label': PERIOD_LABELS[period],
         'periods': list(PERIOD_LABELS.items()),
     })
 
 
+@login_required
+def exercise_history(request, exercise_id):
+    """
+    Pagina successiva dello storico di un esercizio ("Carica altri").
+    Restituisce le righe già renderizzate, con lo stesso markup della pagina,
+    e il cursore per la pagina dopo (null se è l'ultima).
+    """
+    exercise = get_object_or_404(Exercise, pk=exercise_id)
+    after = _parse_history_cursor(request.GET.get('after'))
+    if after is None:
+        return JsonResponse({'error': 'Cursore non valido.'}, status=400)
+
+    logs = ExerciseLog.objects.filter(user=request.user, exercise=exercise)
+    cutoff = _period_cutoff(_progress_period(request), date.today())
+    if cutoff is not None:
+        logs = logs.filter(date__gte=cutoff)
+
+    page, next_cursor = _history_page(logs, after)
+    return JsonResponse({
+        'html': render_to_string(
+            'gym/_log_history_rows.html', {'logs': page, 'exercise': exercise}, request=request
+        ),
+        'next_cursor': next_cursor,
+    })
+
 
 @login_required
+@user_conditional_page('progress_overview')
 def progress_overview(request):
     """
     Panoramica di tutti gli esercizi loggati dall'utente,
     con il miglior 1RM per ciascuno.
     """
-    exercise_ids = (
-    ExerciseLog.objects
-    .filter(user=request.user)
-    .order_by('exercise_id')   # annulla l'ordinamento default prima del distinct
-    .values_list('exercise_id', flat=True)
-    .distinct()
-)
-    exercises_with_best = []
-    for ex_id in exercise_ids:
-        exercise = Exercise.objects.get(pk=ex_id)
-        best = ExerciseLog.objects.filter(
-            user=request.user, exercise=exercise
-        ).aggregate(best=Max('one_rm'))['best']
-        best_reps = ExerciseLog.objects.filter(
-            user=request.user, exercise=exercise
-        ).aggregate(best=Max('reps'))['best']
-        last_log = ExerciseLog.objects.filter(
-            user=request.user, exercise=exercise
-        ).order_by('-date', '-id').first()
-        exercises_with_best.append({
-            'exercise': exercise,
-            'best_one_rm': best,
-            'best_reps': best_reps,
-            'last_log': last_log,
-        })
-
-    exercises_with_best.sort(key=lambda x: x['exercise'].muscle_group)
+    def build():
+        # Le statistiche per esercizio hanno già migliori valori e ultimo
+        # log: una sola query indipendentemente dal numero di esercizi.
+        all_stats = (
+            ExerciseStats.objects
+            .filter(user=request.user)
+            .select_related('exercise', 'last_log')
+            .order_by('exercise__muscle_group', 'exercise_id')
+        )
+        return [
+            {
+                'exercise': stats.exercise,
+                'best_one_rm': stats.best_one_rm,
+                'best_reps': stats.best_reps,
+                'last_log': stats.last_log,
+            }
+            for stats in all_stats
+        ]
 
     return render(request, 'gym/progress_overview.html', {
-        'exercises': exercises_with_best,
+        'exercises': cached_for_user(request.user, 'progress_overview', build),
     })
 
 
 # ─── Exercises ────────────────────────────────────────────────────────────────
 
 @login_required
+@user_conditional_page('exercise_list')
 def exercise_list(request):
     muscle_filter = request.GET.get('muscle', '')
     exercises = Exercise.objects.all()
@@ -549,32 +948,32 @@ def exercise_list(request):
 @login_required
 def exercise_autocomplete(request):
     """
-    Endpoint JSON per l'autocompletamento degli esercizi.
-    Cerca per sottostringa (icontains) su nome e gruppo muscolare.
-    Restituisce max 10 risultati.
+    Endpoint JSON per l'autocompletamento degli esercizi: cerca nell'indice
+    in memoria (gym/search.py), senza accenti né maiuscole, e ordina per
+    pertinenza. Restituisce max 10 risultati.
     """
     query = request.GET.get('q', '').strip()
     if len(query) < 2:
         return JsonResponse({'results': []})
+    return JsonResponse({'results': search.search_exercises(query, limit=10)})
 
-    exercises = (
-        Exercise.objects
-        .filter(name__icontains=query)
-        .order_by('muscle_group', 'name')[:10]
-        .values('id', 'name', 'muscle_group', 'is_bodyweight')
-    )
-    results = [
-        {
-            'id': ex['id'],
-            'name': ex['name'],
-            'muscle_group': dict(
-                __import__('gym.models', fromlist=['MuscleGroup']).MuscleGroup.choices
-            ).get(ex['muscle_group'], ex['muscle_group']),
-            'is_bodyweight': ex['is_bodyweight'],
-        }
-        for ex in exercises
-    ]
-    return JsonResponse({'results': results})
+
+@login_required
+def exercise_catalog(request, digest):
+    """
+    Catalogo esercizi completo in JSON (vedi gym/catalog.py). L'URL contiene
+    l'hash del contenuto, quindi la risposta non cambia mai e il browser la
+    tiene in cache per sempre; un hash vecchio rimanda a quello corrente.
+    """
+    snapshot = catalog.snapshot()
+    if digest != snapshot.digest:
+        response = redirect('exercise_catalog', digest=snapshot.digest)
+        response['Cache-Control'] = 'no-cache'
+        return response
+    response = HttpResponse(snapshot.json, content_type='application/json')
+    # private: risponde solo agli utenti autenticati.
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
 
 
 @login_required
@@ -646,126 +1045,60 @@ def plan_export(request, pk):
     writer = csv.writer(response)
     writer.writerow(['piano', plan.name, plan.description or ''])
     writer.writerow(['esercizio', 'gruppo_muscolare', 'serie', 'ripetizioni', 'ordine', 'note', 'corpo_libero'])
-    for pe in planned:
+    # "ordine" è la posizione nella scheda, non la chiave interna.
+    for position, pe in enumerate(planned, start=1):
         writer.writerow([
             pe.exercise.name,
             pe.exercise.muscle_group,
             pe.target_sets,
             pe.target_reps,
-            pe.order,
+            position,
             pe.notes or '',
             'si' if pe.exercise.is_bodyweight else 'no',
         ])
     return response
 
 
-@login_required
-def plan_import(request):
-    """Importa una scheda da CSV."""
-    import csv
-    import io
+def _report_import(request, result):
+    """Mostra come messaggi l'esito di un import (vedi gym/imports.py)."""
+    for level, text in result['messages']:
+        messages.add_message(request, getattr(messages, level.upper()), text)
 
-    if request.method != 'POST':
-        return render(request, 'gym/plan_import.html')
 
+def _import_upload(request):
+    """File CSV della richiesta di import, o None dopo aver segnalato l'errore."""
     csv_file = request.FILES.get('csv_file')
     if not csv_file:
         messages.error(request, 'Nessun file selezionato.')
-        return render(request, 'gym/plan_import.html')
-
-    if not csv_file.name.endswith('.csv'):
+        return None
+    if not csv_file.name.lower().endswith('.csv'):
         messages.error(request, 'Il file deve essere in formato CSV.')
-        return render(request, 'gym/plan_import.html')
-
-    try:
-        content = csv_file.read().decode('utf-8-sig')  # utf-8-sig gestisce il BOM
-        reader = csv.reader(io.StringIO(content))
-        rows = list(reader)
-
-        if len(rows) < 2:
-            messages.error(request, 'Il file CSV è vuoto o non valido.')
-            return render(request, 'gym/plan_import.html')
-
-        # Prima riga: piano, nome, descrizione
-        first_row = rows[0]
-        if len(first_row) < 2 or first_row[0] != 'piano':
-            messages.error(request, 'Formato CSV non valido. Usa un file esportato da GymIt.')
-            return render(request, 'gym/plan_import.html')
-
-        plan_name = first_row[1].strip()
-        plan_description = first_row[2].strip() if len(first_row) > 2 else ''
-
-        # Seconda riga: intestazioni — salta
-        # Righe successive: esercizi
-        exercise_rows = rows[2:]
-        if not exercise_rows:
-            messages.error(request, 'La scheda non contiene esercizi.')
-            return render(request, 'gym/plan_import.html')
-
-        # Crea la scheda
-        from django.db.models import Max as DMax
-        last_order = WorkoutPlan.objects.filter(user=request.user).aggregate(DMax('order'))['order__max']
-        plan = WorkoutPlan.objects.create(
-            user=request.user,
-            name=plan_name,
-            description=plan_description,
-            order=(last_order or 0) + 1,
-        )
+        return None
+    return csv_file
 
-        created_exercises = []
-        for i, row in enumerate(exercise_rows, start=1):
-            if len(row) < 4:
-                plan.delete()
-                messages.error(request, f'Riga {i+2} non valida: dati insufficienti.')
-                return render(request, 'gym/plan_import.html')
-
-            ex_name = row[0].strip()
-            ex_muscle = row[1].strip()
-            try:
-                target_sets = int(row[2])
-                target_reps = int(row[3])
-            except ValueError:
-                plan.delete()
-                messages.error(request, f'Riga {i+2}: serie e ripetizioni devono essere numeri interi.')
-                return render(request, 'gym/plan_import.html')
-
-            order = int(row[4]) if len(row) > 4 and row[4].strip().isdigit() else i
-            notes = row[5].strip() if len(row) > 5 else ''
-            # Colonna opzionale (assente nei CSV esportati prima di questa
-            # funzionalità): esercizi senza questa colonna sono considerati
-            # "con pesi", coerente col default del modello.
-            is_bodyweight = row[6].strip().lower() in ('si', 'sì', 'yes', 'true', '1') if len(row) > 6 else False
-
-            # Crea l'esercizio se non esiste
-            exercise, was_created = Exercise.objects.get_or_create(
-                name=ex_name,
-                defaults={
-                    'muscle_group': ex_muscle or MuscleGroup.FULL_BODY,
-                    'is_bodyweight': is_bodyweight,
-                }
-            )
-            if was_created:
-                created_exercises.append(ex_name)
-
-            PlannedExercise.objects.create(
-                plan=plan,
-                exercise=exercise,
-                target_sets=target_sets,
-                target_reps=target_reps,
-                order=order,
-                notes=notes,
-            )
 
-        msg = f'Scheda "{plan_name}" importata con successo.'
-        if created_exercises:
-            msg += f' Esercizi creati automaticamente: {", ".join(created_exercises)}.'
-        messages.success(request, msg)
-        return redirect('plan_detail', pk=plan.pk)
+@login_required
+def plan_import(request):
+    """
+    Importa una scheda da CSV (vedi imports.import_plan). Un file grande
+    viene accodato per il worker e si passa alla pagina del job.
+    """
+    if request.method != 'POST':
+        return render(request, 'gym/plan_import.html')
 
-    except Exception as e:
-        messages.error(request, f'Errore durante l\'importazione: {str(e)}')
+    csv_file = _import_upload(request)
+    if csv_file is None:
         return render(request, 'gym/plan_import.html')
 
+    if csv_file.size > settings.GYM_IMPORT_INLINE_MAX_BYTES:
+        job = jobs.enqueue(request.user, ImportJob.Kind.PLAN, csv_file)
+        return redirect('import_job_detail', pk=job.pk)
+
+    result = imports.import_plan(request.user, csv_file)
+    _report_import(request, result)
+    if not result['ok']:
+        return render(request, 'gym/plan_import.html')
+    return redirect('plan_detail', pk=result['plan_id'])
 
 
 # ─── Sessioni di allenamento e calendario ─────────────────────────────────────
@@ -778,86 +1111,6 @@ MONTH_NAMES_IT = [
 ]
 WEEKDAY_NAMES_IT = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
 
-# Etichette che identificano una riga di intestazione nel CSV importato.
-HEADER_LABELS = {'data', 'date', 'giorno', 'data allenamento'}
-
-
-def _parse_session_date(raw):
-    """
-    Accetta sia il formato ISO (AAAA-MM-GG) sia quello italiano (GG/MM/AAAA),
-    perché i CSV esportati da Excel in locale italiana usano il secondo.
-    """
-    raw = (raw or '').strip()
-    if not raw:
-        return None
-    parsed = parse_date(raw)
-    if parsed:
-        return parsed
-    for fmt in ('%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y'):
-        try:
-            return datetime.strptime(raw, fmt).date()
-        except ValueError:
-            continue
-    return None
-
-
-# Separatori accettati nei CSV importati: la virgola è lo standard, ma
-# Excel in locale italiana esporta col punto e virgola, e capita di ricevere
-# file separati da tabulazione o pipe.
-CSV_DELIMITERS = [',', ';', '\t', '|']
-
-
-# Come mostrare i separatori nei messaggi d'errore.
-DELIMITER_LABELS = {',': 'virgola', ';': 'punto e virgola', '\t': 'tabulazione', '|': 'barra verticale'}
-
-
-def _detect_delimiter(content):
-    """
-    Sceglie il separatore provando davvero a interpretare il file con
-    ciascun candidato e premiando quello che produce più righe valide
-    (almeno due colonne e una data riconoscibile nella prima).
-
-    Contare le occorrenze non basterebbe: in un file separato da punto e
-    virgola un nome scheda come "Push, Pull, Legs" contiene più virgole che
-    punti e virgola e farebbe scegliere il separatore sbagliato. csv.Sniffer
-    a sua volta è inaffidabile su file di due sole colonne.
-    """
-    import csv
-
-    best_delimiter, best_score = ',', -1
-    for delimiter in CSV_DELIMITERS:
-        rows = [
-            row for row in csv.reader(io.StringIO(content), delimiter=delimiter)
-            if any(cell.strip() for cell in row)
-        ]
-        # Una riga vale se ha due colonne e una data leggibile: è esattamente
-        # lo schema che l'import si aspetta.
-        score = sum(
-            1 for row in rows
-            if len(row) >= 2 and _parse_session_date(row[0]) is not None
-        )
-        # A parità di righe valide vince il primo candidato (la virgola),
-        # che è il formato canonico del template scaricabile.
-        if score > best_score:
-            best_delimiter, best_score = delimiter, score
-
-    if best_score > 0:
-        return best_delimiter
-
-    # Nessun candidato produce righe valide (es. solo intestazione, o date
-    # tutte malformate): ripiega su quello che almeno spezza le righe in due
-    # colonne, così l'utente riceve errori di data invece di "manca una colonna".
-    for delimiter in CSV_DELIMITERS:
-        rows = [
-            row for row in csv.reader(io.StringIO(content), delimiter=delimiter)
-            if any(cell.strip() for cell in row)
-        ]
-        if rows and all(len(row) >= 2 for row in rows):
-            return delimiter
-
-    return ','
-
-
 @login_required
 def session_template_download(request):
     """Scarica un CSV di esempio già nel formato accettato dall'import."""
@@ -929,7 +1182,7 @@ def session_create(request):
     session_date = timezone.localdate()
     raw_date = request.POST.get('date', '').strip()
     if raw_date:
-        parsed = _parse_session_date(raw_date)
+        parsed = imports.parse_session_date(raw_date)
         if parsed is None:
             messages.error(request, 'Data non valida.')
             return _back()
@@ -969,7 +1222,30 @@ def session_delete(request, pk):
     )
 
 
+def _day_detail(target, sessions, today):
+    """Dettaglio di una giornata per il modale del calendario."""
+    return {
+        'date': target.isoformat(),
+        'date_label': f'{target.day} {MONTH_NAMES_IT[target.month - 1]} {target.year}',
+        # Nel futuro non si registra nulla: il client nasconde il bottone
+        # invece di far scoprire il divieto solo dopo l'invio.
+        'can_log': target <= today,
+        'sessions': [
+            {
+                'id': s.id,
+                'plan_name': s.plan_name,
+                'plan_id': s.plan_id,
+                'is_free': s.is_free,
+                'delete_url': reverse('session_delete', args=[s.id]),
+                'plan_url': reverse('plan_detail', args=[s.plan_id]) if s.plan_id else None,
+            }
+            for s in sessions
+        ],
+    }
+
+
 @login_required
+@user_conditional_page('workout_calendar', window=today_window)
 def workout_calendar(request):
     """
     Calendario mensile delle giornate di allenamento.
@@ -1004,6 +1280,7 @@ def workout_calendar(request):
 
     cal = pycalendar.Calendar(firstweekday=0)  # 0 = lunedì
     weeks = []
+    day_index = {}
     for week in cal.monthdayscalendar(year, month):
         row = []
         for day in week:
@@ -1012,6 +1289,10 @@ def workout_calendar(request):
                 continue
             cell_date = date(year, month, day)
             day_sessions = sessions_by_day.get(day, [])
+            # Dettaglio per il modale, lo stesso di session_day_detail: la
+            # pagina lo porta con sé, così aprire una giornata non richiede
+            # rete (ordine come nel dettaglio: dalla più recente).
+            day_index[day] = _day_detail(cell_date, reversed(day_sessions), today)
             row.append({
                 'day': day,
                 'date': cell_date,
@@ -1029,19 +1310,19 @@ def workout_calendar(request):
     last_day = pycalendar.monthrange(year, month)[1]
     next_month_date = date(year, month, last_day) + timedelta(days=1)
 
-    # Giorni distinti allenati, base per tutte le statistiche.
-    unique_dates = sorted(
-        set(
-            WorkoutSession.objects
-            .filter(user=request.user)
-            .values_list('date', flat=True)
-        ),
-        reverse=True,
-    )
+    # Statistiche dal riepilogo precalcolato (TrainingSummary/TrainingWeek):
+    # due letture di una riga invece di tutte le date dello storico.
+    summary = TrainingSummary.objects.filter(user=request.user).first()
+    total_days_trained = summary.total_days if summary else 0
 
     # Settimana corrente lunedì–domenica, coerente con la griglia del calendario.
-    week_start = today - timedelta(days=today.weekday())
-    days_this_week = sum(1 for d in unique_dates if week_start <= d <= today)
+    week_start = TrainingWeek.start_of(today)
+    days_this_week = (
+        TrainingWeek.objects
+        .filter(user=request.user, week_start=week_start)
+        .values_list('days', flat=True)
+        .first()
+    ) or 0
 
     # Media settimanale sulle sole settimane concluse: quella in corso è ancora
     # parziale e, se contata, farebbe scendere la media ogni lunedì.
@@ -1050,13 +1331,14 @@ def workout_calendar(request):
     # tenerne i giorni al numeratore dividendoli per le sole settimane
     # precedenti gonfierebbe il risultato.
     weekly_average = 0
-    if unique_dates:
-        first_date = unique_dates[-1]
-        first_week_start = first_date - timedelta(days=first_date.weekday())
+    if total_days_trained:
+        first_week_start = TrainingWeek.start_of(summary.first_date)
         completed_weeks = (week_start - first_week_start).days // 7
 
         if completed_weeks:
-            days_before_this_week = sum(1 for d in unique_dates if d < week_start)
+            # Le date future non sono ammesse: tutto ciò che non è in questa
+            # settimana è nelle precedenti.
+            days_before_this_week = total_days_trained - days_this_week
             weekly_average = round(days_before_this_week / completed_weeks, 1)
         else:
             # Primo allenamento in questa stessa settimana: non c'è ancora una
@@ -1079,6 +1361,7 @@ def workout_calendar(request):
     return render(request, 'gym/calendar.html', {
         'picker_plans': picker_plans,
         'weeks': weeks,
+        'day_index': day_index,
         'year': year,
         'month': month,
         'month_name': MONTH_NAMES_IT[month - 1],
@@ -1091,167 +1374,192 @@ def workout_calendar(request):
         'days_trained_this_month': len(sessions_by_day),
         'days_this_week': days_this_week,
         'weekly_average': weekly_average,
+        'current_streak': summary.current_streak(today) if summary else 0,
+        'longest_streak': summary.longest_streak if summary else 0,
         # Non mostrato come statistica: serve solo a decidere lo stato vuoto.
-        'total_days_trained': len(unique_dates),
+        'total_days_trained': total_days_trained,
         'is_current_month': (year, month) == (today.year, today.month),
     })
 
 
 @login_required
 def session_day_detail(request, year, month, day):
-    """Dettaglio JSON di una giornata — alimenta il modale del calendario."""
+    """
+    Dettaglio JSON di una giornata. Il calendario lo riceve già con la
+    pagina per tutto il mese: questa view resta come ripiego.
+    """
     try:
         target = date(year, month, day)
     except ValueError:
         return JsonResponse({'error': 'Data non valida.'}, status=400)
 
     sessions = WorkoutSession.objects.filter(user=request.user, date=target)
-    return JsonResponse({
-        'date': target.isoformat(),
-        'date_label': f'{day} {MONTH_NAMES_IT[month - 1]} {year}',
-        # Nel futuro non si registra nulla: il client nasconde il bottone
-        # invece di far scoprire il divieto solo dopo l'invio.
-        'can_log': target <= timezone.localdate(),
-        'sessions': [
-            {
-                'id': s.id,
-                'plan_name': s.plan_name,
-                'plan_id': s.plan_id,
-                'is_free': s.is_free,
-                'delete_url': reverse('session_delete', args=[s.id]),
-                'plan_url': reverse('plan_detail', args=[s.plan_id]) if s.plan_id else None,
-            }
-            for s in sessions
-        ],
-    })
+    return JsonResponse(_day_detail(target, sessions, timezone.localdate()))
+
+
+# Intervallo massimo della heatmap: tre anni bastano per confrontare
+# stagioni e limitano la risposta a un migliaio di giorni.
+HEATMAP_MAX_DAYS = 3 * 366
+
+
+def _heatmap_range(request):
+    """
+    Intervallo richiesto (start, end), estremi inclusi; di default l'ultimo
+    anno fino a oggi. None se i parametri non sono validi.
+    """
+    end = timezone.localdate()
+    start = end - timedelta(days=364)
+    try:
+        if request.GET.get('end'):
+            end = parse_date(request.GET['end'])
+        if request.GET.get('start'):
+            start = parse_date(request.GET['start'])
+        elif request.GET.get('end'):
+            start = end - timedelta(days=364)
+    except (TypeError, ValueError):
+        return None
+    if start is None or end is None or start > end:
+        return None
+    if (end - start).days >= HEATMAP_MAX_DAYS:
+        return None
+    return start, end
+
+
+def _heatmap_etag(request):
+    bounds = _heatmap_range(request)
+    return user_etag(request, 'heatmap', *bounds) if bounds else None
+
+
+def _heatmap_last_modified(request):
+    return user_last_modified(request) if _heatmap_range(request) else None
 
 
 @login_required
-def session_import(request):
+@condition(etag_func=_heatmap_etag, last_modified_func=_heatmap_last_modified)
+def calendar_heatmap(request):
     """
-    Importa allenamenti passati da CSV (colonne: data, nome scheda).
+    Conteggio delle sessioni per giorno in un intervallo (?start=&end=,
+    AAAA-MM-GG), per la heatmap annuale: una sola query raggruppata per
+    data sull'indice (user, -date) invece di una richiesta per mese.
 
-    Le schede sconosciute non vengono create: la sessione conserva solo il
-    nome, così lo storico è completo senza riempire la lista schede di voci
-    fantasma provenienti dal passato.
+    Con ETag e Last-Modified la PWA rivalida a costo di una lettura della
+    versione dati: finché l'utente non scrive nulla la risposta è un 304.
     """
-    import csv
-    import io
+    bounds = _heatmap_range(request)
+    if bounds is None:
+        return JsonResponse(
+            {'error': f'Intervallo non valido (massimo {HEATMAP_MAX_DAYS} giorni).'},
+            status=400,
+        )
+    start, end = bounds
 
-    if request.method != 'POST':
-        return render(request, 'gym/session_import.html')
+    rows = (
+        WorkoutSession.objects
+        .filter(user=request.user, date__gte=start, date__lte=end)
+        .order_by('date')
+        .values('date')
+        # Un giorno è "solo libero" se non ha sessioni da scheda: stesso
+        # criterio della griglia mensile.
+        .annotate(count=Count('id'), planned=Count('id', filter=Q(is_free=False)))
+    )
+    response = JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': {
+            row['date'].isoformat(): {'count': row['count'], 'only_free': not row['planned']}
+            for row in rows
+        },
+    })
+    # Sempre rivalidata: la copia in cache vale finché l'ETag coincide.
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
-    csv_file = request.FILES.get('csv_file')
-    if not csv_file:
-        messages.error(request, 'Nessun file selezionato.')
-        return render(request, 'gym/session_import.html')
 
-    if not csv_file.name.lower().endswith('.csv'):
-        messages.error(request, 'Il file deve essere in formato CSV.')
+@login_required
+def session_import(request):
+    """
+    Importa allenamenti passati da CSV (vedi imports.import_sessions). Un
+    file grande viene accodato per il worker e si passa alla pagina del job.
+    """
+    if request.method != 'POST':
         return render(request, 'gym/session_import.html')
 
-    try:
-        content = csv_file.read().decode('utf-8-sig')  # utf-8-sig gestisce il BOM
-    except UnicodeDecodeError:
-        messages.error(request, 'Impossibile leggere il file: salvalo con codifica UTF-8.')
+    csv_file = _import_upload(request)
+    if csv_file is None:
         return render(request, 'gym/session_import.html')
 
-    delimiter = _detect_delimiter(content)
-    reader = csv.reader(io.StringIO(content), delimiter=delimiter)
-    rows = [row for row in reader if any(cell.strip() for cell in row)]
+    if csv_file.size > settings.GYM_IMPORT_INLINE_MAX_BYTES:
+        job = jobs.enqueue(request.user, ImportJob.Kind.SESSIONS, csv_file)
+        return redirect('import_job_detail', pk=job.pk)
 
-    if not rows:
-        messages.error(request, 'Il file CSV è vuoto.')
+    result = imports.import_sessions(request.user, csv_file)
+    _report_import(request, result)
+    if not result['ok']:
         return render(request, 'gym/session_import.html')
+    return redirect('workout_calendar')
 
-    # Intestazione opzionale: la riconosco dall'etichetta, non dal fatto che
-    # la prima cella non sia una data — altrimenti una riga con data scritta
-    # male verrebbe scartata in silenzio invece di essere segnalata.
-    if rows[0] and rows[0][0].strip().lower() in HEADER_LABELS:
-        rows = rows[1:]
 
-    if not rows:
-        messages.error(request, 'Il file CSV non contiene righe di dati.')
-        return render(request, 'gym/session_import.html')
+# Classi Bootstrap per i livelli dei messaggi salvati sui job.
+IMPORT_ALERT_CLASSES = {'success': 'success', 'info': 'info', 'warning': 'warning', 'error': 'danger'}
 
-    today = timezone.localdate()
-    # Le schede esistenti vengono ricollegate per nome, così il calendario
-    # può linkare alla scheda quando questa esiste ancora.
-    plans_by_name = {p.name: p for p in WorkoutPlan.objects.filter(user=request.user)}
-
-    to_create = []
-    seen = set()
-    errors = []
-    skipped_future = 0
-
-    for i, row in enumerate(rows, start=1):
-        if len(row) < 2:
-            errors.append(
-                f'Riga {i}: servono due colonne (data e nome scheda) '
-                f'separate da {DELIMITER_LABELS.get(delimiter, delimiter)}.'
-            )
-            continue
 
-        raw_date = row[0].strip()
-        plan_name = row[1].strip()
+def _import_job_next(job):
+    """Dove proseguire quando il job è finito: il risultato o di nuovo il form."""
+    if job.status != ImportJob.Status.DONE:
+        return reverse('plan_import' if job.kind == ImportJob.Kind.PLAN else 'session_import')
+    if job.kind == ImportJob.Kind.PLAN:
+        plan_id = job.result.get('plan_id')
+        if WorkoutPlan.objects.filter(pk=plan_id, user_id=job.user_id).exists():
+            return reverse('plan_detail', kwargs={'pk': plan_id})
+        return reverse('plan_list')
+    return reverse('workout_calendar')
 
-        if not plan_name:
-            errors.append(f'Riga {i}: nome scheda mancante.')
-            continue
-        if len(plan_name) > 100:
-            errors.append(f'Riga {i}: nome scheda troppo lungo (max 100 caratteri).')
-            continue
 
-        parsed = _parse_session_date(raw_date)
-        if parsed is None:
-            errors.append(
-                f'Riga {i}: data non valida (usa AAAA-MM-GG oppure GG/MM/AAAA).'
-            )
-            continue
-        if parsed > today:
-            skipped_future += 1
-            continue
-
-        key = (parsed, plan_name)
-        if key in seen:
-            continue  # duplicato interno al file
-        seen.add(key)
-
-        to_create.append(WorkoutSession(
-            user=request.user,
-            date=parsed,
-            plan_name=plan_name,
-            plan=plans_by_name.get(plan_name),
-        ))
-
-    if not to_create:
-        messages.error(request, 'Nessuna riga valida da importare.')
-        for err in errors[:5]:
-            messages.warning(request, err)
-        return render(request, 'gym/session_import.html')
+@login_required
+def import_job_detail(request, pk):
+    """Pagina di un import in background: avanzamento, poi esito."""
+    job = get_object_or_404(ImportJob, pk=pk, user=request.user)
+    context = {'job': job}
+    if job.is_finished:
+        context['alerts'] = [
+            (IMPORT_ALERT_CLASSES.get(level, 'secondary'), text)
+            for level, text in (job.result or {}).get('messages', [])
+        ]
+        context['next_url'] = _import_job_next(job)
+    return render(request, 'gym/import_job.html', context)
 
-    # Conta quante sessioni esistevano già, per dare un resoconto onesto:
-    # ignore_conflicts non dice quali righe sono state effettivamente inserite.
-    existing = set(
-        WorkoutSession.objects
-        .filter(user=request.user, date__in=[s.date for s in to_create])
-        .values_list('date', 'plan_name')
-    )
-    new_count = sum(1 for s in to_create if (s.date, s.plan_name) not in existing)
 
-    WorkoutSession.objects.bulk_create(to_create, ignore_conflicts=True)
+@login_required
+def import_job_status(request, pk):
+    """Stato di un import in background, interrogato dalla pagina del job."""
+    job = get_object_or_404(ImportJob, pk=pk, user=request.user)
+    response = JsonResponse({
+        'status': job.status,
+        'finished': job.is_finished,
+        'progress': job.progress,
+        'rows': job.rows,
+    })
+    response['Cache-Control'] = 'no-store'
+    return response
 
-    duplicates = len(to_create) - new_count
-    msg = f'{new_count} allenamenti importati.'
-    if duplicates:
-        msg += f' {duplicates} già presenti sono stati ignorati.'
-    messages.success(request, msg)
 
-    if skipped_future:
-        messages.info(request, f'{skipped_future} righe con data futura ignorate.')
-    for err in errors[:5]:
-        messages.warning(request, err)
-    if len(errors) > 5:
-        messages.warning(request, f'... e altri {len(errors) - 5} errori.')
+# ─── Esportazione account ─────────────────────────────────────────────────────
 
-    return redirect('workout_calendar')
+@login_required
+def account_export(request):
+    """
+    Scarica tutti i dati dell'utente (vedi gym/exports.py): zip di CSV, o
+    NDJSON con ?format=ndjson. La risposta è generata a flusso, senza
+    caricare in memoria lo storico.
+    """
+    fmt = request.GET.get('format', 'zip')
+    if fmt not in exports.FORMATS:
+        fmt = 'zip'
+    filename = exports.export_filename(request.user, fmt, timezone.localdate())
+    response = StreamingHttpResponse(
+        exports.iter_export(request.user, fmt),
+        content_type=exports.FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
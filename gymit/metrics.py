@@ -0,0 +1,272 @@
+"""
+Metriche di latenza e query per URL in formato Prometheus, senza un APM
+esterno.
+
+Ogni processo accumula in memoria gli incrementi di contatori e
+istogrammi a bucket fissi (REGISTRY) e al più ogni
+GYM_METRICS_FLUSH_SECONDS li somma in un database SQLite condiviso
+(GYM_METRICS_DB): i worker di gunicorn scrivono tutti nello stesso file e
+/metrics espone il totale. Nel file ci sono solo somme, quindi un worker
+che riparte non azzera nulla, come Prometheus si aspetta dai counter; il
+p95 si ricava con histogram_quantile() sui bucket. Senza GYM_METRICS_DB
+(il default, ad es. in sviluppo e nei test) non si scrive nessun file e
+/metrics mostra solo i valori del processo che risponde.
+
+Le misure arrivano da ServerTimingMiddleware (gymit/middleware.py), una
+per richiesta, etichettate col nome dell'URL: mai col percorso, che
+moltiplicherebbe le serie (una per id). Per lo stesso motivo i metodi HTTP
+fuori da METHODS, che il client può inventare, diventano OTHER.
+
+/metrics è riservato allo staff; lo scraper si autentica con l'header
+"Authorization: Bearer <GYM_METRICS_TOKEN>".
+"""
+import hmac
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+
+logger = logging.getLogger('gymit.metrics')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Etichetta "view" delle richieste che non corrispondono a nessun URL.
+UNMATCHED = '<unmatched>'
+
+# Valori ammessi dell'etichetta "method"; gli altri diventano OTHER.
+METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+OTHER_METHOD = 'OTHER'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+)
+"""
+_UPSERT = """
+INSERT INTO samples (name, labels, value) VALUES (?, ?, ?)
+ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value
+"""
+
+
+def _format(value):
+    if value == math.inf:
+        return '+Inf'
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels_text(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name, help, labels):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def _pairs(self, labels):
+        return [[name, str(labels[name])] for name in self.labels]
+
+    def _header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.add(self.name, self._pairs(labels), amount)
+
+    def render(self, samples):
+        lines = self._header()
+        for labels in sorted(labels for name, labels in samples if name == self.name):
+            lines.append(f'{self.name}{_labels_text(json.loads(labels))} {_format(samples[self.name, labels])}')
+        return lines
+
+
+class Histogram(Metric):
+    """
+    Istogramma a bucket fissi. I bucket sono cumulativi già in memoria
+    (un'osservazione incrementa tutti quelli con `le` maggiore o uguale),
+    quindi le somme tra processi restano valide.
+    """
+    type = 'histogram'
+
+    def __init__(self, registry, name, help, labels, buckets):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def _bucket_pairs(self, pairs, le):
+        return pairs + [['le', _format(le)]]
+
+    def observe(self, value, **labels):
+        pairs = self._pairs(labels)
+        for le in self.buckets:
+            if value <= le:
+                self.registry.add(f'{self.name}_bucket', self._bucket_pairs(pairs, le), 1)
+        self.registry.add(f'{self.name}_sum', pairs, value)
+        self.registry.add(f'{self.name}_count', pairs, 1)
+
+    def render(self, samples):
+        lines = self._header()
+        count_name = f'{self.name}_count'
+        for labels in sorted(labels for name, labels in samples if name == count_name):
+            pairs = json.loads(labels)
+            for le in self.buckets:
+                bucket_pairs = self._bucket_pairs(pairs, le)
+                value = samples.get((f'{self.name}_bucket', json.dumps(bucket_pairs)), 0)
+                lines.append(f'{self.name}_bucket{_labels_text(bucket_pairs)} {_format(value)}')
+            text = _labels_text(pairs)
+            lines.append(f'{self.name}_sum{text} {_format(samples[f"{self.name}_sum", labels])}')
+            lines.append(f'{count_name}{text} {_format(samples[count_name, labels])}')
+        return lines
+
+
+class Registry:
+    """Metriche del processo e incrementi non ancora scritti nel database condiviso."""
+
+    def __init__(self):
+        self.metrics = []
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(self, name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        metric = Histogram(self, name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def add(self, name, pairs, amount):
+        key = (name, json.dumps(pairs))
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + amount
+
+    def reset(self):
+        """Scarta gli incrementi non ancora scritti."""
+        with self._lock:
+            self._pending = {}
+
+    def _connect(self):
+        conn = sqlite3.connect(settings.GYM_METRICS_DB, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(_SCHEMA)
+        return conn
+
+    def flush(self):
+        """Somma gli incrementi del processo nel database condiviso, se c'è."""
+        if not settings.GYM_METRICS_DB:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(_UPSERT, [(name, labels, value) for (name, labels), value in pending.items()])
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            # Le metriche non devono mai far fallire una richiesta: gli
+            # incrementi tornano in memoria per il prossimo tentativo.
+            logger.warning('Scrittura delle metriche in %s non riuscita', settings.GYM_METRICS_DB, exc_info=True)
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + value
+
+    def flush_if_due(self):
+        if time.monotonic() - self._flushed_at >= settings.GYM_METRICS_FLUSH_SECONDS:
+            self.flush()
+
+    def samples(self):
+        """{(nome, etichette): valore} di tutti i processi, o solo di questo."""
+        if not settings.GYM_METRICS_DB:
+            with self._lock:
+                return dict(self._pending)
+        conn = self._connect()
+        try:
+            return {(name, labels): value for name, labels, value in conn.execute('SELECT name, labels, value FROM samples')}
+        finally:
+            conn.close()
+
+    def render(self):
+        """Testo per Prometheus (formato di esposizione 0.0.4)."""
+        samples = self.samples()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render(samples))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter(
+    'gymit_requests_total', 'Richieste servite, per URL, metodo e stato.', ['view', 'method', 'status'],
+)
+REQUEST_DURATION = REGISTRY.histogram(
+    'gymit_request_duration_seconds', 'Durata delle richieste in secondi, per URL.', ['view'],
+)
+REQUEST_SQL_DURATION = REGISTRY.histogram(
+    'gymit_request_sql_seconds', 'Tempo SQL per richiesta in secondi, per URL.', ['view'],
+)
+REQUEST_QUERIES = REGISTRY.histogram(
+    'gymit_request_queries', 'Query SQL per richiesta, per URL.', ['view'], buckets=QUERY_BUCKETS,
+)
+
+
+def observe_request(timing, response):
+    """Registra le misure di una richiesta (vedi gymit/middleware.py)."""
+    view = timing.url_name or UNMATCHED
+    method = timing.request.method if timing.request.method in METHODS else OTHER_METHOD
+    REQUESTS.inc(view=view, method=method, status=response.status_code)
+    REQUEST_DURATION.observe(timing.total_ms / 1000, view=view)
+    REQUEST_SQL_DURATION.observe(timing.sql_ms / 1000, view=view)
+    REQUEST_QUERIES.observe(timing.queries, view=view)
+    REGISTRY.flush_if_due()
+
+
+def _authorized(request):
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = settings.GYM_METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+
+
+def metrics_view(request):
+    """Metriche di tutti i worker in formato Prometheus; solo staff o con token."""
+    if not _authorized(request):
+        raise PermissionDenied
+    # Gli incrementi di questo processo, altrimenti in ritardo fino al
+    # prossimo flush.
+    REGISTRY.flush()
+    response = HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,168 @@
+"""
+Misure di ogni richiesta: numero e tempo delle query SQL, tempo di
+rendering dei template e tempo totale, per capire dove va il tempo di una
+pagina lenta in produzione.
+
+ServerTimingMiddleware le restituisce nell'header Server-Timing (gli
+strumenti per sviluppatori del browser le mostrano nella scheda Rete) solo
+allo staff, o a tutti con GYM_SERVER_TIMING (di default solo con DEBUG):
+numero e tempi delle query aiuterebbero chiunque a sondare il backend.
+Per tutte le richieste le misure vanno invece, come riga JSON col nome
+dell'URL, nel log "gymit.requests": per una frazione casuale
+(GYM_TIMING_SAMPLE_RATE) e sempre oltre GYM_SLOW_REQUEST_MS. Ogni query
+più lenta di GYM_SLOW_QUERY_MS finisce nel log "gymit.sql".
+
+Le query si misurano con connection.execute_wrapper(), i template
+avvolgendo Template._render, lo stesso punto in cui Django aggancia il
+segnale template_rendered durante i test. Le query eseguite durante il
+rendering (queryset valutati nel template) restano nel tempo SQL e non
+in quello dei template: SQL, template e Python si sommano al totale.
+
+Ogni richiesta aggiorna anche le metriche per URL esposte a /metrics
+(gymit/metrics.py).
+
+Il totale si ferma quando la view restituisce la risposta: per quelle a
+flusso (account_export) non comprende la generazione del contenuto.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+
+from . import metrics
+
+logger = logging.getLogger('gymit.requests')
+sql_logger = logging.getLogger('gymit.sql')
+
+# Caratteri di SQL riportati nel log delle query lente.
+SLOW_QUERY_MAX_CHARS = 2000
+
+_current = ContextVar('gymit_request_timing', default=None)
+
+
+class RequestTiming:
+    """Misure di una richiesta, in millisecondi."""
+
+    def __init__(self, request):
+        self.request = request
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.total_ms = 0.0
+        self.rendering = False
+        self._started = time.perf_counter()
+
+    @property
+    def url_name(self):
+        """Nome dell'URL (con namespace), noto solo dopo la risoluzione."""
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else None
+
+    @property
+    def python_ms(self):
+        return max(0.0, self.total_ms - self.sql_ms - self.template_ms)
+
+    def __call__(self, execute, sql, params, many, context):
+        """Wrapper di connection.execute_wrapper(): misura ogni query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.queries += 1
+            self.sql_ms += elapsed
+            if elapsed >= settings.GYM_SLOW_QUERY_MS:
+                # Senza parametri: possono contenere dati personali.
+                sql_logger.warning(json.dumps({
+                    'url': self.url_name,
+                    'path': self.request.path,
+                    'ms': round(elapsed, 1),
+                    'sql': sql[:SLOW_QUERY_MAX_CHARS],
+                }), extra={'slow_query': True})
+
+    def stop(self):
+        self.total_ms = (time.perf_counter() - self._started) * 1000
+
+    def header(self):
+        return ', '.join([
+            f'db;desc="SQL ({self.queries} query)";dur={self.sql_ms:.1f}',
+            f'tpl;desc="Template";dur={self.template_ms:.1f}',
+            f'app;desc="Python";dur={self.python_ms:.1f}',
+            f'total;dur={self.total_ms:.1f}',
+        ])
+
+    def as_dict(self, response):
+        return {
+            'method': self.request.method,
+            'path': self.request.path,
+            'url': self.url_name,
+            'status': response.status_code,
+            'queries': self.queries,
+            'sql_ms': round(self.sql_ms, 1),
+            'template_ms': round(self.template_ms, 1),
+            'python_ms': round(self.python_ms, 1),
+            'total_ms': round(self.total_ms, 1),
+        }
+
+
+def _install_template_timer():
+    """Avvolge Template._render una volta sola per processo."""
+    original = Template._render
+    if getattr(original, 'gymit_timed', False):
+        return
+
+    def _render(template, context):
+        timing = _current.get()
+        # Solo il template più esterno: quelli inclusi sono già nel suo tempo.
+        if timing is None or timing.rendering:
+            return original(template, context)
+        timing.rendering = True
+        sql_before = timing.sql_ms
+        started = time.perf_counter()
+        try:
+            return original(template, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            timing.template_ms += elapsed - (timing.sql_ms - sql_before)
+            timing.rendering = False
+
+    _render.gymit_timed = True
+    Template._render = _render
+
+
+def _is_staff(request):
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated and user.is_staff
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _install_template_timer()
+
+    def __call__(self, request):
+        timing = RequestTiming(request)
+        token = _current.set(timing)
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(timing))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        timing.stop()
+
+        if settings.GYM_SERVER_TIMING or _is_staff(request):
+            response['Server-Timing'] = timing.header()
+        if timing.total_ms >= settings.GYM_SLOW_REQUEST_MS:
+            logger.warning(json.dumps(timing.as_dict(response)), extra={'slow_request': True})
+        elif random.random() < settings.GYM_TIMING_SAMPLE_RATE:
+            logger.info(json.dumps(timing.as_dict(response)))
+        metrics.observe_request(timing, response)
+        return response
@@ -0,0 +1,239 @@
+"""
+Profilazione su richiesta di una singola view, per riprodurre una pagina
+lenta sui dati reali di un utente pesante senza un nuovo deploy.
+
+Uno staff aggiunge ?_profile=cpu (o memory) all'URL, oppure l'header
+"X-Profile: cpu": ProfilingMiddleware esegue la view dentro cProfile o
+tracemalloc e salva il risultato in GYM_PROFILE_DIR, in un file col nome
+dell'URL, l'id dell'utente e l'ora:
+
+    dashboard__u42__20261018-101500-123456.pstats   (cProfile)
+    dashboard__u42__20261018-101500-123456.txt      (allocazioni principali)
+
+Il nome del file torna nell'header X-Profile-Capture della risposta. Per
+chi non è staff il parametro è ignorato.
+
+Per profilare la pagina di un altro utente un superuser aggiunge anche
+?_profile_user=<id> (o l'header X-Profile-User); agli altri staff si
+risponde 403. La view gira con request.user sostituito da quell'utente e
+la cattura porta il suo id. È ammesso solo per GET e HEAD, per non
+modificare dati a suo nome; i messaggi che la view accoda si scartano,
+invece di finire nella sessione di chi profila, e la risposta non
+contiene la pagina ma solo il nome della cattura: si misurano query e
+tempi sui dati dell'utente senza vederli.
+
+Si misura solo la view (non i middleware) e la pagina come la vedrebbe
+l'utente, cache comprese. tracemalloc segue tutto il processo: con più
+thread le allocazioni di richieste concorrenti finiscono nella stessa
+cattura.
+
+Dopo ogni cattura restano solo le GYM_PROFILE_MAX_FILES più recenti; le
+altre si cancellano. Si elencano e scaricano da /admin/profiles/.
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import tracemalloc
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.models import User
+from django.contrib.messages.storage import default_storage
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed
+from django.shortcuts import render
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_USER_PARAM = '_profile_user'
+PROFILE_USER_HEADER = 'X-Profile-User'
+KINDS = {'cpu': 'pstats', 'memory': 'txt'}
+
+# Righe delle statistiche nei riepiloghi testuali.
+TOP_STATS = 60
+# Frame salvati per ogni allocazione: abbastanza per risalire alla view.
+TRACEMALLOC_FRAMES = 10
+
+CAPTURE_RE = re.compile(
+    r'^(?P<view>[\w.-]+)__u(?P<user>\d+)__(?P<stamp>\d{8}-\d{6}-\d{6})\.(?P<ext>pstats|txt)$'
+)
+
+
+def _requested_kind(request):
+    kind = request.GET.get(PROFILE_PARAM) or request.headers.get(PROFILE_HEADER)
+    return kind if kind in KINDS else None
+
+
+def _requested_user(request):
+    """L'utente di cui profilare la pagina: quello della richiesta o un altro."""
+    user_id = request.GET.get(PROFILE_USER_PARAM) or request.headers.get(PROFILE_USER_HEADER)
+    if not user_id:
+        return request.user
+    if not user_id.isdigit():
+        raise Http404
+    try:
+        return User.objects.get(pk=user_id)
+    except User.DoesNotExist:
+        raise Http404
+
+
+def capture_path(url_name, user_id, kind, now=None):
+    """Percorso del file di una nuova cattura."""
+    stamp = (now or datetime.now()).strftime('%Y%m%d-%H%M%S-%f')
+    view = re.sub(r'[^\w.-]', '.', url_name or 'unmatched')
+    return os.path.join(settings.GYM_PROFILE_DIR, f'{view}__u{user_id}__{stamp}.{KINDS[kind]}')
+
+
+def _profile_cpu(path, view_func, request, args, kwargs):
+    profiler = cProfile.Profile()
+    response = profiler.runcall(view_func, request, *args, **kwargs)
+    profiler.dump_stats(path)
+    return response
+
+
+def _profile_memory(path, view_func, request, args, kwargs):
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        response = view_func(request, *args, **kwargs)
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'lineno')
+    lines = [
+        f'{request.method} {request.get_full_path()}',
+        f'Picco di memoria tracciata: {peak / 1024:.1f} KiB',
+        '',
+        f'Allocazioni principali (differenza durante la view, prime {TOP_STATS}):',
+    ]
+    lines += [str(stat) for stat in stats[:TOP_STATS]]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return response
+
+
+class ProfilingMiddleware:
+    """
+    Va in fondo a MIDDLEWARE: gli altri process_view (CSRF compreso)
+    restano davanti alla view profilata.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        kind = _requested_kind(request)
+        if kind is None or not (request.user.is_authenticated and request.user.is_staff):
+            return None
+        user = _requested_user(request)
+        impersonating = user.pk != request.user.pk
+        if impersonating and not request.user.is_superuser:
+            raise PermissionDenied
+        if impersonating and request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+        os.makedirs(settings.GYM_PROFILE_DIR, exist_ok=True)
+        path = capture_path(request.resolver_match.view_name, user.pk, kind)
+        run = _profile_cpu if kind == 'cpu' else _profile_memory
+        staff, staff_messages = request.user, getattr(request, '_messages', None)
+        request.user = user
+        if impersonating and staff_messages is not None:
+            # Un archivio nuovo che nessuno salva: i messaggi della view non
+            # arrivano a chi profila.
+            request._messages = default_storage(request)
+        try:
+            response = run(path, view_func, request, view_args, view_kwargs)
+        finally:
+            request.user = staff
+            if staff_messages is not None:
+                request._messages = staff_messages
+        prune_captures()
+
+        name = os.path.basename(path)
+        if impersonating:
+            # La pagina è dell'altro utente: allo staff solo l'esito.
+            response = HttpResponse(
+                f'Cattura {name} (risposta della view: {response.status_code})\n',
+                content_type='text/plain; charset=utf-8',
+            )
+        response['X-Profile-Capture'] = name
+        return response
+
+
+def list_captures():
+    """Catture salvate, dalla più recente."""
+    try:
+        names = os.listdir(settings.GYM_PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    captures = []
+    for name in names:
+        match = CAPTURE_RE.match(name)
+        if match is None:
+            continue
+        captures.append({
+            'name': name,
+            'view': match['view'],
+            'user_id': int(match['user']),
+            'kind': 'cpu' if match['ext'] == 'pstats' else 'memory',
+            'created_at': datetime.strptime(match['stamp'], '%Y%m%d-%H%M%S-%f'),
+            'size': os.path.getsize(os.path.join(settings.GYM_PROFILE_DIR, name)),
+        })
+    captures.sort(key=lambda capture: capture['created_at'], reverse=True)
+    return captures
+
+
+def prune_captures():
+    """Cancella le catture oltre le GYM_PROFILE_MAX_FILES più recenti."""
+    for capture in list_captures()[settings.GYM_PROFILE_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(settings.GYM_PROFILE_DIR, capture['name']))
+        except FileNotFoundError:
+            # Già cancellata da un altro worker.
+            pass
+
+
+@staff_member_required
+def capture_list(request):
+    captures = list_captures()
+    view = request.GET.get('view')
+    if view:
+        captures = [capture for capture in captures if capture['view'] == view]
+    return render(request, 'admin/profiles.html', {
+        **admin.site.each_context(request),
+        'title': 'Profilazioni',
+        'captures': captures,
+        'selected_view': view,
+        'profile_param': PROFILE_PARAM,
+        'profile_user_param': PROFILE_USER_PARAM,
+    })
+
+
+@staff_member_required
+def capture_download(request, name):
+    """Il file di una cattura; ?format=text riassume un pstats come testo."""
+    # Solo nomi nel formato delle catture: niente percorsi arbitrari.
+    if CAPTURE_RE.match(name) is None:
+        raise Http404
+    path = os.path.join(settings.GYM_PROFILE_DIR, name)
+    if not os.path.isfile(path):
+        raise Http404
+    if request.GET.get('format') == 'text' and name.endswith('.pstats'):
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats('cumulative').print_stats(TOP_STATS)
+        return HttpResponse(out.getvalue(), content_type='text/plain; charset=utf-8')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
@@ -27,12 +27,16 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Dopo WhiteNoise: i file statici non arrivano fin qui e non si misurano.
+    'gymit.middleware.ServerTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Ultimo: profila solo la view, dopo i controlli degli altri middleware.
+    'gymit.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'gymit.urls'
@@ -94,6 +98,76 @@ STORAGES = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache delle pagine calcolate (vedi gym/caching.py). LocMemCache è per
+# processo ed elimina le voci meno usate di recente (LRU) oltre MAX_ENTRIES;
+# le chiavi contengono la versione dei dati dell'utente, quindi non
+# servono invalidazioni esplicite.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gymit',
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 60 * 60 * 24)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 5000)),
+        },
+    }
+}
+
+# Punti massimi per serie nei grafici, per superficie: oltre questa soglia
+# la serie viene ridotta lato server (vedi gym/charts.py).
+GYM_CHART_MAX_POINTS = {
+    'sparkline': 30,
+    'progress': 300,
+}
+
+# Identificativo del deploy, parte degli ETag delle pagine: un nuovo
+# rilascio deve invalidare l'HTML già in cache nei browser anche se i dati
+# non sono cambiati. Se manca si usa l'hash del manifest dei file statici.
+GYM_RELEASE = os.environ.get('GYM_RELEASE', '')
+
+# File caricati (per ora solo gli upload degli import in coda). Il worker
+# degli import (manage.py run_jobs) deve vedere la stessa cartella.
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / 'media')
+
+# Oltre questa dimensione un CSV importato non viene elaborato dentro la
+# richiesta ma accodato per il worker (vedi gym/jobs.py): la risposta
+# all'upload resta immediata anche per storici di anni.
+GYM_IMPORT_INLINE_MAX_BYTES = int(os.environ.get('GYM_IMPORT_INLINE_MAX_BYTES', 256 * 1024))
+
+# Misure per richiesta (vedi gymit/middleware.py): header Server-Timing
+# anche per chi non è staff (di default solo in sviluppo), frazione delle
+# richieste scritte nel log "gymit.requests" e soglie in millisecondi oltre
+# cui una richiesta o una singola query si registrano sempre.
+GYM_SERVER_TIMING = os.environ.get('GYM_SERVER_TIMING', str(DEBUG)) == 'True'
+GYM_TIMING_SAMPLE_RATE = float(os.environ.get('GYM_TIMING_SAMPLE_RATE', 0))
+GYM_SLOW_REQUEST_MS = float(os.environ.get('GYM_SLOW_REQUEST_MS', 1000))
+GYM_SLOW_QUERY_MS = float(os.environ.get('GYM_SLOW_QUERY_MS', 100))
+
+# Metriche per URL esposte a /metrics (vedi gymit/metrics.py): database
+# SQLite condiviso da tutti i worker (su un disco locale che vedono tutti,
+# es. /var/lib/gymit/metrics.sqlite3; vuoto = ogni processo tiene le sue
+# in memoria), ogni quanti secondi al più un worker ci scrive, e token con
+# cui lo scraper di Prometheus si autentica (vuoto = solo staff).
+GYM_METRICS_DB = os.environ.get('GYM_METRICS_DB', '')
+GYM_METRICS_FLUSH_SECONDS = float(os.environ.get('GYM_METRICS_FLUSH_SECONDS', 10))
+GYM_METRICS_TOKEN = os.environ.get('GYM_METRICS_TOKEN', '')
+
+# Cartella delle profilazioni su richiesta (vedi gymit/profiling.py) e
+# quante catture tenere: dopo ogni nuova si cancellano le più vecchie.
+GYM_PROFILE_DIR = os.environ.get('GYM_PROFILE_DIR', BASE_DIR / 'profiles')
+GYM_PROFILE_MAX_FILES = int(os.environ.get('GYM_PROFILE_MAX_FILES', 200))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'gymit': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 LOGIN_URL = '/users/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/users/login/'
@@ -2,8 +2,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import RedirectView
 
+from . import profiling
+from .metrics import metrics_view
+
 urlpatterns = [
+    # Prima di admin.site.urls, che risponderebbe 404 a ogni altro percorso.
+    path('admin/profiles/', profiling.capture_list, name='profile_capture_list'),
+    path('admin/profiles/<str:name>', profiling.capture_download, name='profile_capture_download'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('gym.urls')),
     path('users/', include('users.urls')),
 ]